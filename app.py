@@ -1,7 +1,10 @@
+import hashlib
+import itertools
 import os
 import secrets
+import time
 from functools import wraps
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, timezone
 
 from flask import (
     Flask,
@@ -13,9 +16,26 @@ from flask import (
     jsonify,
     session,
     flash,
+    get_flashed_messages,
+    g,
+    Response,
+    send_file,
+    make_response,
+    stream_template,
 )
 
+import applog
+import assets
+import compression
 import database
+import formatting
+import fragments
+import images
+import jinja_cache
+import live
+import metrics
+import profiling
+import shared_cache
 from database import (
     STATUS_REQUESTED,
     STATUS_APPROVED,
@@ -25,6 +45,23 @@ from database import (
 
 app = Flask(__name__)
 
+log = applog.get_logger("app")
+
+# Kompilerede templates genbruges på tværs af workers/genstarter (se jinja_cache.py)
+jinja_cache.install(app)
+
+# gzip/brotli af HTML/JSON – registreres først, så den kører efter de andre after_request-hooks
+compression.init_app(app)
+
+# CSS/JS med content-hash i filnavnet, serveret som immutable (se assets.py)
+assets.init_app(app)
+
+# Cachede HTML-fragmenter (vagtkort, overbliksrækker) i templates (se fragments.py)
+fragments.init_app(app)
+
+# Billeder som <picture> med AVIF/WebP i flere bredder (se images.py)
+images.init_app(app)
+
 # ============================
 # Produktion: secrets skal komme fra ENV
 # ============================
@@ -35,12 +72,12 @@ if not SECRET_KEY:
     # Lokalt: generér en midlertidig key (så du ikke bliver blokeret i dev)
     # Produktion: sæt SECRET_KEY i platformens "Secrets".
     SECRET_KEY = secrets.token_hex(32)
-    print("⚠️  SECRET_KEY mangler. Kører med en midlertidig nøgle (sessions nulstilles ved restart).")
+    log.warning("SECRET_KEY mangler. Kører med en midlertidig nøgle (sessions nulstilles ved restart).")
 
 if not ADMIN_PASSWORD:
     # Lokalt fallback, men i produktion SKAL du sætte ADMIN_PASSWORD.
     ADMIN_PASSWORD = "Myggens"
-    print("⚠️  ADMIN_PASSWORD mangler. Fallback til standard (skift i produktion!).")
+    log.warning("ADMIN_PASSWORD mangler. Fallback til standard (skift i produktion!).")
 
 app.secret_key = SECRET_KEY
 
@@ -56,6 +93,243 @@ app.secret_key = "skift-mig-til-noget-hemmeligt"
 
 database.init_db()
 
+# Ændringsloggen holdes lille (se database.compact_changes og _compact_change_log)
+database.compact_changes()
+
+# ============================
+# Metrics (Prometheus)
+# ============================
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "").strip()
+
+
+_request_log = applog.get_logger("request")
+
+
+def _user_kind() -> str:
+    if session.get("is_admin"):
+        return "admin"
+    if session.get("freelancer_person_id"):
+        return "freelancer"
+    return "anonymous"
+
+
+@app.before_request
+def _start_request():
+    g.request_started = time.perf_counter()
+    database.reset_query_count()
+
+
+@app.after_request
+def _finish_request(response):
+    """Registrér metrics og skriv én struktureret log-linje pr. request."""
+    started = g.pop("request_started", None)
+    if started is None:
+        return response
+
+    duration = time.perf_counter() - started
+    endpoint = request.endpoint or "unknown"
+    metrics.inc(
+        "myggens_http_requests_total",
+        endpoint=endpoint,
+        method=request.method,
+        status=response.status_code,
+    )
+    metrics.observe("myggens_http_request_duration_seconds", duration, endpoint=endpoint)
+    metrics.flush()
+
+    if endpoint != "static":
+        _request_log.info(
+            "request",
+            extra={
+                "route": endpoint,
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "duration_ms": round(duration * 1000, 2),
+                "queries": database.get_query_count(),
+                "user_kind": _user_kind(),
+            },
+        )
+    return response
+
+
+def _change_tags(changes) -> set[str]:
+    """Cache-tags (shift:/person:/month:) berørt af rækker fra database.changes_since."""
+    tags = set()
+    for change in changes:
+        if change["shift_id"] is not None:
+            tags.add(f"shift:{change['shift_id']}")
+        if change["person_id"] is not None:
+            tags.add(f"person:{change['person_id']}")
+        if change["month"] is not None:
+            tags.add(f"month:{change['month']}")
+    return tags
+
+
+# Seneste seq i ændringsloggen som denne worker har set anvendt på den fælles cache
+_cache_synced_seq = None
+
+
+def _sync_shared_cache() -> None:
+    """
+    Invalidér den fælles cache ud fra ændringsloggen: tags for alle ændringer
+    siden sidst, uanset hvem der skrev (request, script, migrering). Positionen
+    ligger i cachen selv, så en ændring normalt kun behandles af én worker –
+    og skulle to workers gøre det samtidig, er invalideringen blot dobbelt.
+    """
+    global _cache_synced_seq
+    latest = database.get_latest_change_seq()
+    if latest == _cache_synced_seq:
+        return
+    cache = shared_cache.cache
+    through = cache.get_counter("changes_seq")
+    if through is None or through > latest:
+        # Ny cache-fil eller udskiftet database: intet i cachen kan stoles på
+        cache.clear()
+        through = latest
+    while through < latest:
+        page = database.changes_since(through)
+        if page["reset"]:
+            cache.clear()  # loggen er beskåret forbi vores position
+        else:
+            cache.invalidate(*_change_tags(page["changes"]))
+        through = page["last_seq"]
+        if not page["has_more"]:
+            break
+    cache.set_counter("changes_seq", through)
+    _cache_synced_seq = latest
+
+
+def _sync_shared_cache_safely() -> None:
+    # Cachen må aldrig vælte et request – fx låst database: prøves igen næste gang
+    try:
+        _sync_shared_cache()
+    except Exception:
+        log.exception("Kunne ikke anvende ændringsloggen på den fælles cache")
+
+
+# Skrivninger uden for appen (migreringer, scripts) siden sidste start
+_sync_shared_cache_safely()
+
+
+@app.before_request
+def _sync_shared_cache_before_request():
+    """
+    Før hvert request: anvend nye ændringer (også fra scripts, migreringer og
+    andre workers) på den fælles cache, så requestet aldrig læser en post som
+    en allerede committet skrivning har gjort forældet. Koster ét opslag i
+    sqlite_sequence, når intet er ændret.
+    """
+    if request.endpoint != "static":
+        _sync_shared_cache_safely()
+
+
+@app.teardown_request
+def _apply_cache_invalidations(exc):
+    """
+    Efter skrivende requests – også fejlede (exception, 4xx/5xx), hvor en del
+    kan være committet: invalidér de berørte tags med det samme, så andre
+    workers' samtidige requests heller ikke ser gammel cache.
+    """
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        _sync_shared_cache_safely()
+
+
+# Ændringsloggen (changes) foldes/beskæres højst så ofte pr. worker (sekunder)
+CHANGES_COMPACT_INTERVAL = float(os.environ.get("CHANGES_COMPACT_INTERVAL", "3600"))
+_changes_compacted_at = time.monotonic()
+
+
+@app.after_request
+def _compact_change_log(response):
+    """Efter skrivende requests, højst hver CHANGES_COMPACT_INTERVAL: database.compact_changes()."""
+    global _changes_compacted_at
+    if request.method in ("GET", "HEAD", "OPTIONS"):
+        return response
+    now = time.monotonic()
+    if now - _changes_compacted_at >= CHANGES_COMPACT_INTERVAL:
+        _changes_compacted_at = now
+        try:
+            database.compact_changes()
+        except Exception:  # fx låst database – prøves igen ved næste interval
+            log.exception("Kunne ikke komprimere ændringsloggen")
+    return response
+
+
+def _person_cache_tags(person_id: int, shift_ids) -> list[str]:
+    # Personens tilmeldinger viser også vagtdata (sted, tid) – ændres en vagt, skal posten ud
+    return [f"person:{person_id}"] + [f"shift:{shift_id}" for shift_id in set(shift_ids)]
+
+
+def _collect_business_gauges():
+    pending = database.get_pending_admin_actions()
+    sizes = database.get_db_file_sizes()
+    return [
+        ("myggens_pending_signups", {}, pending["pending_signups"]),
+        ("myggens_pending_releases", {}, pending["pending_releases"]),
+        ("myggens_unstaffed_upcoming_shifts", {}, database.count_unstaffed_upcoming_shifts()),
+        ("myggens_db_file_bytes", {"file": "main"}, sizes["main"]),
+        ("myggens_db_file_bytes", {"file": "wal"}, sizes["wal"]),
+    ]
+
+
+metrics.describe("myggens_pending_signups", "gauge", "Tilmeldinger der afventer godkendelse.")
+metrics.describe("myggens_pending_releases", "gauge", "Anmodninger om fri der afventer admin.")
+metrics.describe("myggens_unstaffed_upcoming_shifts", "gauge", "Kommende aktive vagter der mangler folk.")
+metrics.describe("myggens_db_file_bytes", "gauge", "Størrelse på SQLite-filen og WAL-filen.")
+metrics.register_gauge_collector(_collect_business_gauges)
+
+
+def _metrics_allowed() -> bool:
+    """Admin-session, korrekt METRICS_TOKEN eller direkte kald fra localhost (ikke via proxy)."""
+    if session.get("is_admin"):
+        return True
+    if METRICS_TOKEN:
+        auth = request.headers.get("Authorization", "")
+        if secrets.compare_digest(auth, f"Bearer {METRICS_TOKEN}"):
+            return True
+    if request.remote_addr in ("127.0.0.1", "::1") and "X-Forwarded-For" not in request.headers:
+        return True
+    return False
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    if not _metrics_allowed():
+        abort(403)
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+# ============================
+# On-demand profilering (admin: ?_profile=1)
+# ============================
+
+@app.before_request
+def _profile_start():
+    if request.args.get("_profile") == "1" and session.get("is_admin"):
+        handle = profiling.start()
+        if handle is not None:
+            g.profile_handle = handle
+
+
+@app.after_request
+def _profile_stop(response):
+    handle = g.pop("profile_handle", None)
+    if handle is not None:
+        profile_id = profiling.stop(handle, request.method, request.full_path, response.status_code)
+        response.headers["X-Profile-Id"] = profile_id
+        response.headers["X-Profile-Url"] = url_for("admin_profile_view", profile_id=profile_id)
+    return response
+
+
+@app.teardown_request
+def _profile_teardown(exc):
+    # Hvis viewet fejlede før after_request, skal låsen stadig frigives
+    handle = g.pop("profile_handle", None)
+    if handle is not None:
+        profiling.discard(handle)
+
+
 @app.context_processor
 def inject_now():
     return {"now": datetime.now}
@@ -78,18 +352,9 @@ def inject_admin_notifications():
         "pending_releases": pending["pending_releases"],
     }
 
-from datetime import datetime
-
-@app.template_filter("dkdate")
-def dkdate(value):
-    """Konverterer ISO 'YYYY-MM-DD' til dansk 'DD-MM-YYYY'."""
-    if not value:
-        return ""
-    try:
-        d = datetime.strptime(value, "%Y-%m-%d")
-        return d.strftime("%d-%m-%Y")
-    except Exception:
-        return value
+# Formatering i templates (LRU-cachede, se formatting.py)
+for _name, _fn in formatting.TEMPLATE_FILTERS.items():
+    app.add_template_filter(_fn, _name)
 
 
 
@@ -119,18 +384,6 @@ def parse_danish_date(d: str) -> str | None:
     except ValueError:
         return None
 
-def format_danish_date(date_iso: str) -> str:
-    """Konverterer '2025-12-11' → '11-12-2025'."""
-    try:
-        parts = date_iso.split("-")
-        if len(parts) != 3:
-            return date_iso
-        year, month, day = parts
-        return f"{day}-{month}-{year}"
-    except:
-        return date_iso
-
-
 
 # =====================================================
 # Admin helper: kun adgang hvis man er logget ind som admin
@@ -153,6 +406,118 @@ def freelancer_required(f):
     return wrapper
 
 
+# Streamede sider sendes i bidder af mindst så mange bytes (færre, større chunks
+# komprimerer bedre og giver færre små writes, men headeren kommer stadig hurtigt)
+STREAM_CHUNK_BYTES = int(os.environ.get("STREAM_CHUNK_BYTES", "4096"))
+
+
+def _chunked(pieces, min_bytes: int):
+    buf = []
+    size = 0
+    for piece in pieces:
+        buf.append(piece)
+        size += len(piece)
+        if size >= min_bytes:
+            yield "".join(buf)
+            buf = []
+            size = 0
+    if buf:
+        yield "".join(buf)
+
+
+def stream_page(template_name: str, **context) -> Response:
+    """
+    Som render_template, men HTML'en sendes mens templaten renderes. Context må
+    indeholde generatorer fra database.py (iter_*), så queries og rendering sker
+    løbende og første byte ikke venter på hele siden.
+
+    Under profilering (?_profile=1) renderes hele siden med det samme, ellers
+    ville _profile_stop stoppe profileren før templaten overhovedet er kørt.
+    """
+    if g.get("profile_handle") is not None:
+        return render_template(template_name, **context)
+    # Flash-beskeder fjernes fra sessionen når de læses. Det skal ske nu, mens
+    # Set-Cookie stadig kan sendes – bagefter læser templaten dem fra request-cachen
+    get_flashed_messages(with_categories=True)
+    chunks = stream_template(template_name, **context)
+    return app.response_class(_chunked(chunks, STREAM_CHUNK_BYTES), mimetype="text/html")
+
+
+def _peek(iterable):
+    """
+    Iterator der virker med `{% if not x %}` i templates: [] hvis den er tom,
+    ellers en iterator med første element lagt tilbage foran resten.
+    """
+    it = iter(iterable)
+    try:
+        first = next(it)
+    except StopIteration:
+        return []
+    return itertools.chain([first], it)
+
+
+def _data_last_modified(changed_at: str | None) -> datetime:
+    """
+    Seneste ændringstidspunkt for data – dog mindst midnat i dag, fordi
+    flere sider filtrerer på dags dato og derfor ændrer sig ved døgnskifte.
+    """
+    midnight = datetime.combine(date.today(), datetime.min.time()).astimezone(timezone.utc)
+    if not changed_at:
+        return midnight
+    try:
+        changed = datetime.strptime(changed_at, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return midnight
+    return max(changed, midnight)
+
+
+def conditional_get(f):
+    """
+    ETag / Last-Modified for GET-sider der kun afhænger af data + brugerens identitet.
+    Svarer 304 før viewet kører (ingen queries, ingen template-render), hvis
+    data-versionen (seneste seq i ændringsloggen), udgaven (assets.build_id) og brugeren er uændret siden sidste hentning.
+    """
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        # Flash-beskeder skal vises – dem kan vi ikke svare 304 på
+        if request.method != "GET" or session.get("_flashes"):
+            return f(*args, **kwargs)
+
+        version, changed_at = database.get_data_version()
+        identity = "|".join(
+            str(x) for x in (
+                request.full_path,
+                version,
+                assets.build_id(),
+                date.today().isoformat(),
+                session.get("freelancer_person_id"),
+                session.get("freelancer_name"),
+                session.get("freelancer_phone"),
+                session.get("is_admin"),
+            )
+        )
+        etag = hashlib.sha1(identity.encode("utf-8")).hexdigest()
+        last_modified = _data_last_modified(changed_at)
+
+        # Kun ETag'en kan give 304: den indeholder brugerens identitet. If-Modified-Since
+        # gør ikke, så en dato alene kunne give én bruger 304 på en anden brugers side
+        # (fx efter log ud/ind i samme browser). Last-Modified sendes kun som information.
+        if request.if_none_match and request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            response = make_response(f(*args, **kwargs))
+
+        response.set_etag(etag, weak=True)
+        response.last_modified = last_modified
+        response.headers["Cache-Control"] = "private, no-cache"
+        # Også på 304: caches skal vide at svaret afhænger af session og komprimering
+        response.vary.add("Cookie")
+        response.vary.add("Accept-Encoding")
+        return response
+
+    return wrapper
+
+
 # ============================
 # Offentlige sider (freelancer)
 # ============================
@@ -170,10 +535,11 @@ def landing():
 
 @app.route("/vagter")
 @freelancer_required
+@conditional_get
 def vagtoversigt():
-    shifts = database.get_all_shifts()
     today_str = date.today().isoformat()  # fx '2025-12-10'
-    future_shifts = [s for s in shifts if s["date"] >= today_str]
+    # Kommende vagter + egen tilmeldingsstatus i én query (ingen ekstra API-kald fra siden)
+    future_shifts = database.get_upcoming_shifts_for_person(session["freelancer_person_id"], today_str)
     return render_template("index.html", shifts=future_shifts)
 
 @app.get("/vagtoversigt/mogens")
@@ -207,13 +573,13 @@ def tilmeld(shift_id):
         available_from = request.form.get("available_from", "").strip()    # 'HH:MM' eller ""
         available_until = request.form.get("available_until", "").strip()  # 'HH:MM' eller ""
 
-        # Normalisér telefon (fjern mellemrum)
-        phone = phone_raw.replace(" ", "")
+        # Normalisér telefon (mellemrum, tegnsætning, +45)
+        phone = database.normalize_phone(phone_raw)
 
         # Basic validering
         if not name or not phone:
             error = "Udfyld både navn og telefon."
-        elif not phone.isdigit() or len(phone) < 6:
+        elif len(phone.lstrip("+")) < 6:
             error = "Tjek dit telefonnummer – det ser forkert ud."
         else:
             # Normalisér til None hvis tom
@@ -262,16 +628,15 @@ def tilmeld(shift_id):
                 if signup_id is None:
                     error = "Du er allerede tilmeldt denne vagt."
                 else:
-                    print(
-                        "NY TILMELDING:",
-                        signup_id,
-                        shift_id,
-                        name,
-                        phone,
-                        availability_type,
-                        available_from_value,
-                        available_until_value,
-                        freelancer_note_value,
+                    applog.event(
+                        "signup_created",
+                        signup_id=signup_id,
+                        shift_id=shift_id,
+                        person_id=session.get("freelancer_person_id"),
+                        availability_type=availability_type,
+                        available_from=available_from_value,
+                        available_until=available_until_value,
+                        has_note=freelancer_note_value is not None,
                     )
                     message = "Din tilmelding er modtaget!"
 
@@ -281,16 +646,12 @@ def tilmeld(shift_id):
 @app.route("/freelancer/frameld/<int:signup_id>", methods=["POST"])
 @freelancer_required
 def freelancer_frameld(signup_id: int):
-    phone = (session.get("freelancer_phone") or "").strip()
-    if not phone:
-        abort(403)
-
     signup = database.get_signup_by_id(signup_id)
     if signup is None:
         abort(404)
 
     # ownership check
-    if str(signup.get("phone") or "").strip() != phone:
+    if signup["person_id"] != session.get("freelancer_person_id"):
         abort(403)
 
     ok = database.cancel_signup_request(signup_id)
@@ -310,7 +671,7 @@ def freelancer_login():
 
         if not name or not phone:
             error = "Udfyld både navn og telefonnummer."
-        elif not phone.replace(" ", "").isdigit():
+        elif not database.normalize_phone(phone):
             error = "Telefonnummer skal være tal."
         else:
             # Opret eller find personen i databasen
@@ -319,7 +680,7 @@ def freelancer_login():
             # Læg det i session
             session["freelancer_person_id"] = person_id
             session["freelancer_name"] = name
-            session["freelancer_phone"] = phone.replace(" ", "")
+            session["freelancer_phone"] = database.normalize_phone(phone)
 
             flash("Du er nu logget ind som freelancer hos Myggens")
             return redirect(url_for("vagtoversigt"))
@@ -362,7 +723,7 @@ def freelancer_extra_shift():
         # ---- basic validation ----
         if not name or not phone:
             error = "Udfyld navn og telefonnummer."
-        elif not phone.replace(" ", "").isdigit() or len(phone.replace(" ", "")) < 6:
+        elif len(database.normalize_phone(phone).lstrip("+")) < 6:
             error = "Tjek telefonnummer – det ser forkert ud."
         else:
             # valider datoformat
@@ -413,8 +774,17 @@ def freelancer_logout():
 @app.route("/admin/personer")
 @admin_required
 def admin_person_list():
-    persons = database.get_all_persons()
-    return render_template("admin_person_list.html", persons=persons)
+    page = database.get_persons_page(
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+        limit=request.args.get("limit", database.PAGE_SIZE_DEFAULT),
+    )
+    return render_template(
+        "admin_person_list.html",
+        persons=page["items"],
+        page=page,
+        total_persons=database.count_persons(),
+    )
 
 @app.route("/admin/personer/<int:person_id>")
 @admin_required
@@ -423,7 +793,11 @@ def admin_person_detail(person_id):
     if not person:
         abort(404)
 
-    signups = database.get_signups_for_person(person_id)
+    signups = shared_cache.cache.get_or_set(
+        f"admin-person-signups:{person_id}",
+        lambda: database.get_signups_for_person(person_id),
+        tags=lambda signups: _person_cache_tags(person_id, (su["shift_id"] for su in signups)),
+    )
     return render_template(
         "admin_person_detail.html",
         person=person,
@@ -431,6 +805,67 @@ def admin_person_detail(person_id):
     )
 
 
+@app.get("/admin/api/personer/search")
+@admin_required
+def admin_api_person_search():
+    """Typeahead til personvælgeren: ?q=<navn eller telefon>&limit=10."""
+    q = request.args.get("q", "")
+    limit = request.args.get("limit", 10, type=int) or 10
+    return jsonify({"persons": database.search_persons(q, limit)})
+
+
+def _search_args():
+    q = request.args.get("q", "").strip()
+    kind = request.args.get("kind", "").strip() or None
+    page = request.args.get("page", 1, type=int) or 1
+    return q, kind, page
+
+
+@app.get("/admin/api/search")
+@admin_required
+def admin_api_search():
+    """Fuldtekstsøgning (JSON): ?q=...&kind=shift|person|signup&page=1&per_page=20."""
+    q, kind, page = _search_args()
+    per_page = request.args.get("per_page", 20, type=int) or 20
+    return jsonify(database.search(q, kind=kind, page=page, per_page=per_page))
+
+
+@app.get("/admin/soeg")
+@admin_required
+def admin_search():
+    """Søgeside for vagter, personer og noter – rangeret og pagineret på serveren."""
+    q, kind, page = _search_args()
+    result = database.search(q, kind=kind, page=page)
+    return render_template("admin_search.html", q=q, kind=kind or "", **result)
+
+
+@app.get("/admin/personer/dubletter")
+@admin_required
+def admin_person_duplicates():
+    """Forslag til dubletter i kartoteket (samme/lignende telefon eller navn)."""
+    candidates = database.find_duplicate_persons()
+    return render_template("admin_person_duplicates.html", candidates=candidates)
+
+
+@app.post("/admin/personer/merge")
+@admin_required
+def admin_person_merge():
+    """Flet to personer: alle vagter/ekstravagter flyttes til den der beholdes."""
+    try:
+        survivor_id = int(request.form.get("survivor_id", ""))
+        duplicate_id = int(request.form.get("duplicate_id", ""))
+    except ValueError:
+        flash("Ugyldigt valg af personer.")
+        return redirect(url_for("admin_person_duplicates"))
+
+    if database.merge_persons(survivor_id, duplicate_id):
+        applog.event("persons_merged", survivor_id=survivor_id, duplicate_id=duplicate_id)
+        flash("Personerne er flettet.")
+    else:
+        flash("Kunne ikke flette – en af personerne findes ikke længere.")
+    return redirect(url_for("admin_person_duplicates"))
+
+
 @app.post("/admin/personer/<int:person_id>/delete")
 @admin_required
 def admin_person_delete(person_id):
@@ -441,6 +876,7 @@ def admin_person_delete(person_id):
 
 @app.route("/mine-vagter", methods=["GET", "POST"])
 @freelancer_required
+@conditional_get
 def mine_vagter():
     # Default: brug telefonnummeret fra session
     phone = session.get("freelancer_phone", "")
@@ -455,12 +891,20 @@ def mine_vagter():
     unlogged_signups = []
     has_any_signups = False
 
-    if phone:
-        all_signups = database.get_signups_by_phone(phone)
+    # Egen side: brug person-id fra session. Kun et andet nummer slås op via phone_norm.
+    person_id = session.get("freelancer_person_id")
+    if phone and database.normalize_phone(phone) != session.get("freelancer_phone"):
+        person_id = database.find_person_id_by_phone(phone)
+
+    if phone and person_id:
+        all_signups = shared_cache.cache.get_or_set(
+            f"person-signups:{person_id}",
+            lambda: database.get_signups_by_person_id(person_id),
+            tags=lambda signups: _person_cache_tags(person_id, (su["shift"]["id"] for su in signups)),
+        )
         has_any_signups = bool(all_signups)
 
         today_str = date.today().isoformat()
-        phone_clean = phone.replace(" ", "")
 
         # Kommende vagter
         upcoming_signups = [
@@ -491,7 +935,7 @@ def mine_vagter():
             coworkers = [
                 su for su in all_for_shift
                 if su["status"] == STATUS_APPROVED
-                and su["phone"] != phone_clean
+                and su["person_id"] != person_id
             ]
 
             item["coworkers"] = coworkers
@@ -508,13 +952,11 @@ def mine_vagter():
 @freelancer_required
 def mine_vagter_historik():
     phone = session.get("freelancer_phone", "")
-    if not phone:
-        return redirect(url_for("freelancer_login"))
-
-    all_signups = database.get_signups_by_phone(phone)
+    person_id = session["freelancer_person_id"]
 
-    # År dropdown: kun år der findes i data (fallback: i år)
-    years = sorted({int(item["shift"]["date"][:4]) for item in all_signups if item.get("shift") and item["shift"].get("date")}) or [date.today().year]
+    # År dropdown: kun år der findes i data (fallback: i år) – fra date_year i databasen
+    years, earliest_str = database.get_signup_date_bounds_for_person(person_id)
+    years = years or [date.today().year]
 
     today = date.today()
 
@@ -526,17 +968,8 @@ def mine_vagter_historik():
     year = request.args.get("year", type=int) or today.year
     month = request.args.get("month", type=int) or today.month
 
-    # Find earliest date i data (til hvis kun "til" er sat)
-    earliest = None
-    for item in all_signups:
-        try:
-            d = datetime.strptime(item["shift"]["date"], "%Y-%m-%d").date()
-        except Exception:
-            continue
-        if earliest is None or d < earliest:
-            earliest = d
-    if earliest is None:
-        earliest = today
+    # Earliest date i data (til hvis kun "til" er sat)
+    earliest = date.fromisoformat(earliest_str) if earliest_str else today
 
     # Parse fra/til hvis udfyldt
     use_range = bool(from_date_str or to_date_str)
@@ -572,35 +1005,21 @@ def mine_vagter_historik():
 
         period_label = f"{from_date.strftime('%d-%m-%Y')} → {to_date.strftime('%d-%m-%Y')}"
 
-    # Filtrér signups
-    signups_in_period = []
-    for item in all_signups:
-        if item["status"] == STATUS_CANCELLED_BY_ADMIN:
-            continue
-        if item["status"] != STATUS_APPROVED:
-            continue
-
-        try:
-            dt = datetime.strptime(item["shift"]["date"], "%Y-%m-%d").date()
-        except Exception:
-            continue
-
-        # Vis aldrig fremtid (tidligst synlig på dagen)
-        if dt > today:
-            continue
-
-        if use_range:
-            if from_date <= dt <= to_date:
-                signups_in_period.append(item)
-        else:
-            if dt.year == year and dt.month == month:
-                signups_in_period.append(item)
-
-    # Sortér (nyeste øverst)
-    signups_in_period.sort(
-        key=lambda it: it["shift"]["date"],
-        reverse=True
-    )
+    # Godkendte vagter i perioden (aldrig fremtid), filtreret og sorteret nyeste først i SQL
+    if use_range:
+        signups_in_period = database.get_worked_signups_for_person(
+            person_id,
+            until=today.isoformat(),
+            from_date=from_date.isoformat(),
+            to_date=to_date.isoformat(),
+        )
+    else:
+        signups_in_period = database.get_worked_signups_for_person(
+            person_id,
+            until=today.isoformat(),
+            year=year,
+            month=month,
+        )
 
     # Beregn total baseret på admin-godkendt timetal hvis det findes
     def final_hours(item):
@@ -635,7 +1054,7 @@ def freelancer_log_hours(signup_id):
 
     # Sikkerhed: sørg for at det er den rigtige freelancer
     session_phone = session.get("freelancer_phone")
-    if not session_phone or signup["phone"] != session_phone:
+    if signup["person_id"] != session.get("freelancer_person_id"):
         abort(403)
 
     work_start = request.form.get("work_start", "").strip()
@@ -645,22 +1064,12 @@ def freelancer_log_hours(signup_id):
         flash("Udfyld både start- og sluttid.")
         return redirect(url_for("mine_vagter", phone=session_phone))
 
-    # Validér HH:MM og beregn timer
-    try:
-        start_dt = datetime.strptime(work_start, "%H:%M")
-        end_dt = datetime.strptime(work_end, "%H:%M")
-    except ValueError:
+    # Validér HH:MM – selve varigheden (inkl. "efter midnat") beregnes af databasen
+    if _parse_hhmm(work_start) is None or _parse_hhmm(work_end) is None:
         flash("Tider skal være i format HH:MM.")
         return redirect(url_for("mine_vagter", phone=session_phone))
 
-    delta = end_dt - start_dt
-    if delta.total_seconds() < 0:
-        # Hvis slut er "efter midnat" – antag næste dag
-        delta += timedelta(days=1)
-
-    hours = round(delta.total_seconds() / 3600.0, 2)
-
-    database.set_signup_worked_hours(signup_id, work_start, work_end, hours)
+    database.set_signup_worked_hours(signup_id, work_start, work_end)
     flash("Dine timer er gemt.")
     return redirect(url_for("mine_vagter", phone=session_phone))
 
@@ -672,11 +1081,15 @@ def anmod_fri(signup_id):
     if signup is None:
         abort(404)
 
+    # Sikkerhed: kun ejeren af tilmeldingen må bede om fri
+    if signup["person_id"] != session.get("freelancer_person_id"):
+        abort(403)
+
     phone = signup["phone"]
 
     if signup["status"] == STATUS_APPROVED:
         database.set_signup_status(signup_id, STATUS_RELEASE_REQUESTED)
-        print("ANMODNING OM FRI:", signup_id)
+        applog.event("release_requested", signup_id=signup_id, shift_id=signup["shift_id"])
 
     return redirect(url_for("mine_vagter", phone=phone))
 
@@ -689,7 +1102,7 @@ def annuller_tilmelding(signup_id):
 
     # Sikkerhed: kun ejeren af tilmeldingen må annullere
     session_phone = session.get("freelancer_phone")
-    if not session_phone or signup["phone"] != session_phone:
+    if signup["person_id"] != session.get("freelancer_person_id"):
         abort(403)
 
     # Kun hvis den stadig afventer
@@ -703,6 +1116,7 @@ def annuller_tilmelding(signup_id):
 
 
 @app.get("/api/signups-for-phone")
+@conditional_get
 def api_signups_for_phone():
     """Brugt af forsiden til at markere vagter, man allerede er tilmeldt."""
     phone = request.args.get("phone", "").strip()
@@ -759,45 +1173,31 @@ def admin_logout():
 @app.route("/admin")
 @admin_required
 def admin_dashboard():
-    all_shifts = database.get_all_shifts_admin()
-    active_shifts = [s for s in all_shifts if s["is_active"] == 1]
-    archived_shifts = [s for s in all_shifts if s["is_active"] == 0]
-
-    today = date.today()
-
-    for s in active_shifts:
-        needed = s.get("needed") or 0
-        approved = s.get("approved") or 0
-        row_class = ""
-
-        # Prøv at parse datoen – hvis den fejler, lader vi bare rækken være uden farve
-        try:
-            shift_date = date.fromisoformat(s["date"])
-            days_until = (shift_date - today).days
-        except Exception:
-            days_until = None
-
-        # 1) Grøn: behov dækket
-        if needed > 0 and approved >= needed:
-            row_class = "shift-covered"
-
-        # 2) Ikke dækket -> farve efter hvor tæt på vi er
-        elif days_until is not None and days_until >= 0 and approved < needed:
-            if days_until < 3:
-                row_class = "shift-critical"      # rød
-            elif days_until < 7:
-                row_class = "shift-warning-7"     # orange
-            elif days_until < 14:
-                row_class = "shift-warning-14"    # gul
-            else:
-                row_class = ""  # mere end 14 dage væk: ingen farve
-
-        s["row_class"] = row_class
+    # Aktive og arkiverede vagter pagineres hver for sig (keyset på date, start_time, id)
+    limit = request.args.get("limit", database.PAGE_SIZE_DEFAULT)
+    active_page = database.get_shifts_page(
+        1,
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+        limit=limit,
+    )
+    archived_page = database.get_shifts_page(
+        0,
+        after=request.args.get("archived_after"),
+        before=request.args.get("archived_before"),
+        limit=limit,
+    )
+    # row_class (dækket / dage til vagt) beregnes i SQL – se database.get_shifts_page
+    active_shifts = active_page["items"]
+    archived_shifts = archived_page["items"]
 
     return render_template(
         "admin_dashboard.html",
         active_shifts=active_shifts,
         archived_shifts=archived_shifts,
+        active_page=active_page,
+        archived_page=archived_page,
+        shift_counts=database.count_shifts_by_state(),
     )
 
 @app.get("/admin/actions")
@@ -806,23 +1206,8 @@ def admin_actions():
     # Hent pending counts (samme kilde som din context_processor)
     pending = database.get_pending_admin_actions()
 
-    # Hent shifts på samme måde som dashboard gør
-    all_shifts = database.get_all_shifts_admin()
-    active_shifts = [s for s in all_shifts if s.get("is_active") == 1]
-    archived_shifts = [s for s in all_shifts if s.get("is_active") == 0]
-
-    # Actionable = alt med pending > 0
-    actionable = [s for s in (active_shifts + archived_shifts) if (s.get("pending") or 0) > 0]
-
-    # Sortér: flest pending først, derefter dato/tid (fallback-safe)
-    actionable.sort(
-        key=lambda x: (
-            x.get("pending", 0),
-            x.get("date", ""),
-            x.get("start_time", ""),
-        ),
-        reverse=True
-    )
+    # Actionable = alt med pending > 0, filtreret og sorteret i SQL
+    actionable = database.get_actionable_shifts()
 
     return render_template(
         "admin_actions.html",
@@ -842,9 +1227,6 @@ def admin_edit_shift_form(shift_id):
     if not shift:
         abort(404)
 
-    # Tilføj felt med dansk dato-streng til brug i templaten
-    shift["date_dk"] = format_danish_date(shift["date"])
-
     return render_template("admin_edit_shift.html", shift=shift)
 
 
@@ -913,55 +1295,61 @@ def admin_shift_detail(shift_id):
     if shift is None:
         abort(404)
 
-    # Tilføj dansk dato til brug i templaten
-    shift["date_dk"] = format_danish_date(shift["date"])
-
     signups = database.get_signups_for_shift(shift_id)
-    persons = database.get_all_persons()  # til dropdown
 
+    # Personvælgeren bruger /admin/api/personer/search (typeahead) i stedet for hele kartoteket
     return render_template(
         "admin_shift.html",
         shift=shift,
         signups=signups,
-        persons=persons,
     )
 
 
 @app.route("/admin/overblik")
 @admin_required
 def admin_overview():
-    all_shifts = database.get_all_shifts_admin()
-    today_str = date.today().isoformat()
-
-    upcoming_shifts = [
-        s for s in all_shifts
-        if s.get("is_active") == 1 and s.get("date") and s["date"] >= today_str
-    ]
-
-    overview = []
-    for shift in upcoming_shifts:
-        signups = database.get_signups_for_shift(shift["id"])
-
-        approved_signups = [s for s in signups if s["status"] == STATUS_APPROVED]
-        requested_signups = [s for s in signups if s["status"] == STATUS_REQUESTED]
-        release_requested_signups = [s for s in signups if s["status"] == STATUS_RELEASE_REQUESTED]
-
-        overview.append({
-            "shift": shift,
-            "signups": signups,  # NYT: alle tilmeldinger
-            "approved_signups": approved_signups,  # beholdes for bagudkompabilitet
-            "counts": {
-                "total": len(signups),
-                "approved": len(approved_signups),
-                "requested": len(requested_signups),
-                "release_requested": len(release_requested_signups),
+    def overview_items():
+        # Kommende aktive vagter sorteret efter dato/tid; tilmeldinger hentes i batches
+        for shift, signups in database.iter_upcoming_shifts_with_signups():
+            approved_signups = [s for s in signups if s["status"] == STATUS_APPROVED]
+            requested_signups = [s for s in signups if s["status"] == STATUS_REQUESTED]
+            release_requested_signups = [s for s in signups if s["status"] == STATUS_RELEASE_REQUESTED]
+
+            yield {
+                "shift": shift,
+                "signups": signups,  # NYT: alle tilmeldinger
+                "approved_signups": approved_signups,  # beholdes for bagudkompabilitet
+                "counts": {
+                    "total": len(signups),
+                    "approved": len(approved_signups),
+                    "requested": len(requested_signups),
+                    "release_requested": len(release_requested_signups),
+                }
             }
-        })
 
-    # Sortér efter dato/tid så den ikke virker random
-    overview.sort(key=lambda x: (x["shift"].get("date", ""), x["shift"].get("time", "")))
+    return stream_page("admin_overview.html", overview=_peek(overview_items()))
+
 
-    return render_template("admin_overview.html", overview=overview)
+@app.get("/admin/live")
+@admin_required
+def admin_live():
+    """
+    Server-Sent Events til dashboard og bemandingsoverblik: pending-antal og
+    bemanding pr. kommende vagt, som snapshot og derefter deltaer (se live.py).
+    """
+    q = live.feed.subscribe()
+    if q is None:
+        # Workeren har allerede max antal åbne streams – klienten prøver igen senere
+        response = make_response("For mange live-forbindelser", 503)
+        response.headers["Retry-After"] = "30"
+        return response
+
+    response = app.response_class(live.feed.stream(q), mimetype="text/event-stream")
+    # Også hvis streamen aldrig bliver læst (fx afbrudt før første byte)
+    response.call_on_close(lambda: live.feed.unsubscribe(q))
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # ingen buffering i nginx/proxy
+    return response
 
 @app.route("/admin/timer", methods=["GET"])
 @admin_required
@@ -984,47 +1372,35 @@ def admin_timer():
     # dropdown years
     years = list(range(now.year - 2, now.year + 3))
 
-    # ---- hent rækker (din funktion) ----
-    rows = database.get_hours_for_month(
-        year=year,
-        month=month,
-        include_paid=show_paid,
-        include_missing=True,  # behold hvis du vil se "timer mangler" rækker
-    )
-
-    # ---- group + summer ----
-    people_map = {}
-    grand_total = 0.0
-
-    for r in rows:
-        name = (r.get("person_name") or "Ukendt").strip()
-        phone = (r.get("phone") or "").strip()
-        key = f"{name}::{phone}"
-
-        if key not in people_map:
-            people_map[key] = {
-                "name": name,
-                "phone": phone,
-                "rows": [],
-                "total_hours": 0.0,
+    # include_missing: behold "timer mangler"-rækker
+    query_args = dict(year=year, month=month, include_paid=show_paid, include_missing=True)
+
+    # Totalen står øverst på siden, så den beregnes i SQL før rækkerne streames
+    grand_total = database.get_hours_total_for_month(**query_args)
+
+    def people_groups():
+        # Rækkerne kommer sorteret person for person – én gruppe ad gangen
+        rows = database.iter_hours_for_month(**query_args)
+        # Gruppér på person-id, så omdøbte personer ikke splittes i flere rækker
+        for _key, person_rows in itertools.groupby(
+            rows, key=lambda r: r.person_id or f"{r.person_name}::{r.phone}"
+        ):
+            person_rows = list(person_rows)
+            first = person_rows[0]
+            total_hours = 0.0
+            for r in person_rows:
+                final_hours = r.approved_work_hours if r.hours_approved_by_admin else r.work_hours
+                total_hours += float(final_hours) if final_hours is not None else 0.0
+            yield {
+                "name": (first.person_name or "Ukendt").strip(),
+                "phone": (first.phone or "").strip(),
+                "rows": person_rows,
+                "total_hours": total_hours,
             }
 
-        approved_flag = bool(r.get("hours_approved_by_admin"))
-        work_hours = r.get("work_hours", None)
-        approved_work_hours = r.get("approved_work_hours", None)
-
-        final_hours = approved_work_hours if approved_flag else work_hours
-        add = float(final_hours) if final_hours is not None else 0.0
-
-        people_map[key]["rows"].append(r)
-        people_map[key]["total_hours"] += add
-        grand_total += add
-
-    people = sorted(people_map.values(), key=lambda p: (p["name"].lower(), p["phone"]))
-
-    return render_template(
+    return stream_page(
         "admin_timer.html",
-        people=people,
+        people=_peek(people_groups()),
         years=years,
         year=year,
         month=month,
@@ -1039,52 +1415,71 @@ def admin_history():
     Viser alle historiske arrangementer (is_active = -1),
     grupperet efter år og måned, med deltagere og registrerede timer.
     """
-    historic_shifts = database.get_historic_shifts()
+    # Kun månedsoverskrifter med counts/timer (én query) – selve månederne
+    # hentes som fragmenter af admin_history.js, når de foldes ud
+    months = database.get_history_months()
+    return render_template("admin_history.html", months=months)
 
-    # Gruppér efter (år, måned)
-    groups = {}
-    for s in historic_shifts:
-        date_str = s["date"] or ""
-        try:
-            year = int(date_str[:4])
-            month = int(date_str[5:7])
-        except Exception:
-            year, month = 0, 0
-
-        key = (year, month)
-        if key not in groups:
-            groups[key] = {
-                "year": year,
-                "month": month,
-                "entries": [],  # liste af {shift, signups, total_hours}
-            }
 
-        signups = database.get_signups_for_shift_with_hours(s["id"])
-        total_hours = sum((su["work_hours"] or 0) for su in signups)
+@app.get("/admin/historik/<int:year>/<int:month>")
+@admin_required
+def admin_history_month(year: int, month: int):
+    """HTML-fragment med én historik-måneds arrangementer (year/month = 0: ugyldig dato)."""
+    # Versionen læses før data: ændres måneden imens, får næste kald en ny nøgle.
+    # Templatens hash er med, så ændret markup efter en deploy ikke ligger gemt
+    # i browseren eller den fælles cache, indtil data ændres.
+    version = f"{database.get_month_version(year, month)}-{assets.template_hash('admin_history_month.html')}"
+    etag = f"history-{year}-{month}-{version}"
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        def render():
+            entries = [
+                {
+                    "shift": s,
+                    "signups": signups,
+                    "total_hours": sum((su["work_hours"] or 0) for su in signups),
+                }
+                for s, signups in database.get_historic_month(year, month)
+            ]
+            return render_template("admin_history_month.html", entries=entries)
 
-        groups[key]["entries"].append(
-            {
-                "shift": s,
-                "signups": signups,
-                "total_hours": total_hours,
-            }
+        # Fælles for alle workers; tagget month:yyyy-mm ryddes ved skrivning i måneden
+        html = shared_cache.cache.get_or_set(
+            f"history-month:{year}-{month}:{version}", render, tags=[f"month:{year:04d}-{month:02d}"]
         )
+        response = make_response(html)
 
-    # Sorter måneder nyeste først
-    months = sorted(
-        groups.values(),
-        key=lambda g: (g["year"], g["month"]),
-        reverse=True,
-    )
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.vary.add("Cookie")
+    return response
 
-    # Indenfor hver måned: sorter vagter efter dato/tid (nyest øverst)
-    for g in months:
-        g["entries"].sort(
-            key=lambda e: (e["shift"]["date"], e["shift"]["time"]),
-            reverse=True,
-        )
+@app.get("/admin/profiler")
+@admin_required
+def admin_profiles():
+    """Liste over gemte request-profiler (tilføj ?_profile=1 til en side for at lave en)."""
+    return render_template("admin_profiles.html", profiles=profiling.list_profiles())
+
+
+@app.get("/admin/profiler/<profile_id>")
+@admin_required
+def admin_profile_view(profile_id: str):
+    path = profiling.profile_path(profile_id, ".txt")
+    if not path:
+        abort(404)
+    return send_file(path, mimetype="text/plain")
+
+
+@app.get("/admin/profiler/<profile_id>/download")
+@admin_required
+def admin_profile_download(profile_id: str):
+    """Rå pstats-fil (åbn med snakeviz / python -m pstats)."""
+    path = profiling.profile_path(profile_id, ".prof")
+    if not path:
+        abort(404)
+    return send_file(path, mimetype="application/octet-stream", as_attachment=True)
 
-    return render_template("admin_history.html", months=months)
 
 @app.post("/admin/historik/revive/<int:shift_id>")
 @admin_required
@@ -1155,6 +1550,7 @@ def admin_timer_approve(signup_id: int):
         return redirect(request.referrer or url_for("admin_timer"))
 
     database.approve_work_hours(signup_id, approved)
+    applog.event("hours_approved", signup_id=signup_id, approved_work_hours=approved)
     flash("Timer godkendt.")
     return redirect(request.referrer or url_for("admin_timer"))
 
@@ -1187,6 +1583,7 @@ def admin_approve_signup(signup_id):
 
     # Der er stadig plads – godkend tilmeldingen
     database.set_signup_status(signup_id, STATUS_APPROVED)
+    applog.event("signup_approved", signup_id=signup_id, shift_id=signup["shift_id"])
     flash("Tilmelding godkendt.")
 
     return redirect(url_for("admin_shift_detail", shift_id=signup["shift_id"]))
@@ -1290,6 +1687,7 @@ def admin_reject_signup(signup_id):
 
     # Slet tilmeldingen helt
     database.delete_signup(signup_id)
+    applog.event("signup_rejected", signup_id=signup_id, shift_id=signup["shift_id"])
 
     return redirect(url_for("admin_shift_detail", shift_id=signup["shift_id"]))
 
@@ -1307,6 +1705,7 @@ def admin_release_approve(signup_id):
 
     # Slet tilmeldingen helt
     database.delete_signup(signup_id)
+    applog.event("release_approved", signup_id=signup_id, shift_id=signup["shift_id"])
 
     return redirect(url_for("admin_shift_detail", shift_id=signup["shift_id"]))
 
@@ -1323,6 +1722,7 @@ def admin_release_deny(signup_id):
     signup = database.get_signup(signup_id)
     if not signup:
         abort(404)
+    applog.event("release_denied", signup_id=signup_id, shift_id=signup["shift_id"])
     return redirect(url_for("admin_shift_detail", shift_id=signup["shift_id"]))
 
 @app.post("/admin/shifts/<int:shift_id>/set-active")
@@ -1415,6 +1815,12 @@ def admin_set_meet_time(signup_id):
     return redirect(url_for("admin_shift_detail", shift_id=signup["shift_id"]))
 
 
+# Indlæs alle templates ved opstart (fra bytecode-cachen), så første request i en
+# ny worker ikke skal kompilere dem
+if jinja_cache.TEMPLATE_WARMUP:
+    jinja_cache.precompile(app)
+
+
 if __name__ == "__main__":
     app.run(debug=True)
 
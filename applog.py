@@ -0,0 +1,72 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+
+# Struktureret logning: én JSON-linje pr. record.
+#
+# Alle loggers skriver til en QueueHandler, og en baggrundstråd (QueueListener)
+# står for selve skrivningen til stdout. Et request venter derfor aldrig på I/O,
+# heller ikke med PYTHONUNBUFFERED=1.
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").strip().upper() or "INFO"
+
+# Standard-attributter på LogRecord, som ikke skal med som ekstra felter
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def setup() -> None:
+    """Konfigurér 'myggens'-loggeren én gang pr. proces (kaldes ved import)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger("myggens")
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"myggens.{name}")
+
+
+_events = get_logger("events")
+
+
+def event(name: str, **fields) -> None:
+    """Domæne-event, fx event('signup_created', signup_id=1, shift_id=2)."""
+    _events.info(name, extra={"event": name, **fields})
+
+
+setup()
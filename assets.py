@@ -0,0 +1,132 @@
+import hashlib
+import mimetypes
+import os
+import re
+from functools import lru_cache
+
+from flask import abort, send_file, send_from_directory, url_for
+
+import compression
+
+# Fingerprintede assets (CSS/JS i static/).
+#
+# asset_url('css/app.css') -> /assets/css/app.3f9c1a2b7d.css
+#
+# Hashen er et udsnit af filens sha256, så URL'en skifter når indholdet ændres.
+# Derfor kan /assets/ svare med "Cache-Control: immutable" og et års max-age –
+# browseren henter kun filen igen efter en ændring. Hashen beregnes én gang pr.
+# (fil, mtime), så ændringer under udvikling slår igennem uden genstart.
+
+HASH_LENGTH = 10
+MAX_AGE = 365 * 24 * 3600
+
+_HASHED_NAME = re.compile(r"^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[A-Za-z0-9]+)$" % HASH_LENGTH)
+
+_static_folder = None
+_template_folder = None
+
+
+@lru_cache(maxsize=256)
+def _file_hash(path: str, mtime_ns: int) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+    return h.hexdigest()[:HASH_LENGTH]
+
+
+def _current_hash(filename: str) -> str | None:
+    path = os.path.join(_static_folder, filename)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return _file_hash(path, st.st_mtime_ns)
+
+
+def hashed_name(filename: str) -> str:
+    """'css/app.css' -> 'css/app.<hash>.css' (uændret hvis filen ikke findes)."""
+    digest = _current_hash(filename)
+    if digest is None:
+        return filename
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}.{digest}{ext}"
+
+
+def template_hash(template_name: str) -> str:
+    """
+    Fingerprint af en template-fil (samme hash som for assets). Bruges i nøgler og
+    ETags for cachede HTML-fragmenter, så en deploy med ændret markup ikke
+    serverer de gamle fragmenter, før data ændres.
+    """
+    path = os.path.join(_template_folder, template_name)
+    try:
+        return _file_hash(path, os.stat(path).st_mtime_ns)
+    except OSError:
+        return ""
+
+
+@lru_cache(maxsize=1)
+def build_id() -> str:
+    """
+    Fingerprint af den kørende udgave: templates og alt i static/ (sti, størrelse,
+    mtime), beregnet én gang pr. proces. Indgår i sidernes ETag, så en browser
+    efter en deploy ikke får 304 på gammel HTML, der peger på /assets/-URL'er
+    med hashes, som ikke længere findes.
+    """
+    h = hashlib.sha256()
+    for folder in (_template_folder, _static_folder):
+        for root, dirs, files in os.walk(folder):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                h.update(f"{os.path.relpath(path, folder)}|{st.st_size}|{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()[:HASH_LENGTH]
+
+
+def asset_url(filename: str) -> str:
+    """Template-helper: URL til den fingerprintede udgave af en fil i static/."""
+    return url_for("asset", filename=hashed_name(filename))
+
+
+def _serve_asset(filename: str):
+    m = _HASHED_NAME.match(filename)
+    if not m:
+        abort(404)
+    original = m.group("stem") + m.group("ext")
+    # Kun den aktuelle hash er gyldig – en gammel URL må ikke caches som immutable
+    if _current_hash(original) != m.group("hash"):
+        abort(404)
+
+    # Forkomprimeret .br/.gz (python compression.py) hvis klienten accepterer det
+    precompressed = compression.precompressed_path(os.path.join(_static_folder, original))
+    if precompressed is not None:
+        path, encoding = precompressed
+        response = send_file(
+            path,
+            mimetype=mimetypes.guess_type(original)[0],
+            max_age=MAX_AGE,
+            conditional=True,
+            etag=f"{m.group('hash')}-{encoding}",
+        )
+        response.headers["Content-Encoding"] = encoding
+    else:
+        response = send_from_directory(_static_folder, original, max_age=MAX_AGE, conditional=True)
+    if original.endswith(compression.PRECOMPRESS_EXTENSIONS):
+        response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app) -> None:
+    """Registrér /assets/<filnavn> og asset_url() i templates."""
+    global _static_folder, _template_folder
+    _static_folder = app.static_folder
+    _template_folder = os.path.join(app.root_path, app.template_folder)
+    app.add_url_rule("/assets/<path:filename>", endpoint="asset", view_func=_serve_asset)
+    app.add_template_global(asset_url, "asset_url")
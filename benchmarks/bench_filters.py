@@ -0,0 +1,110 @@
+"""
+Micro-benchmark: cachede template-filtre (formatting.py) mod de gamle.
+
+Renderer en historik-lignende tabel med N rækker (dato, start/slut, timer og
+månedstotal) to gange:
+
+  - før:  dkdate via strptime/strftime og "%.2f"|format(...)
+  - efter: |dkdate, |hhmm og |hours fra formatting.py (LRU-cachede)
+
+Kør fra projektroden:
+
+    python benchmarks/bench_filters.py --rows 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from jinja2 import Environment
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import formatting  # noqa: E402
+
+BEFORE = """
+{%- for r in rows %}
+<tr><td>{{ r.date|legacy_dkdate }}</td><td>{{ r.work_start or "-" }}</td><td>{{ r.work_end or "-" }}</td>
+<td>{{ "%.2f"|format(r.work_hours or 0) }}</td></tr>
+{%- endfor %}
+<tr><td>I alt</td><td>{{ "%.2f"|format(total) }}</td></tr>
+"""
+
+AFTER = """
+{%- for r in rows %}
+<tr><td>{{ r.date|dkdate }}</td><td>{{ r.work_start|hhmm }}</td><td>{{ r.work_end|hhmm }}</td>
+<td>{{ r.work_hours|hours }}</td></tr>
+{%- endfor %}
+<tr><td>I alt</td><td>{{ total|hours }}</td></tr>
+"""
+
+
+def legacy_dkdate(value):
+    # Filteret som det så ud før formatting.py
+    if not value:
+        return ""
+    try:
+        d = datetime.strptime(value, "%Y-%m-%d")
+        return d.strftime("%d-%m-%Y")
+    except Exception:
+        return value
+
+
+def _rows(n: int):
+    rnd = random.Random(42)
+    start = date(2024, 1, 1)
+    rows = []
+    for _ in range(n):
+        d = start + timedelta(days=rnd.randrange(365))
+        rows.append(
+            {
+                "date": d.isoformat(),
+                "work_start": rnd.choice(["16:00", "17:00", "17:30", "18:00"]),
+                "work_end": rnd.choice(["22:00", "23:00", "00:30", None]),
+                "work_hours": rnd.choice([4.5, 5.0, 5.5, 6.0, 6.25, 6.5, None]),
+            }
+        )
+    return rows
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    env = Environment()
+    env.filters["legacy_dkdate"] = legacy_dkdate
+    env.filters["dkdate"] = formatting.dk_date
+    env.filters["hhmm"] = formatting.hhmm
+    env.filters["hours"] = formatting.hours
+    before = env.from_string(BEFORE)
+    after = env.from_string(AFTER)
+
+    rows = _rows(args.rows)
+    total = sum(r["work_hours"] or 0 for r in rows)
+
+    t_before = _best(lambda: before.render(rows=rows, total=total), args.repeat)
+    t_after = _best(lambda: after.render(rows=rows, total=total), args.repeat)
+
+    print(f"{args.rows} rækker, bedste af {args.repeat}")
+    print(f"  før   (strptime + format): {t_before * 1000:8.2f} ms")
+    print(f"  efter (cachede filtre):    {t_after * 1000:8.2f} ms   ({t_before / t_after:.1f}x)")
+    for name, info in formatting.cache_stats().items():
+        print(f"  {name:<8} hits={info['hits']:<8} misses={info['misses']:<6} size={info['currsize']}")
+
+
+if __name__ == "__main__":
+    main()
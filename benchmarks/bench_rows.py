@@ -0,0 +1,185 @@
+"""
+Benchmark: kompakte rækker (ShiftRow/HoursRow) mod de gamle dict-rækker.
+
+Opretter en midlertidig database med N historiske vagter og N godkendte
+tilmeldinger i samme måned, og måler for hhv. historik-listen
+(get_historic_shifts) og timer/løn-udtrækket (get_hours_for_month):
+
+  - CPU: bedste af --repeat kørsler (perf_counter)
+  - hukommelse: tracemalloc-peak under kørslen og størrelsen af resultatet
+
+Kør fra projektroden:
+
+    python benchmarks/bench_rows.py --rows 100000
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _legacy_shift_dict(row):
+    # Sådan blev vagter bygget før ShiftRow (sqlite3.Row -> dict med key-probing)
+    return {
+        "id": row["id"],
+        "date": row["date"],
+        "time": row["start_time"],
+        "location": row["location"],
+        "description": row["description"],
+        "customer": row["customer"] if "customer" in row.keys() else None,
+        "event_type": row["event_type"] if "event_type" in row.keys() else None,
+        "guest_count": row["guest_count"] if "guest_count" in row.keys() else None,
+        "admin_note": row["admin_note"] if "admin_note" in row.keys() else None,
+        "needed": row["required_staff"],
+        "approved": row["approved_count"],
+        "pending": 0,
+        "pending_signups": 0,
+        "pending_releases": 0,
+        "is_active": row["is_active"],
+    }
+
+
+def _legacy_hours_dict(row):
+    return {
+        "signup_id": row["signup_id"],
+        "work_start": row["work_start"],
+        "work_end": row["work_end"],
+        "work_hours": row["work_hours"],
+        "approved_work_hours": row["approved_work_hours"],
+        "hours_approved_by_admin": bool(row["hours_approved_by_admin"]),
+        "payroll_paid": bool(row["payroll_paid"]),
+        "payroll_paid_at": row["payroll_paid_at"],
+        "shift_date": row["shift_date"],
+        "location": row["location"],
+        "description": row["description"],
+        "person_id": row["person_id"],
+        "person_name": row["person_name"],
+        "phone": row["phone"],
+    }
+
+
+def _legacy(database, sql, params, build):
+    conn = database.get_connection()
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    rows = cur.fetchall()
+    conn.close()
+    return [build(row) for row in rows]
+
+
+def _compact(database, sql, params, cls):
+    conn = database.get_connection()
+    cur = conn.cursor()
+    rows = database._fetch_compact(cur, cls, sql, params)
+    conn.close()
+    return rows
+
+
+def _container_size(rows) -> int:
+    # Kun listen + rækkeobjekterne; feltværdierne er de samme i begge varianter
+    return sys.getsizeof(rows) + sum(sys.getsizeof(r) for r in rows)
+
+
+def _measure(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, _container_size(result), len(result)
+
+
+def _seed(database, n: int) -> None:
+    conn = database.get_connection()
+    cur = conn.cursor()
+    cur.executemany(
+        "INSERT INTO persons (name, phone, phone_norm) VALUES (?, ?, ?)",
+        [(f"Person {i}", f"9{i:07d}", f"9{i:07d}") for i in range(1000)],
+    )
+    cur.executemany(
+        """
+        INSERT INTO shifts (date, start_time, location, description, required_staff, is_active, customer)
+        VALUES (?, ?, ?, ?, ?, -1, ?)
+        """,
+        [("2024-01-%02d" % (i % 28 + 1), "%02d:00" % (i % 24), f"Sted {i % 50}", "Arrangement", 3, f"Kunde {i % 200}")
+         for i in range(n)],
+    )
+    cur.executemany(
+        """
+        INSERT INTO signups (person_id, shift_id, status, work_start, work_end, work_hours)
+        VALUES (?, ?, 'APPROVED', '17:00', '23:00', 6)
+        """,
+        [(i % 1000 + 1, i + 1) for i in range(n)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["DB_PATH"] = os.path.join(tmp, "bench.sqlite3")
+    os.environ["METRICS_DIR"] = os.path.join(tmp, "metrics")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    import database
+
+    database.init_db()
+    _seed(database, args.rows)
+
+    history_sql = """
+        SELECT s.*, COALESCE(SUM(CASE WHEN sg.status = ? THEN 1 ELSE 0 END), 0) AS approved_count
+        FROM shifts s
+        LEFT JOIN signups sg ON sg.shift_id = s.id
+        WHERE s.is_active = -1
+        GROUP BY s.id
+        ORDER BY s.date DESC, s.start_time DESC
+    """
+    history_params = (database.STATUS_APPROVED,)
+
+    hours_sql = """
+        SELECT
+            sg.id AS signup_id, sg.work_start, sg.work_end, sg.work_hours, sg.approved_work_hours,
+            sg.hours_approved_by_admin, sg.payroll_paid, sg.payroll_paid_at,
+            s.date AS shift_date, s.location AS location, s.description AS description,
+            p.id AS person_id, p.name AS person_name, p.phone AS phone
+        FROM signups sg
+        JOIN shifts s ON s.id = sg.shift_id
+        JOIN persons p ON p.id = sg.person_id
+        WHERE sg.status = 'APPROVED'
+        ORDER BY person_name, shift_date
+    """
+
+    cases = [
+        ("historik  dict", lambda: _legacy(database, history_sql, history_params, _legacy_shift_dict)),
+        ("historik  compact", lambda: _compact(database, history_sql, history_params, database.ShiftRow)),
+        ("timer     dict", lambda: _legacy(database, hours_sql, (), _legacy_hours_dict)),
+        ("timer     compact", lambda: _compact(database, hours_sql, (), database.HoursRow)),
+    ]
+
+    print(f"{args.rows} rækker, bedste af {args.repeat}\n")
+    print(f"{'case':<20}{'rækker':>9}{'tid (ms)':>12}{'peak (MB)':>12}{'resultat (MB)':>16}")
+    for name, fn in cases:
+        best, peak, size, count = _measure(fn, args.repeat)
+        print(f"{name:<20}{count:>9}{best * 1000:>12.1f}{peak / 1e6:>12.1f}{size / 1e6:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
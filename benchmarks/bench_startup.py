@@ -0,0 +1,127 @@
+"""
+Startup-benchmark: latenstid for første request pr. route i en frisk proces.
+
+Hver variant kører i sin egen Python-proces (som en ny gunicorn-worker) mod en
+midlertidig database:
+
+  - kold:    tom template-cache, ingen warmup (som før – kompilering ved første request)
+  - bytecode: forkompileret cache (python jinja_cache.py), ingen warmup
+  - warmup:  forkompileret cache + TEMPLATE_WARMUP=1 (templates indlæses ved import)
+
+Kør fra projektroden:
+
+    python benchmarks/bench_startup.py
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROUTES = [
+    "/vagter",
+    "/mine-vagter",
+    "/mine-vagter/historik",
+    "/admin",
+    "/admin/actions",
+    "/admin/overblik",
+    "/admin/personer",
+    "/admin/shift/{shift_id}",
+    "/admin/timer",
+    "/admin/historik",
+]
+
+# Kører i child-processen: importér app, log ind og mål første GET pr. route
+CHILD = r"""
+import json, os, sys, time
+from datetime import date, timedelta
+sys.path.insert(0, os.environ["BENCH_ROOT"])
+os.chdir(os.environ["BENCH_ROOT"])
+
+import database
+database.init_db()
+import migrate_schema
+migrate_schema.DB_PATH = os.environ["DB_PATH"]
+migrate_schema.main()
+shift_id = database.create_shift((date.today() + timedelta(days=3)).isoformat(), "17:00", "Bench", "Bench", 2)
+
+t0 = time.perf_counter()
+import app as appmod
+import_ms = (time.perf_counter() - t0) * 1000
+
+freelancer = appmod.app.test_client()
+freelancer.post("/freelancer/login", data={"name": "Bench", "phone": "11223344"})
+admin = appmod.app.test_client()
+admin.post("/admin/login", data={"password": os.environ["ADMIN_PASSWORD"]})
+
+result = {"import_ms": import_ms, "routes": {}}
+for route in json.loads(os.environ["BENCH_ROUTES"]):
+    url = route.format(shift_id=shift_id)
+    client = admin if url.startswith("/admin") else freelancer
+    t0 = time.perf_counter()
+    r = client.get(url)
+    result["routes"][route] = ((time.perf_counter() - t0) * 1000, r.status_code)
+print("BENCH " + json.dumps(result))
+"""
+
+
+def _run(cache_dir: str, warmup: bool) -> dict:
+    tmp = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        BENCH_ROOT=ROOT,
+        BENCH_ROUTES=json.dumps(ROUTES),
+        DB_PATH=os.path.join(tmp, "bench.sqlite3"),
+        METRICS_DIR=os.path.join(tmp, "metrics"),
+        PROFILE_DIR=os.path.join(tmp, "profiles"),
+        TEMPLATE_CACHE_DIR=cache_dir,
+        TEMPLATE_WARMUP="1" if warmup else "0",
+        ADMIN_PASSWORD="bench",
+        SECRET_KEY="bench",
+        LOG_LEVEL="ERROR",
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    line = next(l for l in out.splitlines() if l.startswith("BENCH "))
+    return json.loads(line[len("BENCH "):])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+
+    warm_cache = tempfile.mkdtemp()
+    subprocess.run(
+        [sys.executable, os.path.join(ROOT, "jinja_cache.py")],
+        env=dict(os.environ, TEMPLATE_CACHE_DIR=warm_cache, LOG_LEVEL="ERROR"),
+        check=True,
+        capture_output=True,
+    )
+
+    variants = [
+        ("kold", _run(tempfile.mkdtemp(), warmup=False)),
+        ("bytecode", _run(warm_cache, warmup=False)),
+        ("warmup", _run(warm_cache, warmup=True)),
+    ]
+
+    header = f"{'route':<28}" + "".join(f"{name:>12}" for name, _ in variants)
+    print("Første request pr. route (ms)\n")
+    print(header)
+    print(f"{'import app':<28}" + "".join(f"{res['import_ms']:>12.1f}" for _, res in variants))
+    totals = [0.0] * len(variants)
+    for route in ROUTES:
+        cells = []
+        for i, (_, res) in enumerate(variants):
+            ms, status = res["routes"][route]
+            totals[i] += ms
+            cells.append(f"{ms:>9.1f}{'' if status == 200 else '!':<3}")
+        print(f"{route:<28}" + "".join(cells))
+    print(f"{'sum af første requests':<28}" + "".join(f"{t:>12.1f}" for t in totals))
+
+
+if __name__ == "__main__":
+    main()
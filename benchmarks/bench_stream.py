@@ -0,0 +1,110 @@
+"""
+Benchmark: time-to-first-byte for /admin/overblik med streaming.
+
+Fylder en midlertidig database med et voksende antal kommende vagter
+(3 tilmeldinger pr. vagt) og måler for hver størrelse:
+
+  - første chunk: tid fra request til første bytes (header + første vagter)
+  - hele siden:   tid til sidste byte, og antal bytes
+
+Med streaming skal første chunk ligge fladt, mens hele siden vokser med antallet af vagter.
+
+Kør fra projektroden:
+
+    python benchmarks/bench_stream.py --shifts 250 1000 4000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _seed(database, n: int) -> None:
+    conn = database.get_connection()
+    cur = conn.cursor()
+    cur.executemany(
+        "INSERT INTO persons (name, phone, phone_norm) VALUES (?, ?, ?)",
+        [(f"Person {i}", f"9{i:07d}", f"9{i:07d}") for i in range(300)],
+    )
+    start = date.today()
+    shifts = [
+        ((start + timedelta(days=i // 5)).isoformat(), "%02d:00" % (10 + i % 5 * 2), f"Sted {i % 20}", "Arrangement", 3, f"Kunde {i}")
+        for i in range(n)
+    ]
+    cur.executemany(
+        """
+        INSERT INTO shifts (date, start_time, location, description, required_staff, is_active, customer)
+        VALUES (?, ?, ?, ?, ?, 1, ?)
+        """,
+        shifts,
+    )
+    cur.executemany(
+        """
+        INSERT INTO signups (person_id, shift_id, status, work_start, work_end, work_hours)
+        VALUES (?, ?, 'APPROVED', '17:00', '23:00', 6)
+        """,
+        [((shift_id * 3 + k) % 300 + 1, shift_id) for shift_id in range(1, len(shifts) + 1) for k in range(3)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def _measure(client, url: str, repeat: int):
+    best_first = best_total = float("inf")
+    size = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        response = client.get(url, buffered=False)
+        chunks = iter(response.response)
+        first = next(chunks)
+        t_first = time.perf_counter() - t0
+        size = len(first) + sum(len(c) for c in chunks)
+        response.close()
+        best_first = min(best_first, t_first)
+        best_total = min(best_total, time.perf_counter() - t0)
+    return best_first, best_total, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shifts", type=int, nargs="+", default=[250, 1000, 4000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["DB_PATH"] = os.path.join(tmp, "bench.sqlite3")
+    os.environ["METRICS_DIR"] = os.path.join(tmp, "metrics")
+    os.environ["PROFILE_DIR"] = os.path.join(tmp, "profiles")
+    os.environ["TEMPLATE_CACHE_DIR"] = os.path.join(tmp, "jinja")
+    os.environ.setdefault("ADMIN_PASSWORD", "bench")
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+    import database
+    import app as appmod
+
+    print(f"/admin/overblik, bedste af {args.repeat}\n")
+    print(f"{'vagter':>9}{'første chunk (ms)':>20}{'hele siden (ms)':>18}{'KB':>9}")
+    for n in args.shifts:
+        database.DB_PATH = os.path.join(tmp, f"bench-{n}.sqlite3")
+        database.init_db()
+        # init_db seeder et par vagter i en tom database – dem fjerner vi
+        conn = database.get_connection()
+        conn.execute("DELETE FROM shifts")
+        conn.commit()
+        conn.close()
+        _seed(database, n)
+
+        client = appmod.app.test_client()
+        client.post("/admin/login", data={"password": os.environ["ADMIN_PASSWORD"]})
+        first, total, size = _measure(client, "/admin/overblik", args.repeat)
+        print(f"{n:>9}{first * 1000:>20.1f}{total * 1000:>18.1f}{size / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import gzip
+import os
+import sys
+import time
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli er valgfri – uden den bruges kun gzip
+    brotli = None
+
+# Komprimering af svar (gzip/brotli).
+#
+# Admin-siderne (overblik, historik, timer) er store HTML-tabeller med meget
+# gentagelse, og på mobil er det payload-størrelsen der koster. Et after_request
+# hook komprimerer HTML/JSON/tekst efter klientens Accept-Encoding:
+#
+#   - almindelige svar under MIN_SIZE bytes sendes som de er
+#   - streamede svar komprimeres chunk for chunk med flush, så browseren stadig
+#     får de første bytes med det samme
+#   - filer fra send_file (static/assets) røres ikke; til /assets/ laver
+#     `python compression.py` (Dockerfile) færdige .br/.gz ved siden af filerne
+
+MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "500"))
+GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", "6"))
+# Brotli-kvalitet til dynamiske svar (11 er for langsom pr. request, 4-5 er ~gzip-hastighed)
+BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_MIMETYPES = {
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/csv",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+}
+
+# Filtyper i static/ der får forkomprimerede varianter (billeder/fonte er allerede komprimerede)
+PRECOMPRESS_EXTENSIONS = (".css", ".js", ".svg", ".json", ".txt")
+
+# Kodning -> filendelse for forkomprimerede filer
+_PRECOMPRESSED_SUFFIX = {"br": ".br", "gzip": ".gz"}
+
+
+def available_encodings() -> list[str]:
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def negotiate(encodings: list[str] | None = None) -> str | None:
+    """Bedste kodning ud fra Accept-Encoding (br foretrækkes ved lige q-værdi)."""
+    return request.accept_encodings.best_match(encodings or available_encodings())
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _stream_compressor(chunks, encoding: str):
+    # Flush efter hver chunk: lidt dårligere ratio, men bytes når frem med det samme
+    if encoding == "br":
+        c = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            out = c.process(chunk) + c.flush()
+            if out:
+                yield out
+        yield c.finish()
+    else:
+        c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 = gzip-header
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            out = c.compress(chunk) + c.flush(zlib.Z_SYNC_FLUSH)
+            if out:
+                yield out
+        yield c.flush()
+
+
+def _should_compress(response) -> bool:
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if response.direct_passthrough or "Content-Encoding" in response.headers:
+        return False
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return False
+    if "no-transform" in response.headers.get("Cache-Control", ""):
+        return False
+    return request.method != "HEAD"
+
+
+def compress_response(response):
+    """after_request: komprimér svaret hvis klienten og indholdet tillader det."""
+    if not _should_compress(response):
+        return response
+
+    # Svaret afhænger af Accept-Encoding, også når vi vælger ikke at komprimere
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _stream_compressor(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < MIN_SIZE:
+            return response
+        compressed = compress(data, encoding)
+        if len(compressed) >= len(data):
+            return response
+        response.set_data(compressed)
+
+    response.headers["Content-Encoding"] = encoding
+    # En stærk ETag gælder præcis de bytes der sendes – gør den unik pr. kodning
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f"{etag}-{encoding}")
+    return response
+
+
+def precompressed_path(path: str) -> tuple[str, str] | None:
+    """
+    (sti, kodning) for en forkomprimeret variant af `path` som klienten accepterer
+    og som ikke er ældre end originalen – ellers None.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    accepted = [enc for enc in _PRECOMPRESSED_SUFFIX if request.accept_encodings[enc]]
+    for encoding in ("br", "gzip"):
+        if encoding not in accepted:
+            continue
+        candidate = path + _PRECOMPRESSED_SUFFIX[encoding]
+        try:
+            if os.stat(candidate).st_mtime_ns >= mtime:
+                return candidate, encoding
+        except OSError:
+            continue
+    return None
+
+
+def precompress(static_folder: str) -> list[tuple[str, int, dict]]:
+    """
+    Skriv .gz (og .br hvis brotli findes) ved siden af tekst-filer i static/.
+    Maks. kompression – det sker kun ved build. Returnerer [(fil, bytes, {kodning: bytes})].
+    """
+    results = []
+    for dirpath, _dirnames, filenames in os.walk(static_folder):
+        for filename in sorted(filenames):
+            if not filename.endswith(PRECOMPRESS_EXTENSIONS):
+                continue
+            path = os.path.join(dirpath, filename)
+            with open(path, "rb") as f:
+                data = f.read()
+            sizes = {}
+            outputs = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                outputs["br"] = brotli.compress(data, quality=11)
+            for encoding, compressed in outputs.items():
+                out_path = path + _PRECOMPRESSED_SUFFIX[encoding]
+                if len(compressed) >= len(data):
+                    # Ingen gevinst – fjern evt. gammel variant så originalen bruges
+                    if os.path.exists(out_path):
+                        os.remove(out_path)
+                    continue
+                with open(out_path, "wb") as f:
+                    f.write(compressed)
+                sizes[encoding] = len(compressed)
+            results.append((os.path.relpath(path, static_folder), len(data), sizes))
+    return results
+
+
+def init_app(app) -> None:
+    """Registrér komprimeringen. Kaldes før andre after_request-hooks, så den kører sidst."""
+    app.after_request(compress_response)
+
+
+def main() -> None:
+    static_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+    t0 = time.perf_counter()
+    results = precompress(static_folder)
+    total = time.perf_counter() - t0
+
+    for name, size, sizes in results:
+        variants = "  ".join(f"{enc} {n / 1024:6.1f} KB" for enc, n in sorted(sizes.items()))
+        print(f"  {name:<34} {size / 1024:7.1f} KB  {variants}")
+    if brotli is None:
+        print("  (brotli ikke installeret – kun .gz)", file=sys.stderr)
+    print(f"✓ {len(results)} filer forkomprimeret i {static_folder} ({total * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
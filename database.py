@@ -1,6 +1,21 @@
+import base64
+import json
 import os
+import re
 import sqlite3
+import threading
+import time
+import unicodedata
+from dataclasses import MISSING, dataclass, fields
 from datetime import date
+from difflib import SequenceMatcher
+from functools import lru_cache
+from operator import itemgetter
+
+import applog
+import metrics
+
+log = applog.get_logger("database")
 
 # Status-konstanter
 STATUS_REQUESTED = "REQUESTED"
@@ -47,12 +62,75 @@ if _db_dir:
 
 
 
+# Antal SQL-statements i det aktuelle request (pr. tråd), bruges til request-loggen
+_request_stats = threading.local()
+
+
+def reset_query_count() -> None:
+    _request_stats.queries = 0
+
+
+def get_query_count() -> int:
+    return getattr(_request_stats, "queries", 0)
+
+
+def _is_busy_error(e: sqlite3.OperationalError) -> bool:
+    msg = str(e).lower()
+    return "locked" in msg or "busy" in msg
+
+
+class _MetricsCursor(sqlite3.Cursor):
+    """Cursor der tæller statements og tid (inkl. ventetid på låse) til /metrics."""
+
+    def _timed(self, fn, sql, *args):
+        kind = "read" if sql.lstrip()[:6].upper() in ("SELECT", "PRAGMA") else "write"
+        t0 = time.perf_counter()
+        try:
+            return fn(sql, *args)
+        except sqlite3.OperationalError as e:
+            if _is_busy_error(e):
+                metrics.inc("myggens_db_busy_errors_total", op=kind)
+            raise
+        finally:
+            _request_stats.queries = getattr(_request_stats, "queries", 0) + 1
+            metrics.inc("myggens_db_queries_total", kind=kind)
+            metrics.observe("myggens_db_query_duration_seconds", time.perf_counter() - t0, kind=kind)
+
+    def execute(self, sql, parameters=()):
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+
+class _MetricsConnection(sqlite3.Connection):
+    def cursor(self, factory=_MetricsCursor):
+        return super().cursor(factory)
+
+    def commit(self):
+        t0 = time.perf_counter()
+        try:
+            super().commit()
+        except sqlite3.OperationalError as e:
+            if _is_busy_error(e):
+                metrics.inc("myggens_db_busy_errors_total", op="commit")
+            raise
+        metrics.inc("myggens_db_transactions_total")
+        metrics.observe("myggens_db_commit_duration_seconds", time.perf_counter() - t0)
+
+
+# Ventetid (ms) på en lås før "database is locked"
+BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000"))
+
+
 def get_connection():
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, factory=_MetricsConnection)
     conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    metrics.inc("myggens_db_connections_total")
     return conn
 
-print("DB PATH:", os.path.abspath(DB_PATH))
+log.info("database path", extra={"db_path": os.path.abspath(DB_PATH)})
 
 def _ensure_column(conn: sqlite3.Connection, table: str, col: str, coldef: str) -> None:
     cur = conn.cursor()
@@ -67,6 +145,10 @@ def init_db():
     conn = get_connection()
     cur = conn.cursor()
 
+    # WAL: læsere (fx en side der streames) blokerer ikke skrivninger og omvendt.
+    # Indstillingen gemmes i filen, så den gælder for alle senere forbindelser.
+    cur.execute("PRAGMA journal_mode = WAL")
+
     # Freelancere
     cur.execute(
         """
@@ -146,6 +228,21 @@ def init_db():
     _ensure_column(conn, "signups", "available_until", "TEXT")
     _ensure_column(conn, "signups", "freelancer_note", "TEXT")
 
+    _ensure_phone_norm(conn)
+    _ensure_generated_columns(conn)
+    _ensure_changes(conn)
+
+    # Prefix-søgning på navn (typeahead i admin) + keyset-paginering af personer
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_persons_name_nocase ON persons(name COLLATE NOCASE)")
+    # Keyset-paginering af vagter pr. tilstand (aktiv/arkiv/historik)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_shifts_state_date ON shifts(is_active, date, start_time)")
+    # Bemanding: counts pr. vagt og opslag af ventende tilmeldinger (dashboard/indbakke)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_signups_status_shift ON signups(status, shift_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_signups_shift_status ON signups(shift_id, status)")
+    conn.commit()
+
+    _ensure_search_index(conn)
+
     # Seed nogle standard-shifts første gang
     cur.execute("SELECT COUNT(*) AS c FROM shifts")
     row = cur.fetchone()
@@ -166,38 +263,821 @@ def init_db():
     conn.close()
 
 
-def _shift_row_to_dict(row, approved_count: int = 0, requested_count: int = 0, release_requested_count: int = 0):
-    pending = requested_count + release_requested_count
+def normalize_phone(phone: str | None) -> str:
+    """
+    Kanonisk telefonnummer til opslag:
+    - fjerner mellemrum og tegnsætning ('-', '.', '(', ')', '/')
+    - numre med landekode 45 ('+45 12 34 56 78', '004512345678') gemmes som 8 cifre
+    - alle andre numre skrevet med '+'/'00' gemmes som '+<cifre>' ('+12345678' forbliver
+      udenlandsk, selvom det har 8 cifre)
+    - numre uden '+'/'00' gemmes som de cifre der er skrevet – '45' fjernes kun, når
+      nummeret er markeret som udenlandsk
+    Returnerer '' hvis der ikke er nogen cifre.
+    """
+    if not phone:
+        return ""
+    raw = phone.strip()
+    digits = re.sub(r"\D", "", raw)
+    if not digits:
+        return ""
+
+    international = raw.startswith("+") or digits.startswith("00")
+    if digits.startswith("00"):
+        digits = digits[2:]
+
+    if not international:
+        return digits
+    if len(digits) == 10 and digits.startswith("45"):
+        return digits[2:]
+    return "+" + digits
+
+
+_STATUS_RANK = {
+    STATUS_APPROVED: 3,
+    STATUS_RELEASE_REQUESTED: 2,
+    STATUS_REQUESTED: 1,
+    STATUS_CANCELLED_BY_ADMIN: 0,
+}
+
+
+# Timefelterne på en tilmelding, som ved fletning flyttes samlet (de hører sammen)
+_HOURS_COLUMNS = (
+    "work_start, work_end, work_hours, approved_work_hours, hours_approved_by_admin, payroll_paid, payroll_paid_at"
+)
+# 2 = udbetalt, 1 = godkendt af admin, 0 = kun registreret/ingen
+_HOURS_RANK_SQL = (
+    "CASE WHEN COALESCE(payroll_paid, 0) != 0 THEN 2 "
+    "WHEN COALESCE(hours_approved_by_admin, 0) != 0 THEN 1 ELSE 0 END"
+)
+
+
+def _merge_person_rows(cur: sqlite3.Cursor, survivor_id: int, duplicate_id: int) -> None:
+    """
+    Flyt alle signups + extra_shifts fra duplicate_id til survivor_id og slet duplikatet.
+    UNIQUE(person_id, shift_id): har begge en tilmelding til samme vagt, beholdes
+    den med "stærkest" status (APPROVED > RELEASE_REQUESTED > REQUESTED > CANCELLED),
+    og godkendte/udbetalte timer fra den anden følger med (se _HOURS_RANK_SQL).
+    Kører på den givne cursor – caller står for commit/rollback.
+    """
+    cur.execute(
+        """
+        SELECT d.id AS dup_signup, d.status AS dup_status,
+               s.id AS surv_signup, s.status AS surv_status
+        FROM signups d
+        JOIN signups s ON s.shift_id = d.shift_id AND s.person_id = ?
+        WHERE d.person_id = ?
+        """,
+        (survivor_id, duplicate_id),
+    )
+    for row in cur.fetchall():
+        dup_rank = _STATUS_RANK.get(row["dup_status"], 0)
+        surv_rank = _STATUS_RANK.get(row["surv_status"], 0)
+        if dup_rank > surv_rank:
+            keeper, loser = row["dup_signup"], row["surv_signup"]
+        else:
+            keeper, loser = row["surv_signup"], row["dup_signup"]
+
+        # Mist ikke registrerede timer/noter fra den tilmelding der slettes.
+        # Timer der er godkendt eller udbetalt, er med i lønnen: de vinder over
+        # keepers (udbetalt > godkendt > registreret), ellers udfyldes kun huller.
+        cur.execute(
+            f"SELECT id, {_HOURS_RANK_SQL} AS hours_rank FROM signups WHERE id IN (?, ?)",
+            (keeper, loser),
+        )
+        hours_rank = {r["id"]: r["hours_rank"] for r in cur.fetchall()}
+        if hours_rank[loser] > hours_rank[keeper]:
+            cur.execute(
+                f"""
+                UPDATE signups
+                SET ({_HOURS_COLUMNS}) = (SELECT {_HOURS_COLUMNS} FROM signups WHERE id = :loser)
+                WHERE id = :keeper
+                """,
+                {"loser": loser, "keeper": keeper},
+            )
+        cur.execute(
+            """
+            UPDATE signups
+            SET work_start = COALESCE(work_start, (SELECT work_start FROM signups WHERE id = :loser)),
+                work_end = COALESCE(work_end, (SELECT work_end FROM signups WHERE id = :loser)),
+                work_hours = COALESCE(work_hours, (SELECT work_hours FROM signups WHERE id = :loser)),
+                approved_work_hours = COALESCE(approved_work_hours, (SELECT approved_work_hours FROM signups WHERE id = :loser)),
+                payroll_paid_at = COALESCE(payroll_paid_at, (SELECT payroll_paid_at FROM signups WHERE id = :loser)),
+                freelancer_note = COALESCE(freelancer_note, (SELECT freelancer_note FROM signups WHERE id = :loser))
+            WHERE id = :keeper
+            """,
+            {"loser": loser, "keeper": keeper},
+        )
+        cur.execute("DELETE FROM signups WHERE id = ?", (loser,))
+
+    cur.execute("UPDATE signups SET person_id = ? WHERE person_id = ?", (survivor_id, duplicate_id))
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'extra_shifts'")
+    if cur.fetchone():
+        cur.execute("UPDATE extra_shifts SET person_id = ? WHERE person_id = ?", (survivor_id, duplicate_id))
+    cur.execute("DELETE FROM persons WHERE id = ?", (duplicate_id,))
+
+
+def _ensure_phone_norm(conn: sqlite3.Connection) -> None:
+    """
+    Sørg for persons.phone_norm (kanonisk telefon) med unikt index.
+    Ved hver opstart genberegnes phone_norm fra phone, så ændringer i normalize_phone
+    slår igennem. Ender flere personer med samme nummer, flettes de IKKE automatisk:
+    den ældste (laveste id, eller den der allerede har nummeret) beholder phone_norm,
+    de øvrige får NULL og logges som kollision. De vises på dublet-siden, hvor en
+    admin kan flette dem.
+    """
+    _ensure_column(conn, "persons", "phone_norm", "TEXT")
+    cur = conn.cursor()
+
+    cur.execute("SELECT id, phone, phone_norm FROM persons ORDER BY id")
+    rows = cur.fetchall()
+    current = {r["id"]: r["phone_norm"] for r in rows}
+
+    groups = {}
+    for r in rows:
+        groups.setdefault(normalize_phone(r["phone"]) or r["phone"], []).append(r["id"])
+
+    wanted = {}
+    for phone_norm, ids in groups.items():
+        keeper = next((i for i in ids if current[i] == phone_norm), ids[0])
+        wanted[keeper] = phone_norm
+        others = [i for i in ids if i != keeper]
+        for i in others:
+            wanted[i] = None
+        if others:
+            log.warning(
+                "phone collision",
+                extra={"phone_norm": phone_norm, "person_id": keeper, "duplicate_ids": others},
+            )
+
+    changed = [(v, i) for i, v in wanted.items() if current[i] != v]
+    if changed:
+        # Først NULL, så ingen mellemtilstand rammer det unikke index
+        cur.executemany("UPDATE persons SET phone_norm = NULL WHERE id = ?", [(i,) for _, i in changed])
+        cur.executemany("UPDATE persons SET phone_norm = ? WHERE id = ?", [c for c in changed if c[0] is not None])
+
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_persons_phone_norm ON persons(phone_norm)")
+    conn.commit()
+
+
+# Tabeller hvis ændringer logges i changes
+_VERSIONED_TABLES = ("shifts", "signups", "persons", "extra_shifts")
+
+
+# ============================
+# Afledte dato-/tidskolonner
+# ============================
+# VIRTUAL generated columns, som SQLite beregner ud fra TEXT-kolonnerne 'YYYY-MM-DD' /
+# 'HH:MM'. Gruppering, intervaller og dansk visning læses direkte herfra i stedet for
+# at parse strengene i Python for hver række. Ugyldige værdier giver NULL (datoer
+# vises da uændret i *_dk).
+_ISO_DATE_GLOB = "'[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'"
+
+
+def _date_columns(col: str, prefix: str = "date") -> list[tuple[str, str]]:
+    valid = f"{col} GLOB {_ISO_DATE_GLOB}"
+    return [
+        (f"{prefix}_year", f"INTEGER GENERATED ALWAYS AS (CASE WHEN {valid} THEN CAST(substr({col}, 1, 4) AS INTEGER) END) VIRTUAL"),
+        (f"{prefix}_month", f"INTEGER GENERATED ALWAYS AS (CASE WHEN {valid} THEN CAST(substr({col}, 6, 2) AS INTEGER) END) VIRTUAL"),
+        (f"{prefix}_jd", f"INTEGER GENERATED ALWAYS AS (CAST(julianday({col}) AS INTEGER)) VIRTUAL"),
+        (f"{prefix}_dk", f"TEXT GENERATED ALWAYS AS (CASE WHEN {valid} THEN substr({col}, 9, 2) || '-' || substr({col}, 6, 2) || '-' || substr({col}, 1, 4) ELSE {col} END) VIRTUAL"),
+    ]
+
+
+def _minutes_column(name: str, col: str) -> tuple[str, str]:
+    # 'HH:MM' (eller 'H:MM') -> minutter efter midnat
+    return (
+        name,
+        f"INTEGER GENERATED ALWAYS AS (CASE WHEN instr({col}, ':') > 1 THEN "
+        f"CAST(substr({col}, 1, instr({col}, ':') - 1) AS INTEGER) * 60 + CAST(substr({col}, instr({col}, ':') + 1) AS INTEGER) "
+        f"END) VIRTUAL",
+    )
+
+
+def _work_minutes_columns() -> list[tuple[str, str]]:
+    return [
+        _minutes_column("work_start_minutes", "work_start"),
+        _minutes_column("work_end_minutes", "work_end"),
+        # Varighed; slut før start = over midnat
+        ("work_minutes", "INTEGER GENERATED ALWAYS AS ((work_end_minutes - work_start_minutes + 1440) % 1440) VIRTUAL"),
+    ]
+
+
+_GENERATED_COLUMNS = {
+    "shifts": _date_columns("date") + [_minutes_column("start_minutes", "start_time")],
+    "signups": _work_minutes_columns(),
+    "extra_shifts": _date_columns("date") + _work_minutes_columns(),
+}
+
+
+def _ensure_generated_columns(conn: sqlite3.Connection) -> None:
+    """Tilføj manglende generated columns + indexes (idempotent; extra_shifts kun hvis den findes)."""
+    cur = conn.cursor()
+    for table, columns in _GENERATED_COLUMNS.items():
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        if cur.fetchone() is None:
+            continue
+        # table_xinfo (ikke table_info) – den viser også generated columns
+        cur.execute(f"PRAGMA table_xinfo({table})")
+        existing = {r[1] for r in cur.fetchall()}
+        for name, coldef in columns:
+            if name not in existing:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN {name} {coldef}")
+
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_shifts_year_month ON shifts(date_year, date_month)")
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'extra_shifts'")
+    if cur.fetchone() is not None:
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_extra_shifts_year_month ON extra_shifts(date_year, date_month)")
+    conn.commit()
+
+
+# Tidligere trigger-vedligeholdte tællere/køer – alt læses nu fra changes
+_LEGACY_TRACKING_TABLES = ("data_version", "month_versions", "shift_versions", "cache_invalidations")
+_LEGACY_TRACKING_TRIGGERS = ("version", "month_version", "shift_version", "cache_invalidation", "changes")
+
+
+def _drop_legacy_change_tracking(conn: sqlite3.Connection) -> None:
+    """Fjern de gamle tællere/køer og deres triggers (idempotent)."""
+    cur = conn.cursor()
+    for table in _VERSIONED_TABLES:
+        for op in ("insert", "update", "delete"):
+            for suffix in _LEGACY_TRACKING_TRIGGERS:
+                cur.execute(f"DROP TRIGGER IF EXISTS trg_{table}_{op}_{suffix}")
+    for table in _LEGACY_TRACKING_TABLES:
+        cur.execute(f"DROP TABLE IF EXISTS {table}")
+    conn.commit()
+
+
+# Ændringer ældre end dette fjernes ved compact_changes()
+CHANGES_RETENTION_DAYS = int(os.environ.get("CHANGES_RETENTION_DAYS", "7"))
+
+
+def _ensure_changes(conn: sqlite3.Connection) -> None:
+    """
+    Append-only ændringslog: én række pr. INSERT/UPDATE/DELETE på shifts, signups,
+    persons og extra_shifts, skrevet af triggers (så alle skrivninger kommer med).
+    seq er monoton og genbruges aldrig (AUTOINCREMENT), også efter compact_changes().
+    shift_id/person_id/month ('yyyy-mm', '0000-00' ved ugyldig dato) gemmes med,
+    så en slettet tilmelding stadig kan føres tilbage til sin vagt, person og måned.
+
+    Loggen er den eneste ændringssporing i databasen; ud fra den beregnes
+    data-version (ETags), versioner pr. vagt/måned (fragmentnøgler) og hvilke
+    tags der skal ud af den fælles cache. Læses med changes_since().
+    Kræver de genererede date_year/date_month-kolonner.
+    """
+    _drop_legacy_change_tracking(conn)
+    cur = conn.cursor()
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,        -- tabelnavn: shifts/signups/persons/extra_shifts
+            entity_id INTEGER NOT NULL,
+            op TEXT NOT NULL,            -- INSERT/UPDATE/DELETE
+            shift_id INTEGER,
+            person_id INTEGER,
+            month TEXT,
+            changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    _ensure_column(conn, "changes", "month", "TEXT")
+    # Versionsopslag: MAX(seq) pr. vagt, pr. persons-ændring og pr. måned
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_changes_shift ON changes(shift_id, seq)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_changes_person ON changes(person_id, entity, seq)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_changes_month ON changes(month, seq)")
+    # Alt til og med compacted_through kan være slettet af compact_changes()
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS changes_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            compacted_through INTEGER NOT NULL
+        )
+        """
+    )
+    cur.execute("INSERT OR IGNORE INTO changes_meta (id, compacted_through) VALUES (1, 0)")
+
+    def month_of(row: str) -> str:
+        return f"printf('%04d-%02d', COALESCE({row}.date_year, 0), COALESCE({row}.date_month, 0))"
+
+    # (shift_id-, person_id- og month-udtryk) pr. tabel – {row} = NEW/OLD
+    entities = {
+        "shifts": ("{row}.id", "NULL", month_of("{row}")),
+        "signups": (
+            "{row}.shift_id",
+            "{row}.person_id",
+            f"(SELECT {month_of('shifts')} FROM shifts WHERE shifts.id = {{row}}.shift_id)",
+        ),
+        "persons": ("NULL", "{row}.id", "NULL"),
+        "extra_shifts": ("NULL", "{row}.person_id", month_of("{row}")),
+    }
+
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    existing = {row[0] for row in cur.fetchall()}
+
+    for table, exprs in entities.items():
+        if table not in existing:
+            continue  # fx extra_shifts før migrate_schema.py har kørt
+
+        def log_row(op: str, row: str, where: str = "") -> str:
+            shift_id, person_id, month = (e.format(row=row) for e in exprs)
+            return (
+                "INSERT INTO changes (entity, entity_id, op, shift_id, person_id, month) "
+                f"SELECT '{table}', {row}.id, '{op}', {shift_id}, {person_id}, {month} {where};"
+            )
+
+        moved = " OR ".join(f"{e.format(row='OLD')} IS NOT {e.format(row='NEW')}" for e in exprs)
+        bodies = {
+            "INSERT": log_row("INSERT", "NEW"),
+            # Flyttet til en anden vagt/person/måned (fx ved fletning eller ny dato):
+            # den gamle forælder ændres også
+            "UPDATE": log_row("UPDATE", "NEW") + "\n" + log_row("UPDATE", "OLD", f"WHERE {moved}"),
+            "DELETE": log_row("DELETE", "OLD"),
+        }
+        for op, body in bodies.items():
+            cur.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{op.lower()}_change_log
+                AFTER {op} ON {table}
+                BEGIN
+                    {body}
+                END
+                """
+            )
+    conn.commit()
+
+
+def get_latest_change_seq() -> int:
+    """Seneste tildelte seq i changes (0 hvis der aldrig er logget noget)."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'")
+    row = cur.fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+
+# Version pr. vagt (nøgle til cachede vagtkort/overbliksrækker): seneste ændring
+# af vagten, dens tilmeldinger eller navn/telefon på en tilmeldt person. Falder
+# aldrig under compacted_through, så en vagt hvis ændringer er beskåret væk, ikke
+# kan ramme et fragment fra før beskæringen. {shift} = udtryk for vagtens id.
+_SHIFT_VERSION_SQL = """
+    MAX(
+        COALESCE((SELECT MAX(c.seq) FROM changes c WHERE c.shift_id = {shift}), 0),
+        COALESCE((
+            SELECT MAX(c.seq)
+            FROM signups vsg
+            JOIN changes c ON c.person_id = vsg.person_id AND c.entity = 'persons'
+            WHERE vsg.shift_id = {shift}
+        ), 0),
+        (SELECT compacted_through FROM changes_meta WHERE id = 1)
+    )
+"""
+
+
+def _month_key(year: int, month: int) -> str:
+    """Måned som i changes.month: 'yyyy-mm' ('0000-00' for vagter med ugyldig dato)."""
+    return f"{year:04d}-{month:02d}"
+
+
+def _month_versions(cur: sqlite3.Cursor, month: str | None = None) -> tuple[dict, int]:
+    """
+    ({'yyyy-mm': version}, floor) til historikkens fragmenter: seneste ændring af en
+    vagt/tilmelding i måneden eller af en person med tilmeldinger i måneden.
+    Måneder uden ændringer i loggen har versionen floor (compacted_through).
+    """
+    params = (month,) if month else ()
+    cur.execute(
+        "SELECT month, MAX(seq) FROM changes WHERE month " + ("= ?" if month else "IS NOT NULL") + " GROUP BY month",
+        params,
+    )
+    versions = {row[0]: row[1] for row in cur.fetchall()}
+    # Navn/telefon vises i historikken for alle personens tilmeldinger
+    cur.execute(
+        f"""
+        SELECT printf('%04d-%02d', COALESCE(s.date_year, 0), COALESCE(s.date_month, 0)) AS m, MAX(c.seq)
+        FROM changes c
+        JOIN signups sg ON sg.person_id = c.person_id
+        JOIN shifts s ON s.id = sg.shift_id
+        WHERE c.entity = 'persons'
+        GROUP BY m {"HAVING m = ?" if month else ""}
+        """,
+        params,
+    )
+    for m, seq in cur.fetchall():
+        versions[m] = max(versions.get(m, 0), seq)
+    cur.execute("SELECT compacted_through FROM changes_meta WHERE id = 1")
+    return versions, cur.fetchone()[0]
+
+
+def changes_since(seq: int, limit: int = 1000) -> dict:
+    """
+    Ændringer efter `seq`, ældste først:
+    {"changes": [{seq, entity, entity_id, op, shift_id, person_id, month, changed_at}],
+     "last_seq": seq at fortsætte fra, "has_more": bool, "reset": bool}.
+
+    reset=True betyder at ændringer efter `seq` er fjernet af compact_changes() –
+    forbrugeren skal genopbygge fra bunden og fortsætte fra last_seq.
+    Flere ændringer af samme række kan være foldet sammen til den seneste.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT compacted_through FROM changes_meta WHERE id = 1")
+    compacted_through = cur.fetchone()[0]
+    if seq < compacted_through:
+        cur.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'")
+        row = cur.fetchone()
+        conn.close()
+        return {"changes": [], "last_seq": row[0] if row else 0, "has_more": False, "reset": True}
+
+    cur.execute(
+        """
+        SELECT seq, entity, entity_id, op, shift_id, person_id, month, changed_at
+        FROM changes
+        WHERE seq > ?
+        ORDER BY seq
+        LIMIT ?
+        """,
+        (seq, limit + 1),
+    )
+    rows = [dict(row) for row in cur.fetchall()]
+    conn.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
     return {
-        "id": row["id"],
-        "date": row["date"],
-        "time": row["start_time"],
-        "location": row["location"],
-        "description": row["description"],
-        "customer": row["customer"] if "customer" in row.keys() else None,
-        "event_type": row["event_type"] if "event_type" in row.keys() else None,
-        "guest_count": row["guest_count"] if "guest_count" in row.keys() else None,
+        "changes": rows,
+        "last_seq": rows[-1]["seq"] if rows else seq,
+        "has_more": has_more,
+        "reset": False,
+    }
 
-        # ✅ NYT
-        "admin_note": row["admin_note"] if "admin_note" in row.keys() else None,
 
-        "needed": row["required_staff"],
-        "approved": approved_count,
-        "pending": pending,
-        "pending_signups": requested_count,
-        "pending_releases": release_requested_count,
-        "is_active": row["is_active"],
+def compact_changes(retain_days: int = CHANGES_RETENTION_DAYS) -> dict:
+    """
+    Hold ændringsloggen lille:
+      1) fold: behold kun seneste ændring pr. (entity, entity_id, shift_id, person_id, month) –
+         en forbruger der læser senere, ser stadig at rækken er ændret, og
+         MAX(seq) pr. vagt/person/måned (versionerne) er uændret
+      2) slet ændringer ældre end `retain_days`; forbrugere der er bagud, får reset,
+         og versioner falder aldrig under compacted_through (se _SHIFT_VERSION_SQL)
+    Returnerer {"folded": n, "expired": n}.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        DELETE FROM changes
+        WHERE seq NOT IN (
+            SELECT MAX(seq) FROM changes GROUP BY entity, entity_id, shift_id, person_id, month
+        )
+        """
+    )
+    folded = cur.rowcount
+
+    cur.execute(
+        "SELECT MAX(seq) FROM changes WHERE changed_at < datetime('now', ?)",
+        (f"-{int(retain_days)} days",),
+    )
+    cutoff = cur.fetchone()[0]
+    expired = 0
+    if cutoff is not None:
+        cur.execute("DELETE FROM changes WHERE seq <= ?", (cutoff,))
+        expired = cur.rowcount
+        cur.execute(
+            "UPDATE changes_meta SET compacted_through = MAX(compacted_through, ?) WHERE id = 1",
+            (cutoff,),
+        )
+    conn.commit()
+    conn.close()
+    return {"folded": folded, "expired": expired}
+
+
+# ============================
+# Fuldtekstsøgning (FTS5)
+# ============================
+# Én FTS5-tabel for vagter, personer og freelancer-noter. rowid = id * 4 + kind,
+# så triggers kan slette/opdatere en række direkte via rowid uden at scanne.
+SEARCH_KIND_SHIFT = 1
+SEARCH_KIND_PERSON = 2
+SEARCH_KIND_SIGNUP = 3
+
+_SEARCH_KINDS = {
+    SEARCH_KIND_SHIFT: "shift",
+    SEARCH_KIND_PERSON: "person",
+    SEARCH_KIND_SIGNUP: "signup",
+}
+
+# (tabel, kind, title-udtryk, body-udtryk, betingelse) – udtryk bruger prefix "r."
+_SEARCH_SOURCES = (
+    (
+        "shifts", SEARCH_KIND_SHIFT,
+        "r.location",
+        "COALESCE(r.description, '') || ' ' || COALESCE(r.customer, '') || ' ' || "
+        "COALESCE(r.event_type, '') || ' ' || COALESCE(r.admin_note, '')",
+        "1",
+    ),
+    ("persons", SEARCH_KIND_PERSON, "r.name", "r.phone", "1"),
+    ("signups", SEARCH_KIND_SIGNUP, "''", "r.freelancer_note", "r.freelancer_note IS NOT NULL"),
+)
+
+FTS_AVAILABLE = True
+
+
+def _ensure_search_index(conn: sqlite3.Connection) -> None:
+    """Opret search_index + triggers første gang og fyld den med eksisterende data."""
+    global FTS_AVAILABLE
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'search_index'")
+    is_new = cur.fetchone() is None
+
+    try:
+        cur.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+                kind UNINDEXED,
+                ref_id UNINDEXED,
+                title,
+                body,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+            """
+        )
+    except sqlite3.OperationalError as e:
+        # SQLite uden FTS5 – appen virker stadig, søgningen giver bare ingen resultater
+        FTS_AVAILABLE = False
+        log.warning("FTS5 ikke tilgængelig, søgning slået fra", extra={"error": str(e)})
+        return
+
+    for table, kind, title, body, cond in _SEARCH_SOURCES:
+        new_title, new_body, new_cond = (x.replace("r.", "new.") for x in (title, body, cond))
+        insert_new = f"""
+            INSERT INTO search_index (rowid, kind, ref_id, title, body)
+            SELECT new.id * 4 + {kind}, {kind}, new.id, {new_title}, {new_body}
+            WHERE {new_cond};
+        """
+        delete_old = f"DELETE FROM search_index WHERE rowid = old.id * 4 + {kind};"
+
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_insert_search AFTER INSERT ON {table} BEGIN {insert_new} END")
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_update_search AFTER UPDATE ON {table} BEGIN {delete_old} {insert_new} END")
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_delete_search AFTER DELETE ON {table} BEGIN {delete_old} END")
+
+        if is_new:
+            cur.execute(
+                f"""
+                INSERT INTO search_index (rowid, kind, ref_id, title, body)
+                SELECT r.id * 4 + {kind}, {kind}, r.id, {title}, {body}
+                FROM {table} r
+                WHERE {cond}
+                """
+            )
+    conn.commit()
+
+
+def _fts_query(text: str) -> str:
+    """Brugerens tekst -> FTS5-udtryk: hvert ord som quoted prefix, AND mellem ordene."""
+    words = re.findall(r"\w+", text or "")
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def search(query: str, kind: str | None = None, page: int = 1, per_page: int = 20):
+    """
+    Rangeret (bm25) og pagineret søgning i vagter, personer og freelancer-noter.
+    kind: 'shift' / 'person' / 'signup' eller None for alle.
+    Returnerer {"results": [...], "total": n, "page": page, "pages": m}.
+    """
+    page = max(1, int(page or 1))
+    per_page = max(1, min(int(per_page or 20), 100))
+    empty = {"results": [], "total": 0, "page": page, "pages": 0}
+
+    match = _fts_query(query)
+    if not match or not FTS_AVAILABLE:
+        return empty
+
+    kind_filter = ""
+    params = [match]
+    codes = {v: k for k, v in _SEARCH_KINDS.items()}
+    if kind in codes:
+        kind_filter = "AND si.kind = ?"
+        params.append(codes[kind])
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"SELECT COUNT(*) AS c FROM search_index si WHERE search_index MATCH ? {kind_filter}",
+            params,
+        )
+        total = cur.fetchone()["c"]
+
+        cur.execute(
+            f"""
+            SELECT
+                si.kind AS kind,
+                si.ref_id AS ref_id,
+                si.title AS title,
+                snippet(search_index, 3, '[', ']', '…', 12) AS snippet,
+                COALESCE(sh.id, sg.shift_id) AS shift_id,
+                COALESCE(sh.date, sgs.date) AS date,
+                COALESCE(sh.is_active, sgs.is_active) AS is_active,
+                p.name AS person_name
+            FROM search_index si
+            LEFT JOIN shifts sh ON si.kind = {SEARCH_KIND_SHIFT} AND sh.id = si.ref_id
+            LEFT JOIN signups sg ON si.kind = {SEARCH_KIND_SIGNUP} AND sg.id = si.ref_id
+            LEFT JOIN shifts sgs ON sgs.id = sg.shift_id
+            LEFT JOIN persons p ON p.id = CASE si.kind WHEN {SEARCH_KIND_PERSON} THEN si.ref_id ELSE sg.person_id END
+            WHERE search_index MATCH ? {kind_filter}
+            ORDER BY bm25(search_index, 0, 0, 5.0, 1.0)
+            LIMIT ? OFFSET ?
+            """,
+            params + [per_page, (page - 1) * per_page],
+        )
+        rows = cur.fetchall()
+    except sqlite3.OperationalError:
+        # Fx et udtryk FTS5 ikke kan parse – behandl som "ingen resultater"
+        conn.close()
+        return empty
+    conn.close()
+
+    results = []
+    for row in rows:
+        results.append(
+            {
+                "kind": _SEARCH_KINDS.get(row["kind"], "?"),
+                "id": row["ref_id"],
+                "title": row["title"],
+                "snippet": row["snippet"],
+                "shift_id": row["shift_id"],
+                "date": row["date"],
+                "is_active": row["is_active"],
+                "person_name": row["person_name"],
+            }
+        )
+
+    return {
+        "results": results,
+        "total": total,
+        "page": page,
+        "pages": (total + per_page - 1) // per_page,
     }
 
 
+def get_data_version():
+    """
+    Returnerer (version, changed_at) ud fra ændringsloggen: seneste seq og
+    tidspunktet for den seneste ændring (UTC 'YYYY-MM-DD HH:MM:SS', None hvis
+    loggen er tom/beskåret). Ændres data, ændres versionen.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT
+            (SELECT seq FROM sqlite_sequence WHERE name = 'changes') AS version,
+            (SELECT changed_at FROM changes ORDER BY seq DESC LIMIT 1) AS changed_at
+        """
+    )
+    row = cur.fetchone()
+    conn.close()
+    return row["version"] or 0, row["changed_at"]
+
+
+# ============================
+# Kompakte rækker
+# ============================
+# Store lister (vagter, timer/løn) bygges som slotted dataclasses i stedet for dicts.
+# Kolonnepositionerne slås op én gang pr. cursor (cachet pr. kolonnesæt), og
+# rækkerne hentes som rå tuples – ingen sqlite3.Row, ingen dict pr. række og ingen
+# row.keys()-probing for valgfrie kolonner (manglende kolonner får feltets default).
+# Rækkerne understøtter både r.felt (templates) og r["felt"] / r.get("felt").
+
+
+class _CompactRow:
+    __slots__ = ()
+
+    # felt -> kolonnenavn i SELECT'en, hvor de ikke hedder det samme
+    _sources = {}
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __contains__(self, key):
+        return hasattr(self, key)
+
+
+@lru_cache(maxsize=128)
+def _row_builder(cls, columns: tuple):
+    """tuple-række -> cls, med kolonnepositioner slået op én gang pr. (cls, kolonnesæt)."""
+    index = {name: i for i, name in enumerate(columns)}
+    positions = []
+    defaults = []
+    for f in fields(cls):
+        pos = index.get(cls._sources.get(f.name, f.name))
+        if pos is None:
+            pos = len(columns) + len(defaults)
+            defaults.append(None if f.default is MISSING else f.default)
+        positions.append(pos)
+
+    getter = itemgetter(*positions)
+    if not defaults:
+        return lambda row: cls(*getter(row))
+    padding = tuple(defaults)
+    return lambda row: cls(*getter(row + padding))
+
+
+def _fetch_compact(cur: sqlite3.Cursor, cls, sql: str, params=()):
+    """Kør sql og returnér alle rækker som `cls`-instanser."""
+    cur.row_factory = None
+    cur.execute(sql, params)
+    build = _row_builder(cls, tuple(d[0] for d in cur.description))
+    return [build(row) for row in cur.fetchall()]
+
+
+@dataclass(slots=True)
+class ShiftRow(_CompactRow):
+    """En vagt med bemandings-counts (og evt. dashboard-/freelancerfelter)."""
+
+    _sources = {
+        "time": "start_time",
+        "needed": "required_staff",
+        "approved": "approved_count",
+        "pending_signups": "requested_count",
+        "pending_releases": "release_requested_count",
+    }
 
+    id: int
+    date: str
+    time: str
+    location: str
+    description: str
+    customer: str | None = None
+    event_type: str | None = None
+    guest_count: int | None = None
+    admin_note: str | None = None
+    date_dk: str | None = None
+    date_year: int | None = None
+    date_month: int | None = None
+    needed: int = 0
+    approved: int = 0
+    pending_signups: int = 0
+    pending_releases: int = 0
+    is_active: int = 1
+
+    # Dashboard (get_shifts_page / get_actionable_shifts)
+    days_until: int | None = None
+    row_class: str = ""
+    is_covered: int = 0
+
+    # Freelancerens egen tilmelding (get_upcoming_shifts_for_person)
+    my_signup_id: int | None = None
+    my_status: str | None = None
+
+    # _SHIFT_VERSION_SQL – nøgle til cachede fragmenter (vagtkort/overbliksrækker)
+    version: int = 0
+
+    @property
+    def pending(self) -> int:
+        return self.pending_signups + self.pending_releases
+
+    @property
+    def needs_action(self) -> bool:
+        return self.pending > 0
+
+
+@dataclass(slots=True)
+class HoursRow(_CompactRow):
+    """Én række i timer/løn-opgørelsen (normal vagt eller ekstravagt)."""
+
+    signup_id: int
+    work_start: str | None
+    work_end: str | None
+    work_hours: float | None
+    approved_work_hours: float | None
+    hours_approved_by_admin: int
+    payroll_paid: int
+    payroll_paid_at: str | None
+    shift_date: str
+    shift_date_dk: str
+    location: str
+    description: str | None
+    person_id: int
+    person_name: str
+    phone: str
 
 
 def get_all_shifts():
     """Hent alle aktive vagter + antal APPROVED tilmeldinger."""
     conn = get_connection()
     cur = conn.cursor()
-    cur.execute(
+    shifts = _fetch_compact(
+        cur,
+        ShiftRow,
         """
         SELECT
             s.*,
@@ -210,15 +1090,50 @@ def get_all_shifts():
         """,
         (STATUS_APPROVED,),
     )
-    rows = cur.fetchall()
     conn.close()
-    return [_shift_row_to_dict(row, row["approved_count"]) for row in rows]
+    return shifts
+
+
+def get_upcoming_shifts_for_person(person_id: int, from_date: str):
+    """
+    Aktive vagter fra from_date og frem + personens egen tilmelding pr. vagt
+    (my_signup_id / my_status), hentet i samme query som vagtlisten.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    shifts = _fetch_compact(
+        cur,
+        ShiftRow,
+        """
+        SELECT
+            s.*,
+            COALESCE(SUM(CASE WHEN sg.status = ? THEN 1 ELSE 0 END), 0) AS approved_count,
+            mine.id AS my_signup_id,
+            mine.status AS my_status,
+            """ + _SHIFT_VERSION_SQL.format(shift="s.id") + """ AS version
+        FROM shifts s
+        LEFT JOIN signups sg ON sg.shift_id = s.id
+        LEFT JOIN signups mine
+               ON mine.shift_id = s.id
+              AND mine.person_id = ?
+              AND mine.status != ?
+        WHERE s.is_active = 1
+          AND s.date >= ?
+        GROUP BY s.id
+        ORDER BY s.date, s.start_time
+        """,
+        (STATUS_APPROVED, person_id, STATUS_CANCELLED_BY_ADMIN, from_date),
+    )
+    conn.close()
+    return shifts
 
 
 def get_shift(shift_id: int):
     conn = get_connection()
     cur = conn.cursor()
-    cur.execute(
+    shifts = _fetch_compact(
+        cur,
+        ShiftRow,
         """
         SELECT
             s.*,
@@ -230,11 +1145,8 @@ def get_shift(shift_id: int):
         """,
         (STATUS_APPROVED, shift_id),
     )
-    row = cur.fetchone()
     conn.close()
-    if row is None:
-        return None
-    return _shift_row_to_dict(row, row["approved_count"])
+    return shifts[0] if shifts else None
 
 def create_shift(
     date: str,
@@ -310,7 +1222,9 @@ def get_all_shifts_admin():
     """Hent alle vagter (aktive + arkiverede) med approved- og pending-counts."""
     conn = get_connection()
     cur = conn.cursor()
-    cur.execute(
+    shifts = _fetch_compact(
+        cur,
+        ShiftRow,
         """
         SELECT
             s.*,
@@ -328,57 +1242,410 @@ def get_all_shifts_admin():
             STATUS_RELEASE_REQUESTED,
         ),
     )
-    rows = cur.fetchall()
     conn.close()
+    return shifts
 
-    return [
-        _shift_row_to_dict(
-            row,
-            row["approved_count"],
-            row["requested_count"],
-            row["release_requested_count"],
+# ============================
+# Keyset-paginering
+# ============================
+PAGE_SIZE_DEFAULT = 50
+PAGE_SIZE_MAX = 200
+
+
+def encode_cursor(values) -> str:
+    """Stabil, URL-sikker cursor ud fra sorteringsnøglen for en række."""
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str | None, size: int):
+    """Cursor -> liste med `size` værdier, eller None hvis den mangler/er ugyldig."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
+
+
+def _clamp_page_size(limit) -> int:
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return PAGE_SIZE_DEFAULT
+    return max(1, min(limit, PAGE_SIZE_MAX))
+
+
+def _keyset_result(rows, limit: int, backwards: bool, had_cursor: bool, key_fn):
+    """Fælles: trim den ekstra række, vend baglæns sider og byg next/prev-cursors."""
+    has_more = len(rows) > limit
+    rows = list(rows[:limit])
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return {"items": [], "next": None, "prev": None}
+
+    if backwards:
+        prev_cursor = encode_cursor(key_fn(rows[0])) if has_more else None
+        next_cursor = encode_cursor(key_fn(rows[-1]))
+    else:
+        next_cursor = encode_cursor(key_fn(rows[-1])) if has_more else None
+        prev_cursor = encode_cursor(key_fn(rows[0])) if had_cursor else None
+
+    return {"items": rows, "next": next_cursor, "prev": prev_cursor}
+
+
+def count_shifts_by_state() -> dict:
+    """{is_active: antal} – totaler til paginerede lister."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT is_active, COUNT(*) AS c FROM shifts GROUP BY is_active")
+    counts = {row["is_active"]: row["c"] for row in cur.fetchall()}
+    conn.close()
+    return counts
+
+
+# Counts + dage-til-vagt pr. vagt; bruges af dashboard og indbakke (alias s = shifts, sg = signups)
+_DASHBOARD_AGGREGATES = """
+    s.*,
+    COALESCE(SUM(sg.status = :approved), 0) AS approved_count,
+    COALESCE(SUM(sg.status = :requested), 0) AS requested_count,
+    COALESCE(SUM(sg.status = :release_requested), 0) AS release_requested_count,
+    CAST(julianday(s.date) - julianday(:today) AS INTEGER) AS days_until
+"""
+
+# Farvelogik for dashboard-rækker ud fra aggregaterne ovenfor (alias d)
+_DASHBOARD_CLASSIFICATION = """
+    d.*,
+    d.requested_count + d.release_requested_count AS pending_count,
+    (COALESCE(d.required_staff, 0) > 0 AND d.approved_count >= COALESCE(d.required_staff, 0)) AS is_covered,
+    CASE
+        WHEN COALESCE(d.required_staff, 0) > 0 AND d.approved_count >= d.required_staff THEN 'shift-covered'
+        WHEN d.days_until IS NULL OR d.days_until < 0 THEN ''
+        WHEN d.approved_count >= COALESCE(d.required_staff, 0) THEN ''
+        WHEN d.days_until < 3 THEN 'shift-critical'
+        WHEN d.days_until < 7 THEN 'shift-warning-7'
+        WHEN d.days_until < 14 THEN 'shift-warning-14'
+        ELSE ''
+    END AS row_class
+"""
+
+
+def _dashboard_params(today: str | None) -> dict:
+    return {
+        "approved": STATUS_APPROVED,
+        "requested": STATUS_REQUESTED,
+        "release_requested": STATUS_RELEASE_REQUESTED,
+        "today": today or date.today().isoformat(),
+    }
+
+
+def get_shifts_page(
+    state: int,
+    after: str | None = None,
+    before: str | None = None,
+    limit=PAGE_SIZE_DEFAULT,
+    today: str | None = None,
+):
+    """
+    Én side vagter med given is_active-tilstand, sorteret (date, start_time, id),
+    inkl. approved/pending-counts, days_until og row_class (beregnet i SQL).
+    Brug `after`/`before` fra forrige resultat.
+    Returnerer {"items": [shift-dicts], "next": cursor|None, "prev": cursor|None}.
+    """
+    limit = _clamp_page_size(limit)
+    after_key = decode_cursor(after, 3)
+    before_key = decode_cursor(before, 3) if after_key is None else None
+    backwards = before_key is not None
+
+    params = _dashboard_params(today)
+    params.update(state=state, limit=limit + 1)
+    where = "is_active = :state"
+    if after_key:
+        where += " AND (date, start_time, id) > (:k_date, :k_time, :k_id)"
+        params.update(k_date=after_key[0], k_time=after_key[1], k_id=after_key[2])
+    elif before_key:
+        where += " AND (date, start_time, id) < (:k_date, :k_time, :k_id)"
+        params.update(k_date=before_key[0], k_time=before_key[1], k_id=before_key[2])
+    direction = "DESC" if backwards else "ASC"
+
+    conn = get_connection()
+    cur = conn.cursor()
+    shifts = _fetch_compact(
+        cur,
+        ShiftRow,
+        f"""
+        SELECT {_DASHBOARD_CLASSIFICATION}
+        FROM (
+            SELECT {_DASHBOARD_AGGREGATES}
+            FROM (
+                SELECT * FROM shifts
+                WHERE {where}
+                ORDER BY date {direction}, start_time {direction}, id {direction}
+                LIMIT :limit
+            ) s
+            LEFT JOIN signups sg ON sg.shift_id = s.id
+            GROUP BY s.id
+        ) d
+        ORDER BY d.date {direction}, d.start_time {direction}, d.id {direction}
+        """,
+        params,
+    )
+    conn.close()
+
+    return _keyset_result(
+        shifts, limit, backwards, bool(after_key or before_key),
+        key_fn=lambda s: (s["date"], s["time"], s["id"]),
+    )
+
+
+def get_live_staffing(today: str | None = None, shift_ids=None) -> dict:
+    """
+    {shift_id: {needed, approved, pending, row_class}} for aktive, kommende vagter –
+    de tal dashboard og bemandingsoverblik opdaterer live (se live.py).
+    Med `shift_ids` kun de vagter (dem der ikke længere er aktive/kommende, mangler).
+    """
+    params = _dashboard_params(today)
+    only = ""
+    if shift_ids is not None:
+        ids = list(shift_ids)
+        if not ids:
+            return {}
+        params.update({f"id{i}": shift_id for i, shift_id in enumerate(ids)})
+        only = f"AND s.id IN ({','.join(f':id{i}' for i in range(len(ids)))})"
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT id, required_staff, approved_count, pending_count, row_class
+        FROM (
+            SELECT {_DASHBOARD_CLASSIFICATION}
+            FROM (
+                SELECT {_DASHBOARD_AGGREGATES}
+                FROM shifts s
+                LEFT JOIN signups sg ON sg.shift_id = s.id
+                WHERE s.is_active = 1 AND s.date >= :today {only}
+                GROUP BY s.id
+            ) d
         )
-        for row in rows
-    ]
+        """,
+        params,
+    )
+    staffing = {
+        row["id"]: {
+            "needed": row["required_staff"] or 0,
+            "approved": row["approved_count"],
+            "pending": row["pending_count"],
+            "row_class": row["row_class"],
+        }
+        for row in cur.fetchall()
+    }
+    conn.close()
+    return staffing
+
+
+def get_actionable_shifts(today: str | None = None):
+    """
+    Aktive + arkiverede vagter med ventende tilmeldinger/fri-ønsker (indbakken).
+    Starter fra signups-indexet, så kun vagter med pending rækker bliver læst.
+    Sorteret flest pending først, derefter nyeste dato/tid.
+    """
+    params = _dashboard_params(today)
+    conn = get_connection()
+    cur = conn.cursor()
+    shifts = _fetch_compact(
+        cur,
+        ShiftRow,
+        f"""
+        SELECT {_DASHBOARD_CLASSIFICATION}
+        FROM (
+            SELECT {_DASHBOARD_AGGREGATES}
+            FROM shifts s
+            JOIN signups sg ON sg.shift_id = s.id
+            WHERE s.is_active IN (0, 1)
+              AND s.id IN (
+                  SELECT shift_id FROM signups
+                  WHERE status IN (:requested, :release_requested)
+              )
+            GROUP BY s.id
+            HAVING requested_count + release_requested_count > 0
+        ) d
+        ORDER BY pending_count DESC, d.date DESC, d.start_time DESC, d.id DESC
+        """,
+        params,
+    )
+    conn.close()
+    return shifts
+
+
+_HISTORIC_SHIFTS_SELECT = """
+    SELECT
+        s.*,
+        COALESCE(SUM(CASE WHEN sg.status = ? THEN 1 ELSE 0 END), 0) AS approved_count
+    FROM shifts s
+    LEFT JOIN signups sg ON sg.shift_id = s.id
+    WHERE s.is_active = -1
+"""
+
 
 def get_historic_shifts():
     """
     Hent alle vagter i historikken (is_active = -1)
-    med approved-count, så vi kan genbruge _shift_row_to_dict.
+    med approved-count, som kompakte ShiftRow-rækker.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    shifts = _fetch_compact(
+        cur,
+        ShiftRow,
+        _HISTORIC_SHIFTS_SELECT + " GROUP BY s.id ORDER BY s.date DESC, s.start_time DESC",
+        (STATUS_APPROVED,),
+    )
+    conn.close()
+    return shifts
+
+
+def get_history_months():
+    """
+    Én række pr. måned i historikken, nyeste først: year, month (0 ved ugyldig
+    dato), shift_count, signup_count, total_hours og version (se _month_versions).
+    Det er alt historik-siden skal bruge – selve vagterne hentes pr. måned.
     """
     conn = get_connection()
     cur = conn.cursor()
     cur.execute(
         """
         SELECT
-            s.*,
-            COALESCE(SUM(CASE WHEN sg.status = ? THEN 1 ELSE 0 END), 0) AS approved_count
+            COALESCE(s.date_year, 0) AS year,
+            COALESCE(s.date_month, 0) AS month,
+            COUNT(DISTINCT s.id) AS shift_count,
+            COUNT(sg.id) AS signup_count,
+            COALESCE(SUM(sg.work_hours), 0) AS total_hours
         FROM shifts s
         LEFT JOIN signups sg ON sg.shift_id = s.id
         WHERE s.is_active = -1
+        GROUP BY s.date_year, s.date_month
+        ORDER BY s.date_year DESC, s.date_month DESC
+        """
+    )
+    months = [dict(row) for row in cur.fetchall()]
+    versions, floor = _month_versions(cur)
+    conn.close()
+    for m in months:
+        m["version"] = versions.get(_month_key(m["year"], m["month"]), floor)
+    return months
+
+
+def get_month_version(year: int, month: int) -> int:
+    """Version for (år, måned) – ændres ved enhver ændring i månedens vagter/tilmeldinger (se _month_versions)."""
+    key = _month_key(year, month)
+    conn = get_connection()
+    versions, floor = _month_versions(conn.cursor(), key)
+    conn.close()
+    return versions.get(key, floor)
+
+
+def get_historic_month(year: int, month: int):
+    """
+    Historikkens vagter i én måned (nyeste først) med tilmeldinger og timer:
+    [(ShiftRow, [tilmelding med timer, ...]), ...]. year/month = 0 giver
+    vagterne med ugyldig dato.
+    """
+    conn = get_connection()
+    shifts = _fetch_compact(
+        conn.cursor(),
+        ShiftRow,
+        _HISTORIC_SHIFTS_SELECT
+        + """
+          AND s.date_year IS ? AND s.date_month IS ?
         GROUP BY s.id
         ORDER BY s.date DESC, s.start_time DESC
         """,
-        (STATUS_APPROVED,),
+        (STATUS_APPROVED, year or None, month or None),
     )
-    rows = cur.fetchall()
+    signups = _signups_with_hours_for_shifts(conn, [sh.id for sh in shifts])
     conn.close()
-    return [_shift_row_to_dict(row, row["approved_count"]) for row in rows]
+    return [(sh, signups[sh.id]) for sh in shifts]
+
+
+def iter_upcoming_shifts_with_signups(today: str | None = None, batch_size: int = 50):
+    """
+    Kommende aktive vagter (dato >= i dag) sorteret efter dato/tid, som generator
+    af (ShiftRow, [tilmelding, ...]). Vagterne hentes i batches af `batch_size`
+    (keyset på dato, tid, id) sammen med batchens tilmeldinger; counts
+    (approved/pending) beregnes ud fra tilmeldingerne. Første batch er derfor
+    klar uden at alle kommende vagter er hentet.
+
+    Hver batch læses færdig før den yieldes, så der ikke står et åbent cursor
+    (og en læselås) mens svaret sendes til en langsom klient.
+    """
+    today = today or date.today().isoformat()
+    after = ("", "", 0)
+    while True:
+        conn = get_connection()
+        try:
+            batch = _fetch_compact(
+                conn.cursor(),
+                ShiftRow,
+                """
+                SELECT s.*, """ + _SHIFT_VERSION_SQL.format(shift="s.id") + """ AS version
+                FROM shifts s
+                WHERE s.is_active = 1 AND s.date >= ?
+                  AND (s.date, s.start_time, s.id) > (?, ?, ?)
+                ORDER BY s.date, s.start_time, s.id
+                LIMIT ?
+                """,
+                (today, *after, batch_size),
+            )
+            signups = _signups_for_shifts(conn, [sh.id for sh in batch]) if batch else {}
+        finally:
+            conn.close()
+
+        for sh in batch:
+            statuses = [su["status"] for su in signups[sh.id]]
+            sh.approved = statuses.count(STATUS_APPROVED)
+            sh.pending_signups = statuses.count(STATUS_REQUESTED)
+            sh.pending_releases = statuses.count(STATUS_RELEASE_REQUESTED)
+            yield sh, signups[sh.id]
+
+        if len(batch) < batch_size:
+            return
+        last = batch[-1]
+        after = (last.date, last.time, last.id)
+
+
 
 
+def find_person_id_by_phone(phone: str) -> int | None:
+    """Opslag via det indekserede phone_norm. None hvis nummeret er ukendt."""
+    phone_norm = normalize_phone(phone)
+    if not phone_norm:
+        return None
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT id FROM persons WHERE phone_norm = ?", (phone_norm,))
+    row = cur.fetchone()
+    conn.close()
+    return row["id"] if row else None
 
 
 def get_or_create_person(name: str, phone: str) -> int:
-    """Find person via telefon, eller opret ny."""
-    phone_clean = phone.replace(" ", "")
+    """Find person via (normaliseret) telefon, eller opret ny."""
+    phone_clean = normalize_phone(phone)
     conn = get_connection()
     cur = conn.cursor()
 
-    cur.execute("SELECT * FROM persons WHERE phone = ?", (phone_clean,))
+    cur.execute("SELECT * FROM persons WHERE phone_norm = ?", (phone_clean,))
     row = cur.fetchone()
     if row:
-        # Hvis navnet er ændret, opdater det
-        if name and row["name"] != name:
+        # Navnet overskrives ikke ved hvert login (det gav omdøbninger og dubletter).
+        # Kun et tomt navn udfyldes; rettelser sker via admin (flet/ret person).
+        if name and not row["name"]:
             cur.execute(
                 "UPDATE persons SET name = ? WHERE id = ?",
                 (name, row["id"]),
@@ -387,8 +1654,8 @@ def get_or_create_person(name: str, phone: str) -> int:
         person_id = row["id"]
     else:
         cur.execute(
-            "INSERT INTO persons (name, phone) VALUES (?, ?)",
-            (name, phone_clean),
+            "INSERT INTO persons (name, phone, phone_norm) VALUES (?, ?, ?)",
+            (name, phone_clean, phone_clean),
         )
         conn.commit()
         person_id = cur.lastrowid
@@ -431,11 +1698,13 @@ def create_signup(
 
 def get_signups_by_phone(phone: str):
     """Hent alle tilmeldinger for et telefonnummer, inkl. shift-info."""
-    phone_clean = phone.replace(" ", "")
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
+    person_id = find_person_id_by_phone(phone)
+    if person_id is None:
+        return []
+    return get_signups_by_person_id(person_id)
+
+
+_PERSON_SIGNUPS_SELECT = """
         SELECT
             sg.id AS signup_id,
             sg.status AS status,
@@ -453,52 +1722,130 @@ def get_signups_by_phone(phone: str):
 
             s.id AS shift_id,
             s.date,
+            s.date_dk,
             s.start_time,
             s.location,
             s.description,
             s.required_staff
         FROM signups sg
-        JOIN persons p ON p.id = sg.person_id
         JOIN shifts s ON s.id = sg.shift_id
-        WHERE p.phone = ?
+"""
+
+
+def _person_signup_row_to_dict(row):
+    shift_dict = {
+        "id": row["shift_id"],
+        "date": row["date"],
+        "date_dk": row["date_dk"],
+        "time": row["start_time"],
+        "location": row["location"],
+        "description": row["description"],
+        "needed": row["required_staff"],
+    }
+
+    return {
+        "signup_id": row["signup_id"],
+        "status": row["status"],
+        "available_from": row["available_from"],
+        "meet_time": row["meet_time"],
+        "work_start": row["work_start"],
+        "work_end": row["work_end"],
+        "work_hours": row["work_hours"],
+
+        # ✅ NYT
+        "approved_work_hours": row["approved_work_hours"],
+        "hours_approved_by_admin": bool(row["hours_approved_by_admin"]) if row["hours_approved_by_admin"] is not None else False,
+        "payroll_paid": bool(row["payroll_paid"]) if row["payroll_paid"] is not None else False,
+        "payroll_paid_at": row["payroll_paid_at"],
+
+        "shift": shift_dict,
+    }
+
+
+def get_signups_by_person_id(person_id: int):
+    """Hent alle tilmeldinger for en person (session-id), inkl. shift-info."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        _PERSON_SIGNUPS_SELECT
+        + """
+        WHERE sg.person_id = ?
         ORDER BY s.date, s.start_time
         """,
-        (phone_clean,),
+        (person_id,),
     )
     rows = cur.fetchall()
     conn.close()
+    return [_person_signup_row_to_dict(row) for row in rows]
 
-    result = []
-    for row in rows:
-        shift_dict = {
-            "id": row["shift_id"],
-            "date": row["date"],
-            "time": row["start_time"],
-            "location": row["location"],
-            "description": row["description"],
-            "needed": row["required_staff"],
-        }
 
-        result.append(
-            {
-                "signup_id": row["signup_id"],
-                "status": row["status"],
-                "available_from": row["available_from"],
-                "meet_time": row["meet_time"],
-                "work_start": row["work_start"],
-                "work_end": row["work_end"],
-                "work_hours": row["work_hours"],
-
-                # ✅ NYT
-                "approved_work_hours": row["approved_work_hours"],
-                "hours_approved_by_admin": bool(row["hours_approved_by_admin"]) if row["hours_approved_by_admin"] is not None else False,
-                "payroll_paid": bool(row["payroll_paid"]) if row["payroll_paid"] is not None else False,
-                "payroll_paid_at": row["payroll_paid_at"],
-
-                "shift": shift_dict,
-            }
-        )
-    return result
+def get_worked_signups_for_person(
+    person_id: int,
+    until: str,
+    year: int | None = None,
+    month: int | None = None,
+    from_date: str | None = None,
+    to_date: str | None = None,
+):
+    """
+    Godkendte vagter for en person til og med `until` ('YYYY-MM-DD'), nyeste først.
+    Filtrerer enten på year/month (generated columns) eller på from_date..to_date.
+    """
+    where = ["sg.person_id = ?", "sg.status = ?", "s.date_jd <= CAST(julianday(?) AS INTEGER)"]
+    params = [person_id, STATUS_APPROVED, until]
+    if from_date or to_date:
+        if from_date:
+            where.append("s.date_jd >= CAST(julianday(?) AS INTEGER)")
+            params.append(from_date)
+        if to_date:
+            where.append("s.date_jd <= CAST(julianday(?) AS INTEGER)")
+            params.append(to_date)
+    elif year is not None and month is not None:
+        where.append("s.date_year = ? AND s.date_month = ?")
+        params += [year, month]
+
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        _PERSON_SIGNUPS_SELECT
+        + f"""
+        WHERE {" AND ".join(where)}
+        ORDER BY s.date DESC, s.start_time
+        """,
+        params,
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return [_person_signup_row_to_dict(row) for row in rows]
+
+
+def get_signup_date_bounds_for_person(person_id: int):
+    """(sorterede år med tilmeldinger, tidligste vagtdato 'YYYY-MM-DD' eller None)."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT DISTINCT s.date_year AS year
+        FROM signups sg
+        JOIN shifts s ON s.id = sg.shift_id
+        WHERE sg.person_id = ? AND s.date_year IS NOT NULL
+        ORDER BY year
+        """,
+        (person_id,),
+    )
+    years = [row["year"] for row in cur.fetchall()]
+    cur.execute(
+        """
+        SELECT MIN(s.date) AS earliest
+        FROM signups sg
+        JOIN shifts s ON s.id = sg.shift_id
+        WHERE sg.person_id = ? AND s.date_jd IS NOT NULL
+        """,
+        (person_id,),
+    )
+    earliest = cur.fetchone()["earliest"]
+    conn.close()
+    return years, earliest
 
 
 def get_signup(signup_id: int):
@@ -515,6 +1862,7 @@ def get_signup(signup_id: int):
             sg.work_end AS work_end,
             sg.work_hours AS work_hours,
             p.phone AS phone,
+            sg.person_id AS person_id,
             sg.shift_id AS shift_id
         FROM signups sg
         JOIN persons p ON p.id = sg.person_id
@@ -542,14 +1890,22 @@ def set_shift_admin_note(shift_id: int, admin_note: str | None) -> None:
 def set_signup_worked_hours(signup_id: int,
                             work_start: str | None,
                             work_end: str | None,
-                            work_hours: float | None):
-    """Gem registreret arbejdstid på en tilmelding."""
+                            work_hours: float | None = None):
+    """
+    Gem registreret arbejdstid på en tilmelding.
+    Uden work_hours beregnes timerne ud fra work_minutes (generated column, over midnat = næste dag).
+    """
     conn = get_connection()
     cur = conn.cursor()
     cur.execute(
         "UPDATE signups SET work_start = ?, work_end = ?, work_hours = ? WHERE id = ?",
         (work_start, work_end, work_hours, signup_id),
     )
+    if work_hours is None:
+        cur.execute(
+            "UPDATE signups SET work_hours = ROUND(work_minutes / 60.0, 2) WHERE id = ?",
+            (signup_id,),
+        )
     conn.commit()
     conn.close()
 
@@ -649,105 +2005,127 @@ def set_signup_payroll_status(signup_id: int, paid: bool):
     conn.close()
 
 
+_SHIFT_SIGNUPS_SELECT = """
+    SELECT
+        sg.shift_id AS shift_id,
+        sg.id AS signup_id,
+        sg.status AS status,
+        sg.available_from AS available_from,
+        sg.available_until AS available_until,
+        sg.meet_time AS meet_time,
+        sg.freelancer_note AS freelancer_note,
+        p.name AS person_name,
+        p.phone AS phone
+    FROM signups sg
+    JOIN persons p ON p.id = sg.person_id
+"""
+
+
+def _shift_signup_row_to_dict(row) -> dict:
+    return {
+        "signup_id": row["signup_id"],
+        "status": row["status"],
+        "available_from": row["available_from"],
+        "available_until": row["available_until"],
+        "meet_time": row["meet_time"],
+        "name": row["person_name"],
+        "phone": row["phone"],
+        "freelancer_note": row["freelancer_note"],
+    }
+
+
+# Maks. antal shift-id'er pr. IN (...) – holder os langt under SQLites variabel-grænse
+_IN_BATCH = 500
+
+
+def _rows_for_shifts(conn, select_sql: str, where: str, order_by: str, shift_ids: list, params=()):
+    """Kør select_sql for mange vagter med få queries: {shift_id: [sqlite3.Row, ...]}."""
+    result = {shift_id: [] for shift_id in shift_ids}
+    for i in range(0, len(shift_ids), _IN_BATCH):
+        ids = shift_ids[i:i + _IN_BATCH]
+        placeholders = ",".join("?" * len(ids))
+        cur = conn.cursor()
+        cur.execute(
+            f"{select_sql} WHERE sg.shift_id IN ({placeholders}) {where} ORDER BY {order_by}",
+            (*ids, *params),
+        )
+        for row in cur.fetchall():
+            result[row["shift_id"]].append(row)
+    return result
+
+
+def _signups_for_shifts(conn, shift_ids: list) -> dict:
+    """Som get_signups_for_shift, men for mange vagter: {shift_id: [tilmelding, ...]}."""
+    rows = _rows_for_shifts(
+        conn, _SHIFT_SIGNUPS_SELECT, "AND sg.status != ?", "sg.created_at, sg.id",
+        shift_ids, (STATUS_CANCELLED_BY_ADMIN,),
+    )
+    return {shift_id: [_shift_signup_row_to_dict(r) for r in lst] for shift_id, lst in rows.items()}
+
+
 def get_signups_for_shift(shift_id: int):
     """
     Hent alle aktive tilmeldinger til en given vagt, inkl. person-oplysninger.
     Filtrerer automatisk CANCELLED_BY_ADMIN fra admin-visningen.
     """
     conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT
-            sg.id AS signup_id,
-            sg.status AS status,
-            sg.available_from AS available_from,
-            sg.available_until AS available_until,
-            sg.meet_time AS meet_time,
-            sg.freelancer_note AS freelancer_note,
-            p.name AS person_name,
-            p.phone AS phone
-        FROM signups sg
-        JOIN persons p ON p.id = sg.person_id
-        WHERE sg.shift_id = ?
-          AND sg.status != ?
-        ORDER BY sg.created_at
-        """,
-        (shift_id, STATUS_CANCELLED_BY_ADMIN),
-    )
-
-    rows = cur.fetchall()
+    signups = _signups_for_shifts(conn, [shift_id])[shift_id]
     conn.close()
+    return signups
 
-    signups = []
-    for row in rows:
-        signups.append(
-            {
-                "signup_id": row["signup_id"],
-                "status": row["status"],
-                "available_from": row["available_from"],
-                "available_until": row["available_until"],
-                "meet_time": row["meet_time"],
-                "name": row["person_name"],
-                "phone": row["phone"],
-                "freelancer_note": row["freelancer_note"],
-            }
-        )
+_SHIFT_SIGNUPS_WITH_HOURS_SELECT = """
+    SELECT
+        sg.shift_id AS shift_id,
+        sg.id AS signup_id,
+        sg.status AS status,
+        sg.available_from AS available_from,
+        sg.meet_time AS meet_time,
+        sg.freelancer_note AS freelancer_note,
+        sg.work_start AS work_start,
+        sg.work_end AS work_end,
+        sg.work_hours AS work_hours,
+        sg.payroll_paid AS payroll_paid,
+        sg.payroll_paid_at AS payroll_paid_at,
+        sg.person_id AS person_id,
+        p.name AS person_name,
+        p.phone AS phone
+    FROM signups sg
+    JOIN persons p ON p.id = sg.person_id
+"""
+
+
+def _signup_with_hours_row_to_dict(row) -> dict:
+    return {
+        "signup_id": row["signup_id"],
+        "status": row["status"],
+        "available_from": row["available_from"],
+        "meet_time": row["meet_time"],
+        "work_start": row["work_start"],
+        "work_end": row["work_end"],
+        "work_hours": row["work_hours"],
+        "payroll_paid": bool(row["payroll_paid"]) if row["payroll_paid"] is not None else False,
+        "payroll_paid_at": row["payroll_paid_at"],
+        "person_id": row["person_id"],
+        "name": row["person_name"],
+        "phone": row["phone"],
+        "freelancer_note": row["freelancer_note"],
+    }
+
+
+def _signups_with_hours_for_shifts(conn, shift_ids: list) -> dict:
+    """Som get_signups_for_shift_with_hours, men for mange vagter: {shift_id: [...]}."""
+    rows = _rows_for_shifts(conn, _SHIFT_SIGNUPS_WITH_HOURS_SELECT, "", "p.name, sg.id", shift_ids)
+    return {shift_id: [_signup_with_hours_row_to_dict(r) for r in lst] for shift_id, lst in rows.items()}
 
-    return signups
 
 def get_signups_for_shift_with_hours(shift_id: int):
     """
     Hent alle tilmeldinger til en given vagt, inkl. person-info
     og registrerede arbejdstimer / afregningsstatus.
-    Bruges i admin-historik.
     """
     conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT
-            sg.id AS signup_id,
-            sg.status AS status,
-            sg.available_from AS available_from,
-            sg.meet_time AS meet_time,
-            sg.freelancer_note AS freelancer_note,
-            sg.work_start AS work_start,
-            sg.work_end AS work_end,
-            sg.work_hours AS work_hours,
-            sg.payroll_paid AS payroll_paid,
-            sg.payroll_paid_at AS payroll_paid_at,
-            p.name AS person_name,
-            p.phone AS phone
-        FROM signups sg
-        JOIN persons p ON p.id = sg.person_id
-        WHERE sg.shift_id = ?
-        ORDER BY p.name
-        """,
-        (shift_id,),
-    )
-    rows = cur.fetchall()
+    signups = _signups_with_hours_for_shifts(conn, [shift_id])[shift_id]
     conn.close()
-
-    signups = []
-    for row in rows:
-        signups.append(
-            {
-                "signup_id": row["signup_id"],
-                "status": row["status"],
-                "available_from": row["available_from"],
-                "meet_time": row["meet_time"],
-                "work_start": row["work_start"],
-                "work_end": row["work_end"],
-                "work_hours": row["work_hours"],
-                "payroll_paid": bool(row["payroll_paid"]) if row["payroll_paid"] is not None else False,
-                "payroll_paid_at": row["payroll_paid_at"],
-                "name": row["person_name"],
-                "phone": row["phone"],
-                "freelancer_note": row["freelancer_note"],
-            }
-        )
-
     return signups
 
 
@@ -778,12 +2156,8 @@ def set_signup_meet_time(signup_id: int, meet_time: str | None):
 
 from datetime import date
 
-def get_hours_for_month(year: int, month: int, include_paid: bool = False, include_missing: bool = True):
-    conn = get_connection()
-    cur = conn.cursor()
-
-    year_str = f"{year:04d}"
-    month_str = f"{month:02d}"
+def _hours_query(year: int, month: int, include_paid: bool, include_missing: bool):
+    """(sql, params) for timer/løn-rækkerne i en måned (vagter + ekstravagter), uden ORDER BY."""
     today_str = date.today().strftime("%Y-%m-%d")
 
     # Normal-vagter (signups + shifts)
@@ -799,9 +2173,11 @@ def get_hours_for_month(year: int, month: int, include_paid: bool = False, inclu
             sg.payroll_paid_at,
 
             s.date AS shift_date,
+            s.date_dk AS shift_date_dk,
             s.location AS location,
             s.description AS description,
 
+            p.id AS person_id,
             p.name AS person_name,
             p.phone AS phone
         FROM signups sg
@@ -809,12 +2185,12 @@ def get_hours_for_month(year: int, month: int, include_paid: bool = False, inclu
         JOIN persons p ON p.id = sg.person_id
         WHERE
             sg.status = ?
-            AND substr(s.date, 1, 4) = ?
-            AND substr(s.date, 6, 2) = ?
+            AND s.date_year = ?
+            AND s.date_month = ?
             AND s.date <= ?
     """
 
-    normal_params = ["APPROVED", year_str, month_str, today_str]
+    normal_params = ["APPROVED", year, month, today_str]
 
     if not include_missing:
         normal_query += " AND sg.work_hours IS NOT NULL"
@@ -835,20 +2211,22 @@ def get_hours_for_month(year: int, month: int, include_paid: bool = False, inclu
             es.payroll_paid_at,
 
             es.date AS shift_date,
+            es.date_dk AS shift_date_dk,
             '' AS location,
             es.note AS description,
 
+            p.id AS person_id,
             p.name AS person_name,
             p.phone AS phone
         FROM extra_shifts es
         JOIN persons p ON p.id = es.person_id
         WHERE
-            substr(es.date, 1, 4) = ?
-            AND substr(es.date, 6, 2) = ?
+            es.date_year = ?
+            AND es.date_month = ?
             AND es.date <= ?
     """
 
-    extra_params = [year_str, month_str, today_str]
+    extra_params = [year, month, today_str]
 
     if not include_missing:
         extra_query += " AND es.work_hours IS NOT NULL"
@@ -856,36 +2234,57 @@ def get_hours_for_month(year: int, month: int, include_paid: bool = False, inclu
     if not include_paid:
         extra_query += " AND (es.payroll_paid IS NULL OR es.payroll_paid = 0)"
 
-    # Samlet
-    query = f"""
-        {normal_query}
-        UNION ALL
-        {extra_query}
-        ORDER BY person_name, shift_date
+    return f"{normal_query}\nUNION ALL\n{extra_query}", normal_params + extra_params
+
+
+def get_hours_for_month(year: int, month: int, include_paid: bool = False, include_missing: bool = True):
+    query, params = _hours_query(year, month, include_paid, include_missing)
+    conn = get_connection()
+    cur = conn.cursor()
+    rows = _fetch_compact(cur, HoursRow, query + " ORDER BY person_name, shift_date", params)
+    conn.close()
+    return rows
+
+
+def iter_hours_for_month(year: int, month: int, include_paid: bool = False, include_missing: bool = True):
+    """
+    Som get_hours_for_month, men som generator sorteret person for person
+    (navn, telefon, person-id, dato), så rækkerne kan grupperes mens de streames.
+    Forespørgslen køres først når templaten når til tabellen; rækkerne (én måned)
+    læses færdig og forbindelsen lukkes, før den første yieldes.
     """
+    query, params = _hours_query(year, month, include_paid, include_missing)
+    conn = get_connection()
+    try:
+        rows = _fetch_compact(
+            conn.cursor(),
+            HoursRow,
+            query + " ORDER BY person_name COLLATE NOCASE, phone, person_id, shift_date",
+            params,
+        )
+    finally:
+        conn.close()
+    yield from rows
 
-    cur.execute(query, normal_params + extra_params)
-    rows = cur.fetchall()
+
+def get_hours_total_for_month(year: int, month: int, include_paid: bool = False, include_missing: bool = True) -> float:
+    """Sum af timer i måneden (godkendte timer hvis admin har godkendt, ellers de registrerede)."""
+    query, params = _hours_query(year, month, include_paid, include_missing)
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT COALESCE(SUM(
+            CASE WHEN hours_approved_by_admin THEN approved_work_hours ELSE work_hours END
+        ), 0)
+        FROM ({query})
+        """,
+        params,
+    )
+    total = cur.fetchone()[0]
     conn.close()
+    return float(total)
 
-    result = []
-    for row in rows:
-        result.append({
-            "signup_id": row["signup_id"],
-            "work_start": row["work_start"],
-            "work_end": row["work_end"],
-            "work_hours": row["work_hours"],
-            "approved_work_hours": row["approved_work_hours"],
-            "hours_approved_by_admin": bool(row["hours_approved_by_admin"]),
-            "payroll_paid": bool(row["payroll_paid"]),
-            "payroll_paid_at": row["payroll_paid_at"],
-            "shift_date": row["shift_date"],
-            "location": row["location"],
-            "description": row["description"],
-            "person_name": row["person_name"],
-            "phone": row["phone"],
-        })
-    return result
 
 def get_pending_admin_actions():
     """
@@ -916,6 +2315,40 @@ def get_pending_admin_actions():
     }
 
 
+def count_unstaffed_upcoming_shifts() -> int:
+    """Antal aktive, kommende vagter hvor der er færre APPROVED end required_staff."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT COUNT(*) AS c FROM (
+            SELECT s.id
+            FROM shifts s
+            LEFT JOIN signups sg ON sg.shift_id = s.id AND sg.status = ?
+            WHERE s.is_active = 1
+              AND s.date >= ?
+            GROUP BY s.id
+            HAVING COUNT(sg.id) < s.required_staff
+        )
+        """,
+        (STATUS_APPROVED, date.today().isoformat()),
+    )
+    row = cur.fetchone()
+    conn.close()
+    return row["c"]
+
+
+def get_db_file_sizes() -> dict:
+    """Størrelse i bytes på databasefilen og dens WAL-fil (0 hvis den ikke findes)."""
+    sizes = {}
+    for kind, path in (("main", DB_PATH), ("wal", DB_PATH + "-wal")):
+        try:
+            sizes[kind] = os.path.getsize(path)
+        except OSError:
+            sizes[kind] = 0
+    return sizes
+
+
 def delete_signup(signup_id: int):
     """Slet en tilmelding helt fra databasen."""
     conn = get_connection()
@@ -936,6 +2369,103 @@ def get_all_persons():
     conn.close()
     return [dict(row) for row in rows]
 
+def count_persons() -> int:
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) AS c FROM persons")
+    row = cur.fetchone()
+    conn.close()
+    return row["c"]
+
+
+def get_persons_page(after: str | None = None, before: str | None = None, limit=PAGE_SIZE_DEFAULT):
+    """
+    Én side af personkartoteket sorteret (name NOCASE, id) via idx_persons_name_nocase.
+    Returnerer {"items": [person-dicts], "next": cursor|None, "prev": cursor|None}.
+    """
+    limit = _clamp_page_size(limit)
+    after_key = decode_cursor(after, 2)
+    before_key = decode_cursor(before, 2) if after_key is None else None
+    backwards = before_key is not None
+
+    # Udfoldet (name, id) > (?, ?) så NOCASE-indexet kan bruges til at søge direkte hen til cursoren
+    where = "1"
+    params = {"limit": limit + 1}
+    if after_key:
+        where = "name >= :n COLLATE NOCASE AND (name > :n COLLATE NOCASE OR id > :i)"
+        params.update(n=after_key[0], i=after_key[1])
+    elif before_key:
+        where = "name <= :n COLLATE NOCASE AND (name < :n COLLATE NOCASE OR id < :i)"
+        params.update(n=before_key[0], i=before_key[1])
+    direction = "DESC" if backwards else "ASC"
+
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT id, name, phone, created_at
+        FROM persons
+        WHERE {where}
+        ORDER BY name COLLATE NOCASE {direction}, id {direction}
+        LIMIT :limit
+        """,
+        params,
+    )
+    rows = [dict(row) for row in cur.fetchall()]
+    conn.close()
+
+    return _keyset_result(
+        rows, limit, backwards, bool(after_key or before_key),
+        key_fn=lambda p: (p["name"], p["id"]),
+    )
+
+
+def search_persons(query: str, limit: int = 10):
+    """
+    Typeahead: op til `limit` personer hvis telefon starter med query, eller hvor et
+    ord i navnet starter med query ('han' finder både "Hanne Berg" og "Lars Hansen").
+    Ligner query et telefonnummer, søges på phone_norm (index-range scan), ellers på
+    navn; personer hvis fulde navn starter med query vises først.
+    """
+    query = (query or "").strip()
+    if not query:
+        return []
+    limit = max(1, min(int(limit), 50))
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    digits = re.sub(r"[\s\-+().]", "", query)
+    if digits.isdigit():
+        prefix = normalize_phone(query) if len(digits) >= 8 else digits
+        cur.execute(
+            """
+            SELECT id, name, phone
+            FROM persons
+            WHERE phone_norm >= ? AND phone_norm < ?
+            ORDER BY phone_norm
+            LIMIT ?
+            """,
+            (prefix, prefix + "\uffff", limit),
+        )
+    else:
+        escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        cur.execute(
+            """
+            SELECT id, name, phone
+            FROM persons
+            WHERE name LIKE :prefix ESCAPE '\\' OR name LIKE '% ' || :prefix ESCAPE '\\'
+            ORDER BY name NOT LIKE :prefix ESCAPE '\\', name COLLATE NOCASE
+            LIMIT :limit
+            """,
+            {"prefix": escaped + "%", "limit": limit},
+        )
+
+    rows = cur.fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
 def approve_work_hours(signup_id: int, approved_hours: float):
     conn = get_connection()
     cur = conn.cursor()
@@ -1065,6 +2595,129 @@ def delete_person(person_id: int):
     conn.commit()
     conn.close()
 
+def _name_key(name: str | None) -> str:
+    """Navn til sammenligning: små bogstaver, uden accenter/tegnsætning, ét mellemrum."""
+    text = unicodedata.normalize("NFKD", name or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def _phone_distance_one(a: str, b: str) -> bool:
+    """True hvis to numre af samme længde afviger i præcis ét ciffer (tastefejl)."""
+    return len(a) == len(b) and sum(x != y for x, y in zip(a, b)) == 1
+
+
+def find_duplicate_persons(name_threshold: float = 0.85, limit: int = 200):
+    """
+    Find sandsynlige dubletter i persons. Et par kommer med hvis:
+    - telefonnumrene har samme sidste 8 cifre (fx udenlandsk præfiks), eller
+    - telefonnumrene afviger med ét ciffer, eller
+    - navnene ligner hinanden (SequenceMatcher >= name_threshold).
+    For ikke at sammenligne alle med alle, sammenlignes navne kun inden for
+    samme "blok" (de to første bogstaver i navnet).
+
+    Returnerer en liste af {survivor, duplicate, score, reasons}, bedste først.
+    survivor er forslaget til hvem der beholdes (flest tilmeldinger, ellers ældst).
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT
+            p.id, p.name, p.phone, p.phone_norm, p.created_at,
+            (SELECT COUNT(*) FROM signups sg WHERE sg.person_id = p.id) AS signup_count
+        FROM persons p
+        ORDER BY p.id
+        """
+    )
+    persons = [dict(r) for r in cur.fetchall()]
+    conn.close()
+
+    for p in persons:
+        p["_key"] = _name_key(p["name"])
+        p["_digits"] = re.sub(r"\D", "", p["phone_norm"] or p["phone"] or "")
+
+    pairs = {}
+
+    def consider(a, b):
+        if a["id"] == b["id"]:
+            return
+        key = (min(a["id"], b["id"]), max(a["id"], b["id"]))
+        if key in pairs:
+            return
+
+        reasons = []
+        if a["_digits"][-8:] and a["_digits"][-8:] == b["_digits"][-8:]:
+            reasons.append("samme telefon (sidste 8 cifre)")
+        elif _phone_distance_one(a["_digits"], b["_digits"]):
+            reasons.append("telefon afviger med ét ciffer")
+
+        ratio = SequenceMatcher(None, a["_key"], b["_key"]).ratio() if a["_key"] and b["_key"] else 0.0
+        if ratio >= name_threshold:
+            reasons.append(f"navn ligner ({round(ratio * 100)}%)")
+
+        if not reasons:
+            return
+
+        # Telefon-match vejer tungest; navnelighed afgør rækkefølgen derefter
+        score = ratio + (1.0 if len(reasons) > 1 or "telefon" in reasons[0] else 0.0)
+        survivor, duplicate = sorted((a, b), key=lambda p: (-p["signup_count"], p["id"]))
+        pairs[key] = {
+            "survivor": {k: v for k, v in survivor.items() if not k.startswith("_")},
+            "duplicate": {k: v for k, v in duplicate.items() if not k.startswith("_")},
+            "score": round(score, 3),
+            "reasons": reasons,
+        }
+
+    # Blok 1: samme sidste 8 cifre
+    by_phone = {}
+    for p in persons:
+        if p["_digits"]:
+            by_phone.setdefault(p["_digits"][-8:], []).append(p)
+
+    # Blok 2: samme to første bogstaver i navnet
+    by_name = {}
+    for p in persons:
+        by_name.setdefault(p["_key"][:2], []).append(p)
+
+    for group in list(by_phone.values()) + list(by_name.values()):
+        for i in range(len(group)):
+            for j in range(i + 1, len(group)):
+                consider(group[i], group[j])
+
+    return sorted(pairs.values(), key=lambda x: x["score"], reverse=True)[:limit]
+
+
+def merge_persons(survivor_id: int, duplicate_id: int) -> bool:
+    """
+    Flet duplicate_id ind i survivor_id i én transaktion: signups og extra_shifts
+    flyttes, konflikter på UNIQUE(person_id, shift_id) løses, og duplikatet slettes.
+    Returnerer False hvis en af personerne ikke findes (eller de er ens).
+    """
+    if survivor_id == duplicate_id:
+        return False
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("SELECT COUNT(*) AS c FROM persons WHERE id IN (?, ?)", (survivor_id, duplicate_id))
+        if cur.fetchone()["c"] != 2:
+            conn.rollback()
+            return False
+        _merge_person_rows(cur, survivor_id, duplicate_id)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    log.info("merged persons", extra={"survivor_id": survivor_id, "duplicate_id": duplicate_id})
+    return True
+
+
 def create_extra_shift(
     name: str,
     phone: str,
@@ -1100,9 +2753,6 @@ def get_extra_hours_for_month(year: int, month: int, include_paid: bool, include
       person_name, phone, shift_date, location, description, work_start, work_end, work_hours,
       approved_work_hours, hours_approved_by_admin, payroll_paid, payroll_paid_at, extra_id
     """
-    # YYYY-MM prefix
-    prefix = f"{year:04d}-{month:02d}-"
-
     where_paid = ""
     if not include_paid:
         where_paid = "AND es.payroll_paid = 0"
@@ -1131,11 +2781,12 @@ def get_extra_hours_for_month(year: int, month: int, include_paid: bool, include
             es.status
         FROM extra_shifts es
         JOIN persons p ON p.id = es.person_id
-        WHERE es.date LIKE ?
+        WHERE es.date_year = ?
+          AND es.date_month = ?
           {where_paid}
         ORDER BY p.name COLLATE NOCASE ASC, es.date ASC
         """,
-        (prefix + "%",),
+        (year, month),
     )
     rows = [dict(r) for r in cur.fetchall()]
     conn.close()
@@ -0,0 +1,64 @@
+from functools import lru_cache
+
+# Formatering af datoer, tider og timetal til templates.
+#
+# Filtrene kaldes for hver celle på de store sider (historik, timer/løn), men
+# antallet af forskellige værdier er lille (datoer i en periode, '17:00', 6.5 …).
+# Resultaterne caches derfor i begrænsede LRU-caches nøglet på input-værdien.
+
+CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def dk_date(value: str | None) -> str:
+    """ISO 'YYYY-MM-DD' -> dansk 'DD-MM-YYYY'. Ugyldige værdier returneres uændret."""
+    if not value:
+        return ""
+    if not isinstance(value, str):
+        return str(value)
+    if len(value) != 10 or value[4] != "-" or value[7] != "-":
+        return value
+    year, month, day = value[:4], value[5:7], value[8:]
+    if not (year.isdigit() and month.isdigit() and day.isdigit()):
+        return value
+    if not (1 <= int(month) <= 12 and 1 <= int(day) <= 31):
+        return value
+    return f"{day}-{month}-{year}"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def hhmm(value: str | None, empty: str = "-") -> str:
+    """'7:05' / '07:05:00' -> '07:05'. Tom værdi eller ikke-tekst -> `empty`, ugyldig returneres uændret."""
+    if not value or not isinstance(value, str):
+        return empty
+    parts = value.strip().split(":")
+    if len(parts) not in (2, 3) or not (parts[0].isdigit() and parts[1].isdigit()):
+        return value
+    h, m = int(parts[0]), int(parts[1])
+    if h > 23 or m > 59:
+        return value
+    return f"{h:02d}:{m:02d}"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def hours(value: float | int | None, empty: str = "0.00") -> str:
+    """Timetal med to decimaler, fx 6.5 -> '6.50'. None -> `empty`."""
+    if value is None:
+        return empty
+    return f"{float(value):.2f}"
+
+
+# Template-filtre (navn -> funktion); registreres i app.py og i jinja_cache-build-steppet
+TEMPLATE_FILTERS = {
+    "dkdate": dk_date,
+    "hhmm": hhmm,
+    "hours": hours,
+}
+
+
+def cache_stats() -> dict:
+    """Hit/miss pr. formatter (til fejlsøgning og benchmarks)."""
+    return {
+        fn.__name__: fn.cache_info()._asdict()
+        for fn in (dk_date, hhmm, hours)
+    }
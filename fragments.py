@@ -0,0 +1,103 @@
+import os
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+from markupsafe import Markup
+
+# Cache af renderede HTML-fragmenter pr. proces (et vagtkort, en række i
+# bemandingsoverblikket). Større fragmenter der deles mellem workers, fx en
+# historik-måned, ligger i shared_cache.py.
+#
+# Nøglerne indeholder altid en version fra databasen (MAX(seq) i ændringsloggen,
+# se database._SHIFT_VERSION_SQL). Ændres data, spørges der på en ny nøgle,
+# og det gamle fragment bliver aldrig ramt igen – det falder ud af LRU'en af
+# sig selv. Derfor er der ingen eksplicit invalidering, og hver worker kan have
+# sin egen cache uden at vise forældet HTML.
+
+MAX_BYTES = int(os.environ.get("FRAGMENT_CACHE_BYTES", str(8 * 1024 * 1024)))
+
+
+class FragmentCache:
+    """Trådsikker LRU af HTML-strenge, begrænset af samlet størrelse i bytes (UTF-8 ≈ len)."""
+
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key) -> Markup | None:
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def set(self, key, html: str) -> Markup:
+        html = Markup(html)
+        size = len(html)
+        if size > self.max_bytes:
+            return html  # for stort til at cache – returnér bare
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = html
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+        return html
+
+    def get_or_render(self, key, render) -> Markup:
+        """Cachet fragment for `key`, ellers render() (uden lås – to tråde kan rendere samme fragment)."""
+        html = self.get(key)
+        if html is None:
+            html = self.set(key, render())
+        return html
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Fælles cache for processen
+cache = FragmentCache()
+
+
+def cached_fragment(template_name: str, key: tuple, **context) -> Markup:
+    """
+    Template-helper: render `template_name` med `context`, cachet på
+    (template_name, *key). Nøglen skal dække alt hvad fragmentet afhænger af,
+    fx (shift.id, shift.version). Fragmentet renderes direkte i Jinja-miljøet
+    uden context processors, så det kun ser det der sendes med.
+    """
+    def render():
+        return current_app.jinja_env.get_template(template_name).render(context)
+
+    return cache.get_or_render((template_name, *key), render)
+
+
+def init_app(app) -> None:
+    """Registrér cached_fragment() i templates."""
+    app.add_template_global(cached_fragment, "cached_fragment")
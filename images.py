@@ -0,0 +1,226 @@
+import json
+import os
+import shutil
+import sys
+import time
+
+from markupsafe import Markup, escape
+
+import applog
+from assets import asset_url
+
+# Billed-pipeline: WebP/AVIF og flere bredder af billederne i static/img.
+#
+# `python images.py` (køres i Dockerfile efter jinja_cache.py) skalerer hvert
+# billede ned til WIDTHS (aldrig op) og gemmer AVIF, WebP og en genkomprimeret
+# JPEG i static/img/variants/ sammen med manifest.json. Filerne serveres via
+# asset_url(), så de får fingerprint og "immutable" ligesom CSS/JS.
+#
+# picture('myggen-bg-1.jpg') i templates giver <picture> med en <source> pr.
+# format og srcset pr. bredde – browseren vælger selv format og størrelse.
+# Mangler manifestet (fx lokalt uden Pillow), falder helperen tilbage til et
+# almindeligt <img> med originalbilledet.
+
+log = applog.get_logger("images")
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(ROOT, "static")
+SOURCE_DIR = os.path.join(STATIC_DIR, "img")
+VARIANT_DIR = os.path.join(SOURCE_DIR, "variants")
+MANIFEST_PATH = os.path.join(VARIANT_DIR, "manifest.json")
+
+SOURCE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+WIDTHS = (480, 960, 1600)
+
+# Formater i den rækkefølge de skal stå i <picture> (bedste komprimering først).
+# JPEG er fallback i <img> og skal altid med.
+FORMATS = {
+    "avif": {"ext": ".avif", "mime": "image/avif", "save": {"quality": 50}},
+    "webp": {"ext": ".webp", "mime": "image/webp", "save": {"quality": 78, "method": 6}},
+    "jpeg": {"ext": ".jpg", "mime": "image/jpeg", "save": {"quality": 80, "optimize": True, "progressive": True}},
+}
+
+
+# ---------------------------------------------------------
+# Build
+# ---------------------------------------------------------
+
+def _target_widths(width: int) -> list[int]:
+    # Bredder op til originalen; originalbredden med hvis den ligger imellem
+    widths = [w for w in WIDTHS if w < width]
+    widths.append(min(width, WIDTHS[-1]))
+    return widths
+
+
+def _supported_formats() -> list[str]:
+    from PIL import features
+
+    formats = []
+    for fmt in FORMATS:
+        if fmt == "jpeg" or features.check(fmt):
+            formats.append(fmt)
+        else:
+            log.warning("Pillow mangler understøttelse af billedformat – springes over", extra={"format": fmt})
+    return formats
+
+
+def _build_image(filename: str, formats: list[str]) -> dict:
+    from PIL import Image, ImageOps
+
+    src_path = os.path.join(SOURCE_DIR, filename)
+    src_mtime = os.stat(src_path).st_mtime_ns
+    stem = os.path.splitext(filename)[0]
+
+    with Image.open(src_path) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if "transparency" in im.info else "RGB")
+        width, height = im.size
+
+        entry = {"width": width, "height": height, "sources": {fmt: [] for fmt in formats}}
+        for w in _target_widths(width):
+            h = round(height * w / width)
+            resized = None
+            for fmt in formats:
+                spec = FORMATS[fmt]
+                name = f"{stem}-{w}{spec['ext']}"
+                out_path = os.path.join(VARIANT_DIR, name)
+                # Inkrementelt: kun filer der er ældre end kilden bygges igen
+                try:
+                    fresh = os.stat(out_path).st_mtime_ns >= src_mtime
+                except OSError:
+                    fresh = False
+                if not fresh:
+                    if resized is None:
+                        resized = im if w == width else im.resize((w, h), Image.LANCZOS)
+                    img = resized.convert("RGB") if fmt == "jpeg" and resized.mode != "RGB" else resized
+                    img.save(out_path, format=fmt.upper(), **spec["save"])
+                    # En genkomprimeret JPEG i fuld bredde kan blive større end originalen
+                    if fmt == "jpeg" and w == width and src_path.lower().endswith((".jpg", ".jpeg")):
+                        if os.path.getsize(out_path) > os.path.getsize(src_path):
+                            shutil.copyfile(src_path, out_path)
+                entry["sources"][fmt].append([w, f"img/variants/{name}"])
+    return entry
+
+
+def build() -> dict:
+    """Byg alle varianter og skriv manifest.json. Returnerer manifestet."""
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        log.error("Pillow er ikke installeret – pip install -r requirements-build.txt")
+        raise
+
+    os.makedirs(VARIANT_DIR, exist_ok=True)
+    formats = _supported_formats()
+
+    manifest = {}
+    for filename in sorted(os.listdir(SOURCE_DIR)):
+        if not filename.lower().endswith(SOURCE_EXTENSIONS):
+            continue
+        manifest[filename] = _build_image(filename, formats)
+
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+    return manifest
+
+
+# ---------------------------------------------------------
+# Template-helper
+# ---------------------------------------------------------
+
+_manifest_cache: tuple[int, dict] | None = None
+
+
+def _manifest() -> dict:
+    # Genindlæses når filen ændres (fx efter `python images.py` under udvikling)
+    global _manifest_cache
+    try:
+        mtime = os.stat(MANIFEST_PATH).st_mtime_ns
+    except OSError:
+        return {}
+    if _manifest_cache is None or _manifest_cache[0] != mtime:
+        try:
+            with open(MANIFEST_PATH, encoding="utf-8") as f:
+                _manifest_cache = (mtime, json.load(f))
+        except (OSError, ValueError):
+            log.exception("Kunne ikke læse billed-manifest", extra={"path": MANIFEST_PATH})
+            return {}
+    return _manifest_cache[1]
+
+
+def _srcset(candidates: list) -> str:
+    return ", ".join(f"{asset_url(path)} {w}w" for w, path in candidates)
+
+
+def picture(
+    filename: str,
+    alt: str = "",
+    sizes: str = "100vw",
+    class_: str | None = None,
+    loading: str = "lazy",
+    fetchpriority: str | None = None,
+) -> Markup:
+    """
+    <picture> med AVIF/WebP/JPEG i flere bredder for et billede i static/img.
+    Tom alt = dekorativt billede (fx baggrunde).
+    """
+    entry = _manifest().get(filename)
+
+    img_attrs = [f'alt="{escape(alt)}"', f'loading="{escape(loading)}"', 'decoding="async"']
+    if fetchpriority:
+        img_attrs.append(f'fetchpriority="{escape(fetchpriority)}"')
+
+    class_attr = f' class="{escape(class_)}"' if class_ else ""
+    hidden_attr = ' aria-hidden="true"' if not alt else ""
+
+    if entry is None:
+        src = asset_url(f"img/{filename}")
+        return Markup(f'<picture{class_attr}{hidden_attr}><img src="{src}" {" ".join(img_attrs)}></picture>')
+
+    sources = entry["sources"]
+    parts = [f"<picture{class_attr}{hidden_attr}>"]
+    for fmt, spec in FORMATS.items():
+        if fmt == "jpeg" or not sources.get(fmt):
+            continue
+        parts.append(f'<source type="{spec["mime"]}" srcset="{_srcset(sources[fmt])}" sizes="{escape(sizes)}">')
+
+    fallback = sources["jpeg"]
+    parts.append(
+        f'<img src="{asset_url(fallback[-1][1])}" srcset="{_srcset(fallback)}" sizes="{escape(sizes)}" '
+        f'width="{entry["width"]}" height="{entry["height"]}" {" ".join(img_attrs)}>'
+    )
+    parts.append("</picture>")
+    return Markup("".join(parts))
+
+
+def init_app(app) -> None:
+    """Registrér picture() i templates (kræver assets.init_app)."""
+    app.add_template_global(picture, "picture")
+
+
+def _size(path: str) -> int:
+    return os.path.getsize(os.path.join(STATIC_DIR, path))
+
+
+def main() -> None:
+    t0 = time.perf_counter()
+    try:
+        manifest = build()
+    except ImportError:
+        sys.exit(1)
+    total = time.perf_counter() - t0
+
+    for filename, entry in manifest.items():
+        original = os.path.getsize(os.path.join(SOURCE_DIR, filename))
+        print(f"  {filename:<34} {entry['width']}x{entry['height']}  original {original / 1024:7.1f} KB")
+        for fmt, candidates in entry["sources"].items():
+            sizes = "  ".join(f"{w}w {_size(path) / 1024:6.1f} KB" for w, path in candidates)
+            print(f"    {fmt:<5} {sizes}")
+    print(f"✓ {len(manifest)} billeder behandlet til {VARIANT_DIR} ({total * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
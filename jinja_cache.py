@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+
+from flask import Flask
+from jinja2 import FileSystemBytecodeCache, TemplateError
+
+import applog
+import formatting
+
+# Bytecode-cache og forkompilering af templates.
+#
+# Jinja kompilerer hver template til Python-kode første gang den bruges, i hver
+# gunicorn-worker. Med en FileSystemBytecodeCache genbruges den kompilerede kode
+# på tværs af processer og genstarter, og `python jinja_cache.py` (køres i
+# Dockerfile) fylder cachen allerede ved build. Ændres en template, passer
+# checksummen ikke længere, og Jinja kompilerer bare igen.
+
+log = applog.get_logger("jinja_cache")
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _resolve_cache_dir() -> str:
+    env = os.environ.get("TEMPLATE_CACHE_DIR", "").strip()
+    if env:
+        return env
+    return os.path.join(ROOT, ".jinja_cache")
+
+
+TEMPLATE_CACHE_DIR = _resolve_cache_dir()
+
+# Indlæs alle templates ved opstart af workeren (0 = først ved første brug)
+TEMPLATE_WARMUP = os.environ.get("TEMPLATE_WARMUP", "1").strip() != "0"
+
+
+class _ReadOnlyBytecodeCache(FileSystemBytecodeCache):
+    """Læser en forkompileret cache (fx i et read-only image), men skriver aldrig."""
+
+    def dump_bytecode(self, bucket) -> None:
+        pass
+
+
+def install(app, cache_dir: str | None = None) -> None:
+    """Sæt bytecode-cachen på app.jinja_env (skal ske før første render)."""
+    cache_dir = cache_dir or TEMPLATE_CACHE_DIR
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError:
+        pass
+
+    if not os.path.isdir(cache_dir):
+        log.warning("Template-cache mappe findes ikke – kører uden bytecode-cache", extra={"dir": cache_dir})
+        return
+
+    if os.access(cache_dir, os.W_OK):
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    else:
+        app.jinja_env.bytecode_cache = _ReadOnlyBytecodeCache(cache_dir)
+
+
+def precompile(app) -> list[tuple[str, float]]:
+    """
+    Indlæs (og dermed kompilér/cache) alle templates i app'ens template-mappe.
+    Returnerer [(navn, sekunder)]. Fejl i en template logges og springes over.
+    """
+    timings = []
+    for name in app.jinja_env.list_templates(extensions=["html"]):
+        t0 = time.perf_counter()
+        try:
+            app.jinja_env.get_template(name)
+        except TemplateError:
+            log.exception("Template kunne ikke kompileres", extra={"template": name})
+            continue
+        timings.append((name, time.perf_counter() - t0))
+    return timings
+
+
+def _build_app():
+    # En "tom" Flask-app med samme template-mappe og Jinja-options som app.py.
+    # Vi importerer ikke app.py her, så build-steppet ikke rører databasen.
+    app = Flask("app", root_path=ROOT)
+    # Filtre skal kendes ved kompilering, ellers fejler templates der bruger dem
+    for name, fn in formatting.TEMPLATE_FILTERS.items():
+        app.add_template_filter(fn, name)
+    return app
+
+
+def main() -> None:
+    app = _build_app()
+    install(app)
+    if app.jinja_env.bytecode_cache is None:
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    timings = precompile(app)
+    total = time.perf_counter() - t0
+
+    for name, seconds in timings:
+        print(f"  {name:<34} {seconds * 1000:7.1f} ms")
+    print(f"✓ {len(timings)} templates forkompileret til {TEMPLATE_CACHE_DIR} ({total * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
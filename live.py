@@ -0,0 +1,222 @@
+import json
+import os
+import queue
+import threading
+import time
+from datetime import date
+
+import applog
+import database
+import metrics
+
+# Live-opdateringer til admin (Server-Sent Events).
+#
+# Dashboard og bemandingsoverblik åbner en EventSource mod /admin/live i stedet
+# for at genindlæse hele siden. Én baggrundstråd pr. worker læser ændringsloggen
+# (database.changes_since) hvert POLL_INTERVAL sekund og genberegner kun det de
+# nye ændringer berører – bemanding for de vagter der er ændret, og pending-antal
+# hvis en tilmelding er ændret – én gang for alle forbundne admins. Forskellen
+# sendes ud:
+#
+#   event: snapshot  hele tilstanden, når en klient forbinder
+#   event: delta     {"seq", "pending"?, "shifts": {id: {...}}, "removed": [id]}
+#
+# Vagterne i en delta har absolutte tal (ikke +1/-1), så en delta kan roligt
+# anvendes to gange, fx lige efter et snapshot. Ved dagsskifte, reset fra
+# compact_changes() eller mange ændringer på én gang beregnes alt forfra.
+#
+# Kapacitet: gunicorn kører med gthread-workers, og hver åben stream optager en
+# af workerens tråde så længe den er åben. Med 2 workers × 4 tråde og
+# MAX_SUBSCRIBERS = 1 bruger live-opdateringerne derfor højst 2 af 8 tråde –
+# resten er altid frie til almindelige requests. Flere admin-faner end det får
+# 503 (Retry-After), og admin_live.js prøver selv igen med stigende ventetid,
+# indtil en plads er ledig. En stream lukkes efter MAX_STREAM_SECONDS, så en
+# glemt fane ikke holder pladsen; browseren forbinder igen og får et nyt snapshot.
+# Hæv kun MAX_SUBSCRIBERS sammen med antallet af tråde (--threads).
+
+POLL_INTERVAL = float(os.environ.get("LIVE_POLL_INTERVAL", "1"))
+HEARTBEAT_SECONDS = float(os.environ.get("LIVE_HEARTBEAT_SECONDS", "15"))
+MAX_STREAM_SECONDS = float(os.environ.get("LIVE_MAX_STREAM_SECONDS", "60"))
+MAX_SUBSCRIBERS = int(os.environ.get("LIVE_MAX_SUBSCRIBERS", "1"))
+# Klientens ventetid før genforbindelse (ms), sendes som SSE "retry:"
+RECONNECT_MS = 3000
+# Flere ændringer end dette i ét poll: beregn alt forfra i stedet for vagt for vagt
+INCREMENTAL_MAX = 200
+
+log = applog.get_logger("live")
+
+metrics.describe("myggens_live_events_total", "counter", "Sendte SSE-events til admin (type=snapshot/delta).")
+metrics.describe("myggens_live_refreshes_total", "counter", "Genberegninger af live-tilstanden (kind=full/incremental).")
+
+
+def _compute_state() -> dict:
+    today = date.today().isoformat()
+    return {
+        # seq læses først: ændringer der kommer imens, bliver anvendt (igen) næste gang
+        "seq": database.get_latest_change_seq(),
+        "today": today,
+        "pending": database.get_pending_admin_actions(),
+        "shifts": database.get_live_staffing(today),
+    }
+
+
+def _apply_changes(state: dict, page: dict) -> dict:
+    """Ny tilstand ud fra `state` og en side fra changes_since – kun berørte vagter hentes."""
+    changes = page["changes"]
+    shift_ids = {c["shift_id"] for c in changes if c["entity"] in ("shifts", "signups") and c["shift_id"] is not None}
+
+    pending = state["pending"]
+    if any(c["entity"] == "signups" for c in changes):
+        pending = database.get_pending_admin_actions()
+
+    shifts = dict(state["shifts"])
+    if shift_ids:
+        fresh = database.get_live_staffing(state["today"], shift_ids)
+        for shift_id in shift_ids:
+            if shift_id in fresh:
+                shifts[shift_id] = fresh[shift_id]
+            else:
+                shifts.pop(shift_id, None)  # slettet, arkiveret eller flyttet bagud
+    return {"seq": page["last_seq"], "today": state["today"], "pending": pending, "shifts": shifts}
+
+
+def diff(old: dict, new: dict) -> dict | None:
+    """Delta fra `old` til `new`, eller None hvis intet synligt har ændret sig."""
+    delta = {"seq": new["seq"]}
+    if new["pending"] != old["pending"]:
+        delta["pending"] = new["pending"]
+    changed = {
+        shift_id: staffing
+        for shift_id, staffing in new["shifts"].items()
+        if old["shifts"].get(shift_id) != staffing
+    }
+    removed = [shift_id for shift_id in old["shifts"] if shift_id not in new["shifts"]]
+    if changed:
+        delta["shifts"] = changed
+    if removed:
+        delta["removed"] = removed
+    return delta if len(delta) > 1 else None
+
+
+def format_event(event: str, data: dict) -> str:
+    return f"event: {event}\nid: {data.get('seq', '')}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class LiveFeed:
+    """Læser ændringsloggen i én tråd pr. proces og fordeler deltaer til abonnenterne."""
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL, max_subscribers: int = MAX_SUBSCRIBERS):
+        self.poll_interval = poll_interval
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # én genberegning ad gangen
+        self._subscribers: set[queue.Queue] = set()
+        self._state: dict | None = None
+        self._thread: threading.Thread | None = None
+        self._pid = None
+
+    def subscribe(self) -> queue.Queue | None:
+        """Ny abonnent-kø, eller None hvis workeren allerede har max_subscribers."""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forket efter import (gunicorn): tråd og abonnenter hører til forælderen
+                self._subscribers = set()
+                self._thread = None
+                self._pid = os.getpid()
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            q = queue.Queue(maxsize=100)
+            self._subscribers.add(q)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="live-feed", daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, q: queue.Queue) -> None:
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def is_subscribed(self, q: queue.Queue) -> bool:
+        with self._lock:
+            return q in self._subscribers
+
+    def snapshot(self) -> dict:
+        """Aktuel tilstand (beregnes hvis den mangler eller er forældet)."""
+        self.refresh()
+        with self._lock:
+            return self._state
+
+    def refresh(self) -> dict | None:
+        """
+        Anvend nye ændringer fra ændringsloggen på tilstanden og send deltaen
+        til alle abonnenter. Returnerer deltaen (eller None).
+        """
+        with self._refresh_lock:
+            state = self._state
+            if state is None or state["today"] != date.today().isoformat():
+                new_state, kind = _compute_state(), "full"
+            else:
+                page = database.changes_since(state["seq"], limit=INCREMENTAL_MAX)
+                if not page["changes"] and not page["reset"]:
+                    return None
+                if page["reset"] or page["has_more"]:
+                    new_state, kind = _compute_state(), "full"
+                else:
+                    new_state, kind = _apply_changes(state, page), "incremental"
+
+            metrics.inc("myggens_live_refreshes_total", kind=kind)
+            with self._lock:
+                self._state = new_state
+            delta = diff(state, new_state) if state is not None else None
+            if delta is not None:
+                self._publish(delta)
+            return delta
+
+    def _publish(self, delta: dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(delta)
+            except queue.Full:
+                # Klienten læser ikke (hængt forbindelse) – streamen lukkes, og
+                # browseren får et nyt snapshot når den forbinder igen
+                self.unsubscribe(q)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            try:
+                self.refresh()
+            except Exception:
+                log.exception("Live-feed: kunne ikke hente tilstand")
+            time.sleep(self.poll_interval)
+
+    def stream(self, q: queue.Queue):
+        """SSE-tekst til én klient: snapshot, derefter deltaer og heartbeats, indtil MAX_STREAM_SECONDS."""
+        try:
+            yield f"retry: {RECONNECT_MS}\n\n"
+            yield format_event("snapshot", self.snapshot())
+            metrics.inc("myggens_live_events_total", type="snapshot")
+
+            deadline = time.monotonic() + MAX_STREAM_SECONDS
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.is_subscribed(q):
+                    return
+                try:
+                    delta = q.get(timeout=min(HEARTBEAT_SECONDS, remaining))
+                except queue.Empty:
+                    yield ": ping\n\n"  # holder proxyer fra at lukke forbindelsen
+                    continue
+                yield format_event("delta", delta)
+                metrics.inc("myggens_live_events_total", type="delta")
+        finally:
+            self.unsubscribe(q)
+
+
+# Fælles feed for processen
+feed = LiveFeed()
@@ -0,0 +1,269 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+# Prometheus-metrics uden ekstra afhængigheder.
+#
+# Gunicorn kører flere worker-processer, så hver proces holder sine egne
+# tællere i hukommelsen og skriver dem jævnligt til en fil pr. PID i
+# METRICS_DIR. /metrics læser alle filerne og lægger dem sammen, så tallene
+# dækker hele serveren og ikke kun den worker, der tilfældigvis svarer.
+#
+# En worker sletter sin fil når den stopper (atexit). Filer fra workers der er
+# døde uden at rydde op (kill -9, tidligere container på samme volume) springes
+# over og slettes ved næste scrape: processen findes ikke, eller filen er ældre
+# end processen med samme PID. Ellers ville totalerne vokse ved hver genstart.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Hvor ofte (sekunder) en worker højst skriver sin snapshot-fil efter et request
+FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "2"))
+
+
+def _resolve_metrics_dir() -> str:
+    env = os.environ.get("METRICS_DIR", "").strip()
+    if env:
+        return env
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "metrics")
+
+
+METRICS_DIR = _resolve_metrics_dir()
+
+_lock = threading.Lock()
+_definitions = {}   # name -> (type, help, buckets)
+_counters = {}      # (name, labels) -> float
+_histograms = {}    # (name, labels) -> [bucket_counts..., sum, count]
+_gauge_collectors = []
+_last_flush = 0.0
+_cleanup_pid = None  # PID som atexit-oprydningen er registreret for
+
+
+def describe(name: str, kind: str, help_text: str, buckets=DEFAULT_BUCKETS) -> None:
+    """Registrér en metric (kind: 'counter', 'histogram' eller 'gauge')."""
+    _definitions[name] = (kind, help_text, tuple(buckets))
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    key = (name, _labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, value: float, **labels) -> None:
+    buckets = _definitions.get(name, ("histogram", "", DEFAULT_BUCKETS))[2]
+    key = (name, _labels_key(labels))
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = [0] * (len(buckets) + 2)
+            _histograms[key] = h
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                h[i] += 1
+        h[-2] += value
+        h[-1] += 1
+
+
+def register_gauge_collector(fn) -> None:
+    """
+    fn() skal returnere en liste af (name, labels_dict, value).
+    Gauges beregnes ved scrape (fx fra databasen) og summeres ikke på tværs af workers.
+    """
+    _gauge_collectors.append(fn)
+
+
+# ============================
+# Snapshot-filer pr. worker
+# ============================
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"worker-{pid}.json")
+
+
+def _remove_snapshot(pid: int) -> None:
+    # Kun i den proces der ejer filen (atexit arves ved fork)
+    if pid != os.getpid():
+        return
+    try:
+        os.remove(_snapshot_path(pid))
+    except OSError:
+        pass
+
+
+def _process_started_at(pid: int) -> float | None:
+    """Starttidspunkt (epoch) for pid via /proc, None hvis det ikke kan læses (fx ikke Linux)."""
+    try:
+        with open(f"/proc/{pid}/stat", encoding="ascii") as f:
+            # Felt 22 (starttime, clock ticks efter boot) – efter "(comm)", som kan indeholde mellemrum
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat", encoding="ascii") as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith("btime "))
+        return boot_time + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return None
+
+
+def _snapshot_is_live(pid: int, mtime: float) -> bool:
+    """Hører snapshot-filen til en kørende proces (og ikke en tidligere med samme PID)?"""
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # fx PermissionError: processen findes
+    started = _process_started_at(pid)
+    # 1 sekunds slør: starttime har kun clock tick-opløsning
+    return started is None or mtime >= started - 1
+
+
+def flush(force: bool = False) -> None:
+    """Skriv denne process' tællere til dens snapshot-fil (højst hvert FLUSH_INTERVAL sekund)."""
+    global _last_flush, _cleanup_pid
+    now = time.monotonic()
+    if not force and now - _last_flush < FLUSH_INTERVAL:
+        return
+
+    with _lock:
+        _last_flush = now
+        data = {
+            "counters": [[n, list(map(list, l)), v] for (n, l), v in _counters.items()],
+            "histograms": [[n, list(map(list, l)), h] for (n, l), h in _histograms.items()],
+        }
+
+    pid = os.getpid()
+    if _cleanup_pid != pid:
+        _cleanup_pid = pid
+        atexit.register(_remove_snapshot, pid)
+
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = _snapshot_path(pid)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except OSError:
+        # Metrics må aldrig vælte et request
+        pass
+
+
+def _read_all_snapshots():
+    counters = {}
+    histograms = {}
+    try:
+        names = os.listdir(METRICS_DIR)
+    except OSError:
+        names = []
+
+    for fname in names:
+        if not (fname.startswith("worker-") and fname.endswith(".json")):
+            continue
+        path = os.path.join(METRICS_DIR, fname)
+        try:
+            pid = int(fname[len("worker-"):-len(".json")])
+            if not _snapshot_is_live(pid, os.path.getmtime(path)):
+                os.remove(path)  # død worker – dens tællere skal ikke tælle med mere
+                continue
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+
+        for name, labels, value in data.get("counters", []):
+            key = (name, tuple(tuple(x) for x in labels))
+            counters[key] = counters.get(key, 0) + value
+
+        for name, labels, h in data.get("histograms", []):
+            key = (name, tuple(tuple(x) for x in labels))
+            existing = histograms.get(key)
+            if existing is None or len(existing) != len(h):
+                histograms[key] = list(h)
+            else:
+                histograms[key] = [a + b for a, b in zip(existing, h)]
+
+    return counters, histograms
+
+
+# ============================
+# Prometheus text format
+# ============================
+
+def _fmt_labels(labels, extra=None) -> str:
+    items = list(labels) + (extra or [])
+    if not items:
+        return ""
+    parts = []
+    for k, v in items:
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _fmt_value(v) -> str:
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return repr(v) if isinstance(v, float) else str(v)
+
+
+def render() -> str:
+    """Saml alle workers' tællere + aktuelle gauges i Prometheus' tekstformat."""
+    flush(force=True)
+    counters, histograms = _read_all_snapshots()
+
+    gauges = {}
+    for fn in _gauge_collectors:
+        try:
+            for name, labels, value in fn():
+                gauges[(name, _labels_key(labels))] = value
+        except Exception:
+            continue
+
+    by_name = {}
+    for (name, labels), v in counters.items():
+        by_name.setdefault(name, []).append((labels, v))
+    for (name, labels), h in histograms.items():
+        by_name.setdefault(name, []).append((labels, h))
+    for (name, labels), v in gauges.items():
+        by_name.setdefault(name, []).append((labels, v))
+
+    lines = []
+    for name in sorted(by_name):
+        kind, help_text, buckets = _definitions.get(name, ("untyped", "", DEFAULT_BUCKETS))
+        if help_text:
+            lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+        for labels, value in sorted(by_name[name]):
+            if kind == "histogram":
+                # observe() tæller allerede kumulativt pr. bucket
+                for bound, count in zip(buckets, value[:len(buckets)]):
+                    lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', '+Inf')])} {_fmt_value(value[-1])}")
+                lines.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_value(value[-2])}")
+                lines.append(f"{name}_count{_fmt_labels(labels)} {_fmt_value(value[-1])}")
+            else:
+                lines.append(f"{name}{_fmt_labels(labels)} {_fmt_value(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+# ============================
+# Standard-metrics
+# ============================
+
+describe("myggens_http_requests_total", "counter", "Antal HTTP-requests pr. endpoint, metode og status.")
+describe("myggens_http_request_duration_seconds", "histogram", "Svartid pr. endpoint.")
+describe("myggens_db_connections_total", "counter", "Åbnede SQLite-forbindelser.")
+describe("myggens_db_queries_total", "counter", "Udførte SQL-statements (read/write).")
+describe("myggens_db_query_duration_seconds", "histogram", "Tid pr. SQL-statement inkl. ventetid på låse.")
+describe("myggens_db_transactions_total", "counter", "Gennemførte commits.")
+describe("myggens_db_commit_duration_seconds", "histogram", "Tid pr. commit (låseventetid ved skrivning).")
+describe("myggens_db_busy_errors_total", "counter", "'database is locked'/'busy' fejl efter busy-timeout.")
@@ -87,6 +87,17 @@ def main():
 
     conn.commit()
 
+    import database
+
+    # Afledte dato-/tidskolonner (generated columns) – også på extra_shifts
+    database._ensure_generated_columns(conn)
+    print("✓ Generated columns sikret")
+
+    # Ændringslog (changes) – også for extra_shifts, som bruger date_year/date_month.
+    # Fjerner samtidig de gamle data_version/month_versions/shift_versions/cache_invalidations
+    database._ensure_changes(conn)
+    print("✓ changes-triggers sikret")
+
     print("\nAktuelle kolonner i signups:")
     cur.execute("PRAGMA table_info(signups)")
     for row in cur.fetchall():
@@ -0,0 +1,139 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from datetime import datetime
+
+# On-demand profilering af enkelte requests (admin: ?_profile=1).
+#
+# Der kan kun køre én cProfile ad gangen i processen, så vi bruger en lås.
+# Er den optaget, bliver requestet bare kørt uden profilering.
+
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "50"))
+
+
+def _resolve_profile_dir() -> str:
+    env = os.environ.get("PROFILE_DIR", "").strip()
+    if env:
+        return env
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "profiles")
+
+
+PROFILE_DIR = _resolve_profile_dir()
+
+_profiler_lock = threading.Lock()
+
+
+def start():
+    """Start en profiler for det aktuelle request. Returnerer None hvis en anden kører."""
+    if not _profiler_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Et andet værktøj (fx en debugger) bruger allerede profiler-hooket
+        _profiler_lock.release()
+        return None
+    return {"profiler": profiler, "started": time.perf_counter()}
+
+
+def _category(filename: str, funcname: str) -> str:
+    if filename.endswith("database.py") or "sqlite3" in funcname:
+        return "database"
+    if "jinja2" in filename or "markupsafe" in filename or os.sep + "templates" + os.sep in filename:
+        return "templates"
+    if filename.endswith("app.py"):
+        return "view"
+    return "framework"
+
+
+def _split_by_category(stats: pstats.Stats) -> dict:
+    """Fordel 'own time' (tottime) på database / templates / view / framework."""
+    split = {"database": 0.0, "templates": 0.0, "view": 0.0, "framework": 0.0}
+    for (filename, _lineno, funcname), (_cc, _nc, tottime, _ct, _callers) in stats.stats.items():
+        split[_category(filename, funcname)] += tottime
+    return split
+
+
+def stop(handle, method: str, path: str, status: int):
+    """Stop profileren og gem .prof + tekstrapport. Returnerer profil-id."""
+    profiler = handle["profiler"]
+    try:
+        profiler.disable()
+    finally:
+        _profiler_lock.release()
+
+    wall = time.perf_counter() - handle["started"]
+    stats = pstats.Stats(profiler)
+    split = _split_by_category(stats)
+
+    profile_id = datetime.now().strftime("%Y%m%d-%H%M%S-%f") + f"-{os.getpid()}"
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stats.dump_stats(os.path.join(PROFILE_DIR, profile_id + ".prof"))
+
+    out = io.StringIO()
+    out.write(f"{method} {path} -> {status}\n")
+    out.write(f"Wall time: {wall * 1000:.1f} ms\n\n")
+    out.write("Tid fordelt (egen tid i funktioner):\n")
+    for name, seconds in sorted(split.items(), key=lambda kv: kv[1], reverse=True):
+        out.write(f"  {name:<10} {seconds * 1000:8.1f} ms\n")
+    out.write("\n")
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(40)
+
+    with open(os.path.join(PROFILE_DIR, profile_id + ".txt"), "w", encoding="utf-8") as f:
+        f.write(out.getvalue())
+
+    _prune()
+    return profile_id
+
+
+def discard(handle) -> None:
+    """Stop profileren uden at gemme noget (fx hvis viewet kastede en exception)."""
+    try:
+        handle["profiler"].disable()
+    finally:
+        _profiler_lock.release()
+
+
+def _prune():
+    """Behold kun de nyeste PROFILE_KEEP profiler."""
+    ids = list_profiles()
+    for old in ids[PROFILE_KEEP:]:
+        for ext in (".prof", ".txt"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, old["id"] + ext))
+            except OSError:
+                pass
+
+
+def list_profiles():
+    """Nyeste først: [{id, summary}] hvor summary er første linje af rapporten."""
+    try:
+        names = os.listdir(PROFILE_DIR)
+    except OSError:
+        return []
+
+    result = []
+    for fname in sorted((n for n in names if n.endswith(".txt")), reverse=True):
+        profile_id = fname[:-4]
+        try:
+            with open(os.path.join(PROFILE_DIR, fname), encoding="utf-8") as f:
+                summary = f.readline().strip()
+                wall = f.readline().strip()
+        except OSError:
+            continue
+        result.append({"id": profile_id, "summary": summary, "wall": wall})
+    return result
+
+
+def profile_path(profile_id: str, ext: str) -> str | None:
+    """Sti til en gemt profil, eller None hvis id'et er ugyldigt/ukendt."""
+    if ext not in (".prof", ".txt"):
+        return None
+    if not profile_id or "/" in profile_id or "\\" in profile_id or profile_id.startswith("."):
+        return None
+    path = os.path.join(PROFILE_DIR, profile_id + ext)
+    return path if os.path.exists(path) else None
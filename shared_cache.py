@@ -0,0 +1,337 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+import applog
+import metrics
+
+# Fælles cache for alle gunicorn-workers på maskinen.
+#
+# fragments.py holder en cache pr. proces, så med 2+ workers renderes det samme
+# to gange, og en eksplicit invalidering rammer kun den worker der udfører den.
+# Her ligger cachen i en separat SQLite-fil (WAL, så læsninger ikke blokeres af
+# skrivninger) som alle workers åbner – ingen Redis eller anden server.
+#
+#   - hver post har en TTL og et sæt tags, fx shift:12, person:7, month:2025-03
+#   - cache.invalidate("shift:12") sletter alle poster med tagget, for alle workers,
+#     og giver tagget en ny generation. get_or_set() husker generationen før den
+#     beregner, og gemmer ikke resultatet hvis et af dets tags er invalideret
+#     imens – ellers kunne en værdi læst før skrivningen ligge i cachen i hele TTL'en
+#   - app.py læser ændringsloggen i hoveddatabasen (database.changes_since) før
+#     hvert request og efter hver skrivning og invaliderer de berørte tags – så
+#     også skrivninger fra scripts og fejlede requests kommer med. Hvor langt
+#     loggen er anvendt, gemmes som en tæller i cachen selv (get_counter/set_counter)
+#   - størrelsen holdes under MAX_BYTES: udløbne poster ryddes først, derefter
+#     dem der udløber først
+#   - hits/misses/evictions tælles via metrics.py (summeret over workers i /metrics)
+#
+# Cachen må aldrig vælte et request: fejl i cache-databasen (også OSError, fx når
+# dens mappe ikke kan oprettes) logges og behandles som et miss.
+
+
+def _resolve_cache_path() -> str:
+    env = os.environ.get("SHARED_CACHE_PATH", "").strip()
+    if env:
+        return env
+    # Ved siden af hoveddatabasen (samme volume i deployment)
+    db_path = os.environ.get("DB_PATH", "").strip()
+    if db_path:
+        return os.path.join(os.path.dirname(db_path) or ".", "cache.sqlite3")
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cache.sqlite3")
+
+
+CACHE_PATH = _resolve_cache_path()
+DEFAULT_TTL = int(os.environ.get("SHARED_CACHE_TTL", "300"))
+MAX_BYTES = int(os.environ.get("SHARED_CACHE_BYTES", str(64 * 1024 * 1024)))
+# Oprydning (udløbne poster + størrelsesgrænse) efter hver N'te skrivning i processen
+PRUNE_EVERY = int(os.environ.get("SHARED_CACHE_PRUNE_EVERY", "100"))
+# Tag-generationer glemmes efter så mange sekunder (længere end nogen beregning tager)
+TAG_GENERATION_SECONDS = 3600
+
+log = applog.get_logger("shared_cache")
+
+metrics.describe("myggens_shared_cache_requests_total", "counter", "Opslag i den fælles cache (result=hit/miss).")
+metrics.describe("myggens_shared_cache_evictions_total", "counter", "Poster fjernet fra den fælles cache (reason=expired/size).")
+metrics.describe("myggens_shared_cache_invalidations_total", "counter", "Poster slettet via tag-invalidering.")
+metrics.describe("myggens_shared_cache_errors_total", "counter", "Fejl mod cache-databasen (behandlet som miss).")
+metrics.describe("myggens_shared_cache_stale_sets_total", "counter", "Beregnede værdier ikke gemt, fordi et tag blev invalideret under beregningen.")
+
+
+def _init_schema(conn: sqlite3.Connection) -> None:
+    conn.executescript(
+        """
+        PRAGMA journal_mode = WAL;
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            value BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_entries_expires_at ON entries(expires_at);
+        CREATE TABLE IF NOT EXISTS entry_tags (
+            tag TEXT NOT NULL,
+            key TEXT NOT NULL,
+            PRIMARY KEY (tag, key)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_entry_tags_key ON entry_tags(key);
+        CREATE TABLE IF NOT EXISTS tag_generations (
+            tag TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL,
+            invalidated_at REAL NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_tag_generations_at ON tag_generations(invalidated_at);
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        CREATE TRIGGER IF NOT EXISTS trg_entries_delete_tags
+        AFTER DELETE ON entries
+        BEGIN
+            DELETE FROM entry_tags WHERE key = OLD.key;
+        END;
+        """
+    )
+
+
+class SharedCache:
+    """Tag-invaliderbar TTL-cache i en SQLite-fil, delt mellem processer. Værdier pickles."""
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = MAX_BYTES, default_ttl: int = DEFAULT_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "stale_sets": 0, "errors": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        # Én forbindelse pr. tråd og pr. proces (gunicorn forker efter import)
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA synchronous = NORMAL")  # en cache kan tåle at miste sidste commit
+        _init_schema(conn)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, stat: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[stat] += n
+
+    def _failed(self, action: str, key=None) -> None:
+        self._count("errors")
+        metrics.inc("myggens_shared_cache_errors_total", action=action)
+        log.warning("Fejl i fælles cache", exc_info=True, extra={"action": action, "key": key})
+
+    def get(self, key: str):
+        """Værdien for `key`, eller None ved miss/udløbet post."""
+        try:
+            row = self._connection().execute(
+                "SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+            value = pickle.loads(row[0]) if row is not None else None
+        except Exception:  # også unpickling af en post fra en ældre version af koden
+            self._failed("get", key)
+            value = None
+
+        if value is None:
+            self._count("misses")
+            metrics.inc("myggens_shared_cache_requests_total", result="miss")
+        else:
+            self._count("hits")
+            metrics.inc("myggens_shared_cache_requests_total", result="hit")
+        return value
+
+    def generation(self) -> int | None:
+        """Aktuel invaliderings-generation (til set(..., since=...)), None ved fejl."""
+        try:
+            row = self._connection().execute("SELECT value FROM counters WHERE name = 'generation'").fetchone()
+        except (sqlite3.Error, OSError):
+            self._failed("generation")
+            return None
+        return row[0] if row else 0
+
+    def set(self, key: str, value, ttl: int | None = None, tags=(), since: int | None = None) -> None:
+        """
+        Gem `value` under `key` i `ttl` sekunder (default DEFAULT_TTL) med de givne tags.
+        Med `since` (en generation() fra før værdien blev beregnet) gemmes intet,
+        hvis et af tags er invalideret siden – værdien kan da være forældet.
+        """
+        tags = list(tags)
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                if since is not None and tags:
+                    placeholders = ",".join("?" * len(tags))
+                    stale = conn.execute(
+                        f"SELECT 1 FROM tag_generations WHERE tag IN ({placeholders}) AND generation > ? LIMIT 1",
+                        (*tags, since),
+                    ).fetchone()
+                    if stale is not None:
+                        self._count("stale_sets")
+                        metrics.inc("myggens_shared_cache_stale_sets_total")
+                        return
+                conn.execute("DELETE FROM entry_tags WHERE key = ?", (key,))
+                conn.execute(
+                    """
+                    INSERT INTO entries (key, value, size, expires_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        value = excluded.value, size = excluded.size, expires_at = excluded.expires_at
+                    """,
+                    (key, data, len(data), expires_at),
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO entry_tags (tag, key) VALUES (?, ?)",
+                    [(tag, key) for tag in tags],
+                )
+        except (sqlite3.Error, OSError):
+            self._failed("set", key)
+            return
+
+        with self._lock:
+            self._writes += 1
+            due = self._writes % PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    def get_or_set(self, key: str, compute, ttl: int | None = None, tags=()):
+        """
+        Cachet værdi for `key`, ellers compute() som gemmes med ttl/tags.
+        `tags` kan også være en funktion af værdien (fx vagterne i en liste).
+        """
+        value = self.get(key)
+        if value is None:
+            since = self.generation()
+            value = compute()
+            if value is not None:
+                self.set(key, value, ttl=ttl, tags=tags(value) if callable(tags) else tags, since=since)
+        return value
+
+    def delete(self, key: str) -> None:
+        try:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        except (sqlite3.Error, OSError):
+            self._failed("delete", key)
+
+    def invalidate(self, *tags: str) -> int:
+        """
+        Slet alle poster med mindst ét af de givne tags, og giv tags en ny
+        generation (se set). Returnerer antal slettede.
+        """
+        if not tags:
+            return 0
+        placeholders = ",".join("?" * len(tags))
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(
+                    "INSERT INTO counters (name, value) VALUES ('generation', 1) "
+                    "ON CONFLICT(name) DO UPDATE SET value = value + 1"
+                )
+                generation = conn.execute("SELECT value FROM counters WHERE name = 'generation'").fetchone()[0]
+                now = time.time()
+                conn.executemany(
+                    "INSERT INTO tag_generations (tag, generation, invalidated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(tag) DO UPDATE SET generation = excluded.generation, "
+                    "invalidated_at = excluded.invalidated_at",
+                    [(tag, generation, now) for tag in tags],
+                )
+                deleted = conn.execute(
+                    f"DELETE FROM entries WHERE key IN (SELECT key FROM entry_tags WHERE tag IN ({placeholders}))",
+                    tags,
+                ).rowcount
+        except (sqlite3.Error, OSError):
+            self._failed("invalidate")
+            return 0
+        if deleted:
+            self._count("invalidations", deleted)
+            metrics.inc("myggens_shared_cache_invalidations_total", deleted)
+        return deleted
+
+    def prune(self) -> None:
+        """Fjern udløbne poster, og derefter dem der udløber først, til cachen er under max_bytes."""
+        try:
+            with self._connection() as conn:
+                expired = conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),)).rowcount
+                conn.execute(
+                    "DELETE FROM tag_generations WHERE invalidated_at < ?", (time.time() - TAG_GENERATION_SECONDS,)
+                )
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                evicted = 0
+                if total > self.max_bytes:
+                    # Løbende sum i udløbsrækkefølge: slet poster indtil der er frigjort nok
+                    evicted = conn.execute(
+                        """
+                        DELETE FROM entries WHERE key IN (
+                            SELECT key FROM (
+                                SELECT key, size, SUM(size) OVER (ORDER BY expires_at, key) AS freed
+                                FROM entries
+                            )
+                            WHERE freed - size < ?
+                        )
+                        """,
+                        (total - self.max_bytes,),
+                    ).rowcount
+        except (sqlite3.Error, OSError):
+            self._failed("prune")
+            return
+        for reason, n in (("expired", expired), ("size", evicted)):
+            if n:
+                self._count("evictions", n)
+                metrics.inc("myggens_shared_cache_evictions_total", n, reason=reason)
+
+    def clear(self) -> None:
+        try:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM entries")
+        except (sqlite3.Error, OSError):
+            self._failed("clear")
+
+    def get_counter(self, name: str) -> int | None:
+        """Heltal gemt under `name` (fx position i ændringsloggen), None hvis ukendt."""
+        try:
+            row = self._connection().execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        except (sqlite3.Error, OSError):
+            self._failed("get_counter", name)
+            return None
+        return row[0] if row else None
+
+    def set_counter(self, name: str, value: int) -> None:
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT INTO counters (name, value) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+                    (name, value),
+                )
+        except (sqlite3.Error, OSError):
+            self._failed("set_counter", name)
+
+    def stats(self) -> dict:
+        """Antal poster/bytes i cachen (fælles for alle workers) + denne process' tællere."""
+        try:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        except (sqlite3.Error, OSError):
+            self._failed("stats")
+            entries = size = 0
+        with self._lock:
+            return {"entries": entries, "bytes": size, "max_bytes": self.max_bytes, **self._stats}
+
+
+# Fælles cache for alle workers
+cache = SharedCache()
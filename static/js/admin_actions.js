@@ -0,0 +1,16 @@
+// Admin: filter i indbakken
+
+(function(){
+  const input = document.getElementById("actionFilter");
+  const table = document.getElementById("actionTable");
+  if (!input || !table) return;
+
+  const rows = Array.from(table.querySelectorAll("tbody tr"));
+  input.addEventListener("input", () => {
+    const q = input.value.toLowerCase().trim();
+    rows.forEach(r => {
+      const txt = r.innerText.toLowerCase();
+      r.style.display = txt.includes(q) ? "" : "none";
+    });
+  });
+})();
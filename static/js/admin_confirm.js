@@ -0,0 +1,11 @@
+// Admin: bekræftelse før en formular sendes – teksten ligger i data-confirm,
+// så navne fra kartoteket aldrig bliver en del af inline JavaScript
+
+(function(){
+  document.addEventListener("submit", e => {
+    const form = e.target.closest("form[data-confirm]");
+    if (form && !window.confirm(form.dataset.confirm)) {
+      e.preventDefault();
+    }
+  });
+})();
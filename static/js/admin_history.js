@@ -0,0 +1,27 @@
+// Admin: historik – en måneds arrangementer hentes først når måneden foldes ud
+
+(function(){
+  const months = document.querySelectorAll("details.history-month[data-src]");
+
+  function load(month){
+    if (month.dataset.loaded) return;
+    month.dataset.loaded = "1";
+    const body = month.querySelector(".month-body");
+
+    fetch(month.dataset.src, { credentials: "same-origin" })
+      .then(r => {
+        if (!r.ok) throw new Error("HTTP " + r.status);
+        return r.text();
+      })
+      .then(html => { body.innerHTML = html; })
+      .catch(() => {
+        delete month.dataset.loaded;
+        body.innerHTML = '<p class="helper-text">Kunne ikke hente måneden – fold den sammen og ud igen.</p>';
+      });
+  }
+
+  months.forEach(month => {
+    month.addEventListener("toggle", () => { if (month.open) load(month); });
+    if (month.open) load(month);
+  });
+})();
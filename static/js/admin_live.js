@@ -0,0 +1,129 @@
+// Admin: dashboard og bemanding opdateres live via Server-Sent Events (/admin/live)
+//
+// Serveren sender et snapshot ved (gen)forbindelse og derefter deltaer med
+// pending-antal og bemanding pr. vagt (absolutte tal) – se live.py.
+
+(function(){
+  const script = document.currentScript;
+  if (!window.EventSource || !script || !script.dataset.src) return;
+
+  const rows = new Map();
+  document.querySelectorAll("tr[data-shift-id]").forEach(tr => rows.set(tr.dataset.shiftId, tr));
+  const stale = document.querySelector("[data-live-stale]");
+  const last = new Map();  // vagt-id -> seneste tal (JSON) fra serveren
+  let synced = false;  // sat efter første snapshot
+
+  function setText(root, name, value){
+    root.querySelectorAll(`[data-live="${name}"]`).forEach(el => { el.textContent = value; });
+  }
+
+  function pill(kind, text){
+    const span = document.createElement("span");
+    span.className = "pill " + kind;
+    span.textContent = text;
+    return span;
+  }
+
+  function applyPending(p){
+    ["pending_total", "pending_signups", "pending_releases"].forEach(name => setText(document, name, p[name]));
+    document.querySelectorAll("[data-live-when]").forEach(el => {
+      el.hidden = (el.dataset.liveWhen === "pending") !== (p.pending_total > 0);
+    });
+  }
+
+  function applyShift(tr, s, highlight){
+    setText(tr, "needed", s.needed);
+    setText(tr, "approved", s.approved);
+
+    // Dashboard: afventer-pill + farvelogik (row_class beregnes på serveren)
+    tr.querySelectorAll('[data-live="pending-pill"]').forEach(el => {
+      el.replaceChildren(pill(s.pending > 0 ? "warn" : "ok", String(s.pending)));
+    });
+    if (tr.dataset.rowClass !== undefined && tr.dataset.rowClass !== s.row_class){
+      if (tr.dataset.rowClass) tr.classList.remove(tr.dataset.rowClass);
+      if (s.row_class) tr.classList.add(s.row_class);
+      tr.dataset.rowClass = s.row_class;
+    }
+
+    // Bemanding: godkendte- og mangler-pills (samme tekster som admin_overview_row.html)
+    tr.querySelectorAll('[data-live="approved-pill"]').forEach(el => {
+      const p = s.approved >= s.needed ? pill("ok", "✅ " + s.approved)
+        : s.approved > 0 ? pill("warn", "⚠️ " + s.approved)
+        : pill("bad", "⛔ 0");
+      el.replaceChildren(p);
+    });
+    const remaining = s.needed - s.approved;
+    tr.querySelectorAll('[data-live="remaining-pill"]').forEach(el => {
+      el.replaceChildren(remaining > 0 ? pill("warn", "Mangler " + remaining) : pill("ok", "Dækket"));
+    });
+
+    if (highlight){
+      tr.classList.remove("live-changed");
+      void tr.offsetWidth;  // genstart animationen
+      tr.classList.add("live-changed");
+    }
+  }
+
+  function markStale(){
+    if (stale) stale.hidden = false;
+  }
+
+  function applyShifts(shifts, removed){
+    const first = !synced;  // første snapshot: siden er lige renderet, synk uden markering
+    let changedRows = false;
+    let newShifts = false;
+    Object.entries(shifts || {}).forEach(([id, s]) => {
+      const key = JSON.stringify(s);
+      const prev = last.get(id);
+      last.set(id, key);
+      if (prev === key) return;
+
+      const tr = rows.get(id);
+      if (tr){
+        applyShift(tr, s, !first);
+        if (!first) changedRows = true;
+      } else if (!first && prev === undefined){
+        newShifts = true;
+      }
+    });
+    (removed || []).forEach(id => {
+      last.delete(String(id));
+      if (rows.has(String(id))) newShifts = true;
+    });
+
+    if (!stale) return;
+    if (newShifts || (changedRows && stale.dataset.liveStale === "signups")) markStale();
+  }
+
+  let retryDelay = 5000;
+
+  function connect(){
+    const source = new EventSource(script.dataset.src);
+
+    source.addEventListener("snapshot", e => {
+      retryDelay = 5000;
+      const data = JSON.parse(e.data);
+      applyPending(data.pending);
+      // Vagter der ikke længere er med, er fjernet mens forbindelsen var nede
+      const removed = synced ? [...last.keys()].filter(id => !(id in data.shifts)) : [];
+      applyShifts(data.shifts, removed);
+      synced = true;
+    });
+
+    source.addEventListener("delta", e => {
+      const data = JSON.parse(e.data);
+      if (data.pending) applyPending(data.pending);
+      applyShifts(data.shifts, data.removed);
+    });
+
+    // Fejlsvar (fx 503 ved for mange forbindelser) lukker EventSource for altid – prøv selv igen
+    source.addEventListener("error", () => {
+      if (source.readyState === EventSource.CLOSED){
+        setTimeout(connect, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, 60000);
+      }
+    });
+  }
+
+  connect();
+})();
@@ -0,0 +1,83 @@
+// Admin: vagt-detaljer (personvælger + scroll-fix)
+
+/*
+  Typeahead: henter max 10 matches ad gangen i stedet for hele personkartoteket.
+  Datalist-option value = "Navn (telefon)", og vi slår id'et op når der vælges.
+*/
+document.addEventListener("DOMContentLoaded", function () {
+  const input = document.getElementById("person_search");
+  const list = document.getElementById("person_results");
+  const hidden = document.getElementById("person_id");
+  const hint = document.getElementById("person_hint");
+  if (!input || !list || !hidden) return;
+
+  const url = input.getAttribute("data-search-url");
+  let byLabel = {};
+  let timer = null;
+  let seq = 0;
+
+  function label(p) { return p.name + " (" + p.phone + ")"; }
+
+  function pick() {
+    const p = byLabel[input.value];
+    hidden.value = p ? String(p.id) : "";
+    if (hint) hint.textContent = p ? ("Valgt: " + p.name) : "Vælg en person fra listen.";
+  }
+
+  input.addEventListener("input", function () {
+    pick();
+    const q = input.value.trim();
+    clearTimeout(timer);
+    if (q.length < 2 || byLabel[input.value]) return;
+
+    timer = setTimeout(function () {
+      const mySeq = ++seq;
+      fetch(url + "?q=" + encodeURIComponent(q))
+        .then(r => r.json())
+        .then(data => {
+          if (mySeq !== seq || !data || !Array.isArray(data.persons)) return;
+          byLabel = {};
+          list.innerHTML = "";
+          data.persons.forEach(p => {
+            byLabel[label(p)] = p;
+            const opt = document.createElement("option");
+            opt.value = label(p);
+            list.appendChild(opt);
+          });
+          pick();
+        })
+        .catch(() => {});
+    }, 150);
+  });
+
+  input.form.addEventListener("submit", function (e) {
+    if (!hidden.value) {
+      e.preventDefault();
+      if (hint) hint.textContent = "Vælg en person fra listen før du tilføjer.";
+    }
+  });
+});
+
+/*
+  Scroll-fix:
+  Admin "hopper" til toppen efter POST fordi siden reloades.
+  Vi gemmer scrollY ved submit og gendanner efter reload.
+*/
+document.addEventListener("DOMContentLoaded", function () {
+  const KEY = "admin_shift_scrollY";
+
+  try {
+    const y = sessionStorage.getItem(KEY);
+    if (y !== null) {
+      sessionStorage.removeItem(KEY);
+      const yy = parseInt(y, 10);
+      if (!Number.isNaN(yy)) window.scrollTo(0, yy);
+    }
+  } catch (e) {}
+
+  document.querySelectorAll("form").forEach(form => {
+    form.addEventListener("submit", () => {
+      try { sessionStorage.setItem(KEY, String(window.scrollY || 0)); } catch (e) {}
+    });
+  });
+});
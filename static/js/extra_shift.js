@@ -0,0 +1,13 @@
+// Ekstravagt: udfyld navn/telefon fra "husk mig"
+
+document.addEventListener("DOMContentLoaded", function () {
+  const nameInput = document.getElementById("name");
+  const phoneInput = document.getElementById("phone");
+
+  try {
+    const savedName = localStorage.getItem("myggen_name");
+    const savedPhone = localStorage.getItem("myggen_phone");
+    if (savedName) nameInput.value = savedName;
+    if (savedPhone) phoneInput.value = savedPhone;
+  } catch (e) {}
+});
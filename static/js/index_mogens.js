@@ -0,0 +1,82 @@
+// Mogens-oversigt: filter + tilmeldingsstatus
+
+(function(){
+  // simple filter
+  const input = document.getElementById("mogensFilter");
+  const table = document.getElementById("mogensTable");
+  if (input && table) {
+    const rows = Array.from(table.querySelectorAll("tbody tr"));
+    input.addEventListener("input", () => {
+      const q = input.value.toLowerCase().trim();
+      rows.forEach(r => {
+        const txt = r.innerText.toLowerCase();
+        r.style.display = txt.includes(q) ? "" : "none";
+      });
+    });
+  }
+
+  // same signup-status logic as cards
+  let phone = null;
+  try { phone = localStorage.getItem("myggen_phone"); } catch (e) {}
+  if (!phone) return;
+
+  fetch("/api/signups-for-phone?phone=" + encodeURIComponent(phone))
+    .then(r => r.json())
+    .then(data => {
+      if (!data || !Array.isArray(data.signups)) return;
+
+      const byShift = {};
+      data.signups.forEach(s => {
+        byShift[String(s.shift_id)] = { status: s.status, signup_id: s.signup_id };
+      });
+
+      document.querySelectorAll("[data-shift-id]").forEach(row => {
+        const shiftId = row.getAttribute("data-shift-id");
+        const entry = byShift[String(shiftId)];
+        if (!entry) return;
+
+        const status = entry.status;
+        const signupId = entry.signup_id;
+
+        const statusCell = row.querySelector(".status-cell");
+        const actionCell = row.querySelector(".action-cell");
+        const cancelSlot = row.querySelector(".cancel-slot");
+        const cancelBase = row.getAttribute("data-cancel-base") || "";
+
+        function buildCancelUrl(base, id) {
+          if (!base) return "";
+          return base.replace(/0$/, String(id));
+        }
+
+        // hvis allerede tilmeldt: fjern "Meld dig på" (behold cancel-slot)
+        if (status === "REQUESTED" || status === "APPROVED" || status === "RELEASE_REQUESTED") {
+          if (actionCell) {
+            const forms = actionCell.querySelectorAll("form");
+            forms.forEach(f => f.remove());
+          }
+        }
+
+        if (status === "REQUESTED") {
+          if (statusCell) statusCell.textContent = "Afventer (tilmeldt)";
+          if (cancelSlot && signupId) {
+            const cancelUrl = buildCancelUrl(cancelBase, signupId);
+            cancelSlot.innerHTML = `
+              <form method="post"
+                    action="${cancelUrl}"
+                    onsubmit="return confirm('Er du sikker på at du vil fremelde dig denne vagt?');"
+                    style="margin:0;">
+                <button type="submit" class="btn btn-danger">Fremeld</button>
+              </form>
+            `;
+          }
+        } else if (status === "APPROVED") {
+          if (statusCell) statusCell.textContent = "Godkendt";
+          if (cancelSlot) cancelSlot.innerHTML = "";
+        } else if (status === "RELEASE_REQUESTED") {
+          if (statusCell) statusCell.textContent = "Fri ønsket";
+          if (cancelSlot) cancelSlot.innerHTML = "";
+        }
+      });
+    })
+    .catch(() => {});
+})();
@@ -0,0 +1,86 @@
+// Tilmelding: husk mig + tilgængelighed
+
+document.addEventListener("DOMContentLoaded", function () {
+    const nameInput = document.getElementById("name");
+    const phoneInput = document.getElementById("phone");
+    const rememberCheckbox = document.getElementById("remember");
+    const form = document.getElementById("signup-form");
+
+    const radios = document.querySelectorAll("input[name='availability_type']");
+
+    const fromSingle = document.getElementById("available_from");
+    const untilSingle = document.getElementById("available_until");
+
+    const fromRange = document.getElementById("available_from_range");
+    const untilRange = document.getElementById("available_until_range");
+
+    const fromHidden = document.getElementById("available_from_hidden");
+    const untilHidden = document.getElementById("available_until_hidden");
+
+    // Husk mig
+    try {
+        const savedName = localStorage.getItem("myggen_name");
+        const savedPhone = localStorage.getItem("myggen_phone");
+        if (savedName && nameInput) nameInput.value = savedName;
+        if (savedPhone && phoneInput) phoneInput.value = savedPhone;
+    } catch (e) {}
+
+    if (form) {
+        form.addEventListener("submit", function () {
+            // Sæt hidden fields ud fra valgt type
+            const selected = document.querySelector("input[name='availability_type']:checked");
+            const type = selected ? selected.value : "any";
+
+            let fromVal = "";
+            let untilVal = "";
+
+            if (type === "from") {
+                fromVal = fromSingle.value || "";
+            } else if (type === "until") {
+                untilVal = untilSingle.value || "";
+            } else if (type === "range") {
+                fromVal = fromRange.value || "";
+                untilVal = untilRange.value || "";
+            }
+
+            fromHidden.value = fromVal;
+            untilHidden.value = untilVal;
+
+            // Husk mig (navn + telefon)
+            if (rememberCheckbox && rememberCheckbox.checked) {
+                try {
+                    localStorage.setItem("myggen_name", nameInput ? nameInput.value : "");
+                    localStorage.setItem("myggen_phone", phoneInput ? phoneInput.value : "");
+                } catch (e) {}
+            }
+        });
+    }
+
+    function updateAvailabilityUI() {
+        const selected = document.querySelector("input[name='availability_type']:checked");
+        const type = selected ? selected.value : "any";
+
+        // Disable alt
+        fromSingle.disabled = true;
+        untilSingle.disabled = true;
+        fromRange.disabled = true;
+        untilRange.disabled = true;
+
+        // Nulstil felter når de ikke bruges
+        if (type !== "from") fromSingle.value = "";
+        if (type !== "until") untilSingle.value = "";
+        if (type !== "range") { fromRange.value = ""; untilRange.value = ""; }
+
+        if (type === "from") {
+            fromSingle.disabled = false;
+        } else if (type === "until") {
+            untilSingle.disabled = false;
+        } else if (type === "range") {
+            fromRange.disabled = false;
+            untilRange.disabled = false;
+        }
+    }
+
+    radios.forEach(r => r.addEventListener("change", updateAvailabilityUI));
+    updateAvailabilityUI();
+});
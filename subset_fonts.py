@@ -0,0 +1,95 @@
+import argparse
+import os
+import sys
+
+# Subsetting af Inter til static/fonts/inter/.
+#
+# Resultatet er checket ind, så scriptet køres kun når skrifttypen skal
+# opdateres eller der skal bruges flere tegn/vægte:
+#
+#     pip install -r requirements-build.txt
+#     python subset_fonts.py /sti/til/inter   # mappe med Inter-Regular.woff2 osv.
+#
+# Vi beholder kun latin (inkl. æ, ø, å og é), almindelig typografi (–, “ ”, …, ←/→)
+# og de vægte CSS'en bruger. 650/800 i CSS'en bruger nærmeste vægt (700), som
+# Google Fonts-linket også gjorde. Emojis tegnes af systemets emoji-font.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(ROOT, "static", "fonts", "inter")
+
+# Samme område som Google Fonts' "latin"-subset + pilene fra navigationen
+UNICODES = (
+    "U+0000-00FF, U+0131, U+0152-0153, U+02BB-02BC, U+02C6, U+02DA, U+02DC, U+0304, U+0308, U+0329, "
+    "U+2000-206F, U+20AC, U+2122, U+2190-2193, U+2212, U+2215, U+FEFF, U+FFFD"
+)
+
+# vægt -> kildefil i Inter-distributionen
+WEIGHTS = {
+    400: "Inter-Regular",
+    500: "Inter-Medium",
+    600: "Inter-SemiBold",
+    700: "Inter-Bold",
+}
+
+LAYOUT_FEATURES = ["kern", "liga", "calt", "ccmp", "locl", "mark", "mkmk", "tnum"]
+
+
+def _find_source(source_dir: str, stem: str) -> str | None:
+    for ext in (".woff2", ".ttf", ".otf"):
+        path = os.path.join(source_dir, stem + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def output_name(weight: int) -> str:
+    return f"inter-latin-{weight}.woff2"
+
+
+def subset(source_dir: str) -> list[tuple[int, int, int]]:
+    """Skriv en WOFF2 pr. vægt. Returnerer [(vægt, bytes før, bytes efter)]."""
+    from fontTools import subset as ft_subset
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    results = []
+    for weight, stem in WEIGHTS.items():
+        src = _find_source(source_dir, stem)
+        if src is None:
+            raise FileNotFoundError(f"{stem} findes ikke i {source_dir}")
+
+        options = ft_subset.Options()
+        options.flavor = "woff2"
+        options.layout_features = LAYOUT_FEATURES
+        options.name_IDs = [0, 1, 2, 3, 4, 5, 6]
+        options.hinting = False
+        options.desubroutinize = True
+
+        font = ft_subset.load_font(src, options)
+        subsetter = ft_subset.Subsetter(options)
+        subsetter.populate(unicodes=ft_subset.parse_unicodes(UNICODES))
+        subsetter.subset(font)
+
+        out_path = os.path.join(OUTPUT_DIR, output_name(weight))
+        ft_subset.save_font(font, out_path, options)
+        results.append((weight, os.path.getsize(src), os.path.getsize(out_path)))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Subset Inter til static/fonts/inter/")
+    parser.add_argument("source_dir", help="mappe med Inter-Regular/-Medium/-SemiBold/-Bold (.woff2/.ttf)")
+    args = parser.parse_args()
+
+    try:
+        results = subset(args.source_dir)
+    except ImportError:
+        print("fonttools er ikke installeret – pip install -r requirements-build.txt", file=sys.stderr)
+        sys.exit(1)
+
+    for weight, before, after in results:
+        print(f"  {output_name(weight):<24} {before / 1024:7.1f} KB -> {after / 1024:6.1f} KB")
+    print(f"✓ {len(results)} skrifttyper skrevet til {OUTPUT_DIR}")
+
+
+if __name__ == "__main__":
+    main()